@@ -7,6 +7,11 @@ from .config import BaseConfig, DevConfig, ProdConfig  # asegúrate de tener est
 from .extensions import db
 from flask_migrate import Migrate
 from .i18n import tr
+from .services.files import init_extract_cache, init_extract_pool
+from .services.similarity import init_jd_index
+from .services.stats import init_stats
+from .services.tracing import init_tracing
+from .cli import register_cli
 
 # Blueprints (ok importarlos aquí si no crean la app)
 from .routes.main import bp as main_bp
@@ -60,12 +65,18 @@ def create_app():
     # 3) Inicializar extensiones
     db.init_app(app)
     migrate.init_app(app, db)
+    init_extract_cache(app)
+    init_extract_pool(app)
+    init_jd_index(app)
+    init_stats(app)
+    init_tracing(app)
 
     # 4) Registrar blueprints (una sola vez)
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(history_bp)
     app.register_blueprint(admin_bp)
+    register_cli(app)
 
     # 5) Asegurar modelos para migraciones (no uses create_all; usa Alembic)
     with app.app_context():
@@ -0,0 +1,559 @@
+# app/bench.py
+"""
+`flask bench ...`: micro-benchmarks de los servicios frente a su versión
+anterior. Las implementaciones anteriores viven aquí (no en app/cli.py) y
+sirven también de referencia a los tests de equivalencia (tests/).
+
+    flask bench extract [RUTAS...]   # extracción PDF: implementación anterior vs actual
+    flask bench sections             # secciones ATS + marcadores sospechosos: bucle vs PatternSet
+    flask bench lang                 # detección de idioma por análisis: antes vs services/lang.py
+    flask bench persist              # commits y round trips a la BD por análisis: antes vs ahora
+    flask bench export --rows N      # memoria del export CSV en streaming (SQLite temporal)
+    flask bench history --rows N     # páginas del historial con y sin los cuerpos diferidos
+"""
+import csv, io, json, os, random, re, time, statistics
+from typing import List, Set
+
+import click
+from flask.cli import AppGroup
+
+from .cli import _collect
+
+bench = AppGroup("bench", help="Micro-benchmarks de los servicios (no llaman a LLMs; "
+                               "solo bench persist escribe en la BD, y borra lo suyo).")
+
+
+# -----------------------
+# Helpers
+# -----------------------
+def _synthetic_pdf(pages: int, seed: int = 0) -> bytes:
+    """CV sintético multi-página con varias fuentes, para cuando no hay corpus."""
+    import fitz
+    doc = fitz.open()
+    fonts = ["helv", "tiro", "cour", "hebo"]
+    for pno in range(pages):
+        page = doc.new_page()
+        y = 60
+        for i in range(48):
+            line = f"Experiencia laboral {seed}-{pno}-{i}: lideré proyectos, reduje costos 15% (STAR)"
+            page.insert_text((50, y), line, fontname=fonts[(i + seed) % len(fonts)], fontsize=9)
+            y += 15
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _timeit(fn, data, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(data)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+# -----------------------
+# bench extract
+# -----------------------
+def _extract_pdf_two_passes(data: bytes):
+    """extract_pdf tal como era: get_text("text") + get_text("dict") por página."""
+    import fitz
+    from .services.files import _normalize_font_name
+
+    doc = fitz.open(stream=data, filetype="pdf")
+    pages = doc.page_count
+    text_parts: List[str] = []
+    images = 0
+    fonts: Set[str] = set()
+    for page in doc:
+        text_parts.append(page.get_text("text"))
+        images += len(page.get_images(full=True))
+        d = page.get_text("dict")
+        for block in d.get("blocks", []):
+            if block.get("type") != 0:
+                continue
+            for line in block.get("lines", []):
+                for span in line.get("spans", []):
+                    fname = _normalize_font_name(span.get("font") or "")
+                    if fname:
+                        fonts.add(fname)
+    doc.close()
+    return "\n".join(text_parts).strip(), {"pages": pages, "images": images, "fonts": sorted(fonts)}
+
+
+@bench.command("extract")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@click.option("--repeat", default=5, show_default=True, help="Repeticiones por archivo (mediana).")
+@click.option("--synthetic", default=20, show_default=True,
+              help="Nº de PDFs sintéticos (2–6 páginas) si no se pasan rutas.")
+def bench_extract(paths, repeat, synthetic):
+    """Compara extract_pdf (un TextPage por página) con la versión de dos pasadas."""
+    from .services.files import extract_pdf
+
+    if paths:
+        corpus = []
+        for p in _collect(paths, {"pdf"}):
+            with open(p, "rb") as fh:
+                corpus.append((os.path.basename(p), fh.read()))
+    else:
+        corpus = [(f"synthetic-{i}.pdf", _synthetic_pdf(2 + i % 5, seed=i)) for i in range(synthetic)]
+
+    if not corpus:
+        raise click.ClickException("No se encontraron PDFs.")
+
+    old_total = new_total = 0.0
+    mismatches = 0
+    for name, data in corpus:
+        if _extract_pdf_two_passes(data) != extract_pdf(data):
+            mismatches += 1
+            click.echo(f"DIFERENTE: {name}", err=True)
+        old_t = _timeit(_extract_pdf_two_passes, data, repeat)
+        new_t = _timeit(extract_pdf, data, repeat)
+        old_total += old_t
+        new_total += new_t
+        click.echo(f"{name:40s} antes {old_t*1000:8.2f} ms   ahora {new_t*1000:8.2f} ms")
+
+    click.echo(f"\n{len(corpus)} archivos · total antes {old_total*1000:.1f} ms · "
+               f"ahora {new_total*1000:.1f} ms · x{old_total / max(new_total, 1e-9):.2f}")
+    if mismatches:
+        raise click.ClickException(f"{mismatches} archivo(s) con salida distinta")
+    click.echo("Salida idéntica (texto + meta) en todo el corpus.")
+
+
+# -----------------------
+# bench sections
+# -----------------------
+def _detect_sections_loop(text_lower: str):
+    """_detect_sections tal como era: un re.search por sinónimo."""
+    from .services.ats import SECTION_SYNONYMS
+    present, missing = [], []
+    for canonical, patterns in SECTION_SYNONYMS.items():
+        hit = any(re.search(p, text_lower, flags=re.IGNORECASE) for p in patterns)
+        (present if hit else missing).append(canonical)
+    return present, missing, len(present)
+
+
+def _looks_suspicious_loop(text: str) -> bool:
+    from .services.security import SUSPICIOUS_PATTERNS
+    for pat in SUSPICIOUS_PATTERNS:
+        if re.search(pat, text, flags=re.IGNORECASE):
+            return True
+    return False
+
+
+def _synthetic_cv_text(words: int, seed: int) -> str:
+    """Texto de CV con un subconjunto aleatorio de secciones (a veces ninguna)."""
+    rnd = random.Random(seed)
+    vocab = ("lideré proyectos equipo ventas python datos reduje costos clientes "
+             "implementé procesos mejora análisis gestión desarrollo cloud sql").split()
+    headers = ["Perfil profesional", "Experiencia laboral", "Educación", "Habilidades",
+               "Idiomas", "Professional Summary", "Work Experience", "Technical Skills"]
+    out = []
+    for i in range(words):
+        if i % 400 == 0 and rnd.random() < 0.5:
+            out.append("\n" + rnd.choice(headers) + "\n")
+        out.append(rnd.choice(vocab))
+    if seed % 7 == 0:
+        out.append("<script>alert(1)</script>")
+    return " ".join(out)
+
+
+@bench.command("sections")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@click.option("--repeat", default=5, show_default=True, help="Repeticiones por texto (mediana).")
+@click.option("--synthetic", default=30, show_default=True,
+              help="Nº de textos sintéticos si no se pasan rutas.")
+@click.option("--words", default=20000, show_default=True, help="Palabras por texto sintético.")
+def bench_sections(paths, repeat, synthetic, words):
+    """Compara _detect_sections/looks_suspicious (PatternSet) con los bucles de re.search."""
+    from .services.ats import _detect_sections
+    from .services.security import looks_suspicious
+    from .services.files import extract_document
+
+    if paths:
+        corpus = []
+        for p in _collect(paths, {"pdf", "docx", "txt"}):
+            ext = p.rsplit(".", 1)[-1].lower()
+            with open(p, "rb") as fh:
+                data = fh.read()
+            text = data.decode("utf-8", "ignore") if ext == "txt" else extract_document(data, ext)[0]
+            corpus.append((os.path.basename(p), text or ""))
+    else:
+        corpus = [(f"synthetic-{i}", _synthetic_cv_text(words, seed=i)) for i in range(synthetic)]
+
+    if not corpus:
+        raise click.ClickException("No se encontraron textos.")
+
+    def old(text):
+        return _detect_sections_loop(text.lower()), _looks_suspicious_loop(text)
+
+    def new(text):
+        return _detect_sections(text.lower()), looks_suspicious(text)
+
+    old_total = new_total = 0.0
+    mismatches = 0
+    for name, text in corpus:
+        if old(text) != new(text):
+            mismatches += 1
+            click.echo(f"DIFERENTE: {name}", err=True)
+        old_t = _timeit(old, text, repeat)
+        new_t = _timeit(new, text, repeat)
+        old_total += old_t
+        new_total += new_t
+        click.echo(f"{name:40s} {len(text):>9d} chars   antes {old_t*1000:8.2f} ms   ahora {new_t*1000:8.2f} ms")
+
+    click.echo(f"\n{len(corpus)} textos · total antes {old_total*1000:.1f} ms · "
+               f"ahora {new_total*1000:.1f} ms · x{old_total / max(new_total, 1e-9):.2f}")
+    if mismatches:
+        raise click.ClickException(f"{mismatches} texto(s) con resultado distinto")
+    click.echo("Mismas secciones y mismo veredicto de seguridad en todo el corpus.")
+
+
+_JD_ES = ("Buscamos desarrollador backend con experiencia en Python, Django y bases de datos "
+          "relacionales. Valoramos conocimientos de AWS, Docker y trabajo en equipo ágil. ")
+_JD_EN = ("We are looking for a backend developer with solid Python and Django experience, "
+          "relational databases, AWS and Docker. You will work in an agile team. ")
+
+
+@bench.command("lang")
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@click.option("--synthetic", default=30, show_default=True,
+              help="Nº de CVs sintéticos si no se pasan rutas.")
+@click.option("--words", default=3000, show_default=True, help="Palabras por CV sintético.")
+def bench_lang(paths, synthetic, words):
+    """
+    Coste de detectar idiomas en un análisis: antes 4 langdetect sobre textos
+    completos (CV, CV+JD en el LLM, CV+JD del disclaimer, JD); ahora CV y JD
+    con prefijo acotado + combine_langs, en frío y con memo (mismo CV otra vez).
+    """
+    import langdetect
+    from langdetect import DetectorFactory
+    from .services.lang import detectar_idioma, combine_langs, lang_cache
+    from .services.files import extract_document
+
+    if paths:
+        cvs = []
+        for p in _collect(paths, {"pdf", "docx", "txt"}):
+            ext = p.rsplit(".", 1)[-1].lower()
+            with open(p, "rb") as fh:
+                data = fh.read()
+            cvs.append(data.decode("utf-8", "ignore") if ext == "txt" else extract_document(data, ext)[0] or "")
+    else:
+        cvs = [_synthetic_cv_text(words, seed=i) for i in range(synthetic)]
+    if not cvs:
+        raise click.ClickException("No se encontraron textos.")
+
+    def old_detect(text):
+        seed, DetectorFactory.seed = DetectorFactory.seed, None  # como antes: sin semilla
+        try:
+            return "es" if langdetect.detect(text).startswith("es") else "en"
+        except Exception:
+            return "en"
+        finally:
+            DetectorFactory.seed = seed
+
+    def old(cv, jd):
+        res = old_detect(cv)
+        prompt = old_detect(cv + " " + jd)
+        disclaimer = old_detect(cv + " " + jd)
+        jd_lang = old_detect(jd)
+        return res, jd_lang, disclaimer, prompt
+
+    def new(cv, jd):
+        res, jd_lang = detectar_idioma(cv), detectar_idioma(jd)
+        both = combine_langs(cv, res, jd, jd_lang)
+        return res, jd_lang, both, both
+
+    old_detect("warm up")  # carga de perfiles fuera de la medición
+    t_old = t_cold = t_warm = 0.0
+    same = stable = 0
+    for i, cv in enumerate(cvs):
+        jd = (_JD_EN if i % 2 else _JD_ES) * 3
+        t0 = time.perf_counter(); a = old(cv, jd); t_old += time.perf_counter() - t0
+        stable += a == old(cv, jd)
+        lang_cache.clear()
+        t0 = time.perf_counter(); b = new(cv, jd); t_cold += time.perf_counter() - t0
+        t0 = time.perf_counter(); new(cv, jd); t_warm += time.perf_counter() - t0
+        same += a[:2] == b[:2] and a[2] == b[2]
+
+    n = len(cvs)
+    click.echo(f"{n} análisis · antes {t_old / n * 1000:.2f} ms · ahora {t_cold / n * 1000:.2f} ms "
+               f"(x{t_old / max(t_cold, 1e-9):.1f}) · con memo {t_warm / n * 1000:.3f} ms")
+    click.echo(f"Mismo resultado que antes en {same}/{n}; antes repetía su propio resultado "
+               f"en {stable}/{n} (sin semilla)")
+
+
+def _persist_multi_commit(email, out):
+    """Escritura anterior a la transacción única (un commit por paso), solo para comparar."""
+    from .extensions import db
+    from .models import User, Execution, Membership
+    from .services.analysis import _new_execution
+
+    u = db.session.get(User, email)
+    m = Membership.query.filter_by(code="level_1").first()
+    if m:
+        u.membership = m
+    u.full_name = "Bench"
+    db.session.commit()
+    u = db.session.get(User, email)
+    used = db.session.query(Execution).filter(Execution.email == email).count()
+    assert used < u.exec_limit
+    ex = _new_execution(email=email, filename="bench.pdf", ext="pdf", size=1, out=out)
+    db.session.add(ex)
+    db.session.commit()
+    u.execs_used = (u.execs_used or 0) + 1
+    db.session.commit()
+    u.last_model_vendor = out["model_vendor"]
+    u.last_model_name = out["model_name"]
+    u.last_score = out["score_jd"]
+    u.last_exec_id = ex.id
+    u.last_analysis_at = ex.created_at
+    db.session.commit()
+
+
+@bench.command("persist")
+@click.option("-n", "runs", default=50, show_default=True, help="Análisis guardados por variante.")
+def bench_persist(runs):
+    """
+    Guarda `runs` análisis falsos con la escritura anterior y con la actual
+    (reserve_quota + _persist) y cuenta commits, sentencias SQL y tiempo por
+    análisis. Usa un usuario propio (bench-persist@example.invalid) y lo
+    borra al terminar.
+    """
+    from sqlalchemy import event
+    from .extensions import db
+    from .models import User, Execution
+    from datetime import datetime
+    from .services import stats
+    from .services.analysis import _persist, reserve_quota
+
+    email = "bench-persist@example.invalid"
+    out = {"res_lang": "es", "jd_lang": "es", "model_vendor": "openai", "model_name": "gpt-4o",
+           "score_jd": 70, "feedback_text": "70%\nbench", "feedback_html": "<p>bench</p>",
+           "score_ats": 80, "ats_details": {"pages": 1}, "disclaimer": "", "model_used": 1}
+
+    counts = {"statements": 0, "commits": 0}
+
+    def on_execute(*args):
+        counts["statements"] += 1
+
+    def on_commit(*args):
+        counts["commits"] += 1
+
+    def measure(fn):
+        counts.update(statements=0, commits=0)
+        t0 = time.perf_counter()
+        for _ in range(runs):
+            fn()
+            db.session.remove()  # como entre dos requests: sin identity map caliente
+        ms = (time.perf_counter() - t0) * 1000 / runs
+        return counts["commits"] / runs, counts["statements"] / runs, ms
+
+    def cleanup():
+        Execution.query.filter_by(email=email).delete()
+        User.query.filter_by(email=email).delete()
+        db.session.commit()
+        stats.rebuild(since=datetime.utcnow().date())  # quita las del bench del agregado de hoy
+
+    cleanup()
+    db.session.add(User(email=email, exec_limit_override=10 * runs + 10, execs_used=0))
+    db.session.commit()
+
+    event.listen(db.engine, "before_cursor_execute", on_execute)
+    event.listen(db.engine, "commit", on_commit)
+    try:
+        rows = [
+            ("antes (multi-commit)", measure(lambda: _persist_multi_commit(email, out))),
+            ("ahora (reserva+_persist)", measure(lambda: (reserve_quota(email), _persist(
+                email=email, name="Bench", picture=None, occupation=None,
+                filename="bench.pdf", ext="pdf", size=1, out=out)))),
+        ]
+    finally:
+        event.remove(db.engine, "before_cursor_execute", on_execute)
+        event.remove(db.engine, "commit", on_commit)
+        used = db.session.get(User, email).execs_used
+        cleanup()
+
+    click.echo(f"{db.engine.url.get_backend_name()} · {runs} análisis por variante")
+    for label, (commits, statements, ms) in rows:
+        click.echo(f"{label:26s} {commits:4.1f} commits  {statements:5.1f} sentencias  "
+                   f"{commits + statements:5.1f} round trips  {ms:7.2f} ms/análisis")
+    if used != 2 * runs:
+        raise click.ClickException(f"execs_used={used}, se esperaba {2 * runs}")
+
+
+def _fill_export_db(engine, rows, body=False):
+    """
+    Tabla executions sintética (con feedback_text largo, como en producción);
+    con body=True también feedback_html, jobdesc y ats_details_json.
+    """
+    from datetime import datetime, timedelta
+    from .models import Execution
+
+    Execution.__table__.create(engine)
+    t0 = datetime(2024, 1, 1)
+    feedback = "x" * 2000
+    extra = {}
+    if body:
+        feedback = ("## Fortalezas\n- experiencia relevante en el puesto\n" * 80)[:4000]
+        extra = {"feedback_html": "<p>" + "y" * 5000 + "</p>", "jobdesc": "z " * 1500,
+                 "ats_details_json": json.dumps({"sections": ["exp"] * 100})}
+    with engine.begin() as conn:
+        for start in range(0, rows, 10000):
+            conn.execute(Execution.__table__.insert(), [
+                {"email": f"user{i % 5000}@example.invalid", "uploaded_filename": f"cv_{i}.pdf",
+                 "uploaded_ext": "pdf", "uploaded_size": 100000 + i % 1000, "model_vendor": "openai",
+                 "model_name": "gpt-4o", "score": i % 100, "resume_lang": "es", "jd_lang": "en",
+                 "feedback_text": feedback, "created_at": t0 + timedelta(seconds=i), **extra}
+                for i in range(start, min(rows, start + 10000))
+            ])
+
+
+def _export_csv_before(session, kind="executions", email=None) -> str:
+    """
+    /history/export tal como era: `q.all()` de objetos ORM completos y el CSV
+    entero en un StringIO. Referencia para bench export --compare y los tests.
+    """
+    from .models import Execution, Comment
+
+    si = io.StringIO()
+    w = csv.writer(si)
+    if kind == "comments":
+        q = session.query(Comment).order_by(Comment.created_at.desc())
+        if email is not None:
+            q = q.filter(Comment.email == email)
+        w.writerow(["created_at", "name", "email", "text"])
+        for c in q.all():
+            w.writerow([c.created_at.isoformat(), c.name or "", c.email or "",
+                        (c.text or "").replace("\n", " ")])
+    else:
+        q = session.query(Execution).order_by(Execution.created_at.desc())
+        if email is not None:
+            q = q.filter(Execution.email == email)
+        w.writerow(["created_at", "email", "filename", "ext", "size_bytes", "model_vendor",
+                    "model_name", "score", "resume_lang", "jd_lang"])
+        for e in q.all():
+            w.writerow([e.created_at.isoformat(), e.email, e.uploaded_filename or "",
+                        e.uploaded_ext or "", e.uploaded_size or 0, e.model_vendor or "",
+                        e.model_name or "", e.score if e.score is not None else "",
+                        e.resume_lang or "", e.jd_lang or ""])
+    return si.getvalue()
+
+
+@bench.command("export")
+@click.option("--rows", default=1_000_000, show_default=True, help="Ejecuciones sintéticas.")
+@click.option("--gzip", "gz", is_flag=True, help="Comprime el CSV al vuelo, como ?gzip=1.")
+@click.option("--compare", is_flag=True, help="Mide también el export anterior (todo en memoria).")
+def bench_export(rows, gz, compare):
+    """
+    Exporta `rows` ejecuciones de una SQLite temporal con el mismo código que
+    /history/export y muestra la memoria Python (tracemalloc) a lo largo del
+    export: debe quedarse plana, no crecer con las filas.
+    """
+    import tempfile, tracemalloc
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from .models import Execution
+    from .services.export import EXECUTION_FIELDS, export_stmt, stream_rows, csv_chunks, encode_chunks
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'export.db')}")
+        t0 = time.perf_counter()
+        _fill_export_db(engine, rows)
+        click.echo(f"{rows} filas sintéticas en {time.perf_counter() - t0:.1f} s")
+
+        samples = []
+        step = max(1, rows // 10)
+
+        def counted(it):
+            for i, row in enumerate(it, 1):
+                if i % step == 0:
+                    samples.append((i, tracemalloc.get_traced_memory()[0]))
+                yield row
+
+        with engine.connect() as conn:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            size = 0
+            stmt = export_stmt(EXECUTION_FIELDS, Execution)
+            for chunk in encode_chunks(csv_chunks(EXECUTION_FIELDS, counted(stream_rows(conn, stmt))), gzip=gz):
+                size += len(chunk)
+            wall = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        click.echo(f"streaming: {size / 1e6:.1f} MB{' gzip' if gz else ''} en {wall:.1f} s · "
+                   f"pico {peak / 1e6:.1f} MB")
+        for i, cur in samples:
+            click.echo(f"  tras {i:>9d} filas: {cur / 1e6:6.2f} MB en uso")
+        if samples and samples[-1][1] > 2 * samples[0][1] + 4e6:
+            raise click.ClickException("La memoria crece con las filas exportadas")
+
+        if compare:
+            tracemalloc.start()
+            t0 = time.perf_counter()
+            with Session(engine) as session:
+                size = len(_export_csv_before(session).encode("utf-8"))
+            wall = time.perf_counter() - t0
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            click.echo(f"antes (StringIO + .all()): {size / 1e6:.1f} MB en {wall:.1f} s · "
+                       f"pico {peak / 1e6:.1f} MB")
+        engine.dispose()
+
+
+@bench.command("history")
+@click.option("--rows", default=200_000, show_default=True, help="Ejecuciones sintéticas.")
+@click.option("--pages", default=200, show_default=True, help="Páginas recorridas por variante.")
+@click.option("--per-page", default=100, show_default=True)
+def bench_history(rows, pages, per_page):
+    """
+    Recorre `pages` páginas del historial (keyset por created_at, id) en una
+    SQLite temporal con cuerpos realistas (~12 KB por fila), cargando la fila
+    entera como antes (Execution.with_body()) y solo metadatos como ahora.
+    Muestra ms por página y pico de memoria Python (tracemalloc).
+    """
+    import tempfile, tracemalloc
+    from sqlalchemy import create_engine, select, tuple_
+    from sqlalchemy.orm import Session
+    from .models import Execution
+
+    cols = [Execution.created_at, Execution.id]
+
+    def walk(options):
+        times = []
+        with Session(engine) as session:
+            stmt = select(Execution).options(*options).order_by(*[c.desc() for c in cols]).limit(per_page)
+            last = None
+            tracemalloc.start()
+            for _ in range(pages):
+                t0 = time.perf_counter()
+                page_stmt = stmt if last is None else stmt.where(tuple_(*cols) < tuple_(*last))
+                items = session.scalars(page_stmt).all()
+                # lo que pinta history.html: solo metadatos
+                for e in items:
+                    (e.created_at, e.email, e.uploaded_filename, e.score, e.model_vendor)
+                times.append((time.perf_counter() - t0) * 1000)
+                if len(items) < per_page:
+                    break
+                last = (items[-1].created_at, items[-1].id)
+                session.expunge_all()  # como entre dos requests
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        return statistics.median(times), peak, len(times)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+        t0 = time.perf_counter()
+        _fill_export_db(engine, rows, body=True)
+        click.echo(f"{rows} filas sintéticas en {time.perf_counter() - t0:.1f} s")
+
+        walk([])  # calienta la caché de páginas de SQLite
+        results = [("antes (fila entera)", walk([Execution.with_body()])),
+                   ("ahora (cuerpos diferidos)", walk([]))]
+        for label, (ms, peak, n) in results:
+            click.echo(f"{label:26s} {ms:7.2f} ms/página (mediana de {n})  pico {peak / 1e6:6.1f} MB")
+        (ms_old, peak_old, _), (ms_new, peak_new, _) = (r for _, r in results)
+        click.echo(f"x{ms_old / max(ms_new, 1e-9):.1f} más rápido, x{peak_old / max(peak_new, 1):.1f} menos memoria")
+        engine.dispose()
+
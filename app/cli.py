@@ -0,0 +1,301 @@
+# app/cli.py
+"""
+Comandos `flask ...` de mantenimiento (los benchmarks están en app/bench.py).
+
+    flask ats batch RUTAS... [-o out.csv --format csv]   # scoring ATS por lotes
+    flask jdindex sync|rebuild|query  # índice de JDs similares (instance/jd_index)
+    flask history rerender           # guarda el HTML del feedback en ejecuciones antiguas
+    flask stats rebuild [--days N]   # recalcula daily_stats desde executions (backfill)
+    flask jobs purge [--hours N]     # borra jobs terminados más antiguos que la retención
+    flask schema plans [--app-db]    # EXPLAIN QUERY PLAN de las consultas calientes (falla si hay SCAN)
+"""
+import csv, json, os, time
+
+import click
+from flask.cli import AppGroup
+
+ats = AppGroup("ats", help="Herramientas ATS offline (sin pasar por la web).")
+jdindex = AppGroup("jdindex", help="Índice de descripciones de puesto similares.")
+history = AppGroup("history", help="Mantenimiento del historial de ejecuciones.")
+stats_cli = AppGroup("stats", help="Agregados diarios del panel admin (daily_stats).")
+schema = AppGroup("schema", help="Comprobaciones del esquema de la BD.")
+jobs_cli = AppGroup("jobs", help="Mantenimiento de la cola de análisis (analysis_jobs).")
+
+
+def register_cli(app):
+    from .bench import bench
+    app.cli.add_command(bench)
+    app.cli.add_command(ats)
+    app.cli.add_command(jdindex)
+    app.cli.add_command(history)
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(schema)
+    app.cli.add_command(jobs_cli)
+
+
+# -----------------------
+# Helpers
+# -----------------------
+def _collect(paths, exts):
+    """Archivos con extensión en `exts` dentro de `paths` (archivos o carpetas)."""
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            for root, _, names in os.walk(p):
+                out += [os.path.join(root, n) for n in sorted(names)
+                        if n.rsplit(".", 1)[-1].lower() in exts]
+        elif p.rsplit(".", 1)[-1].lower() in exts:
+            out.append(p)
+    return out
+
+
+
+# -----------------------
+# ats batch
+# -----------------------
+_CSV_FIELDS = ["file", "ext", "size", "lang", "score_ats", "pages", "sections_present",
+               "sections_missing", "suspicious", "jd_lang", "score_jd", "model_vendor", "error",
+               "read_ms", "extract_ms", "ats_ms", "llm_ms", "total_ms"]
+
+
+def _csv_row(row):
+    out = {k: row.get(k) for k in _CSV_FIELDS}
+    for k in ("sections_present", "sections_missing"):
+        if isinstance(out[k], list):
+            out[k] = "; ".join(out[k])
+    for k, v in (row.get("timings_ms") or {}).items():
+        out[f"{k}_ms"] = v
+    return out
+
+
+def _save_execution(email, row, jobdesc=None):
+    from .extensions import db
+    from .models import Execution
+    from .services.ai import sanitize_markdown, RENDER_VERSION
+    feedback = row.get("feedback_text")
+    details = row.get("ats_details")
+    ex = Execution(
+        email=email,
+        uploaded_filename=row["file"],
+        uploaded_ext=row["ext"],
+        uploaded_size=row.get("size"),
+        resume_lang=row.get("lang"),
+        jd_lang=row.get("jd_lang"),
+        model_vendor=row.get("model_vendor"),
+        score=row.get("score_jd"),
+        feedback_text=row.get("feedback_text"),
+        ats_score=row.get("score_ats"),
+        jobdesc=jobdesc,
+        feedback_html=sanitize_markdown(feedback) if feedback else None,
+        feedback_lang=row.get("feedback_lang"),
+        ats_details_json=json.dumps(details, ensure_ascii=False, separators=(",", ":")) if details else None,
+        render_version=RENDER_VERSION,
+    )
+    from .services import stats
+    db.session.add(ex)
+    db.session.flush()
+    stats.record_execution(ex)
+    db.session.commit()
+    return ex.id
+
+
+@ats.command("batch")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--format", "fmt", type=click.Choice(["jsonl", "csv"]), default="jsonl", show_default=True)
+@click.option("-o", "--output", type=click.File("w", encoding="utf-8"), default="-",
+              help="Archivo de salida (por defecto stdout).")
+@click.option("--workers", default=0, show_default=True, help="Procesos (0 = nº de CPUs).")
+@click.option("--jobdesc", "jobdesc_file", type=click.File("r", encoding="utf-8"),
+              help="Archivo con la descripción del puesto (solo se usa con --llm).")
+@click.option("--llm", is_flag=True, help="Además pide el análisis al LLM (consume API).")
+@click.option("--save-as", "save_as", metavar="EMAIL",
+              help="Guarda cada resultado como Execution de ese usuario (no descuenta cupo).")
+def ats_batch(paths, fmt, output, workers, jobdesc_file, llm, save_as):
+    """Extrae y puntúa (ATS) los PDF/DOCX de carpetas o zips, en paralelo."""
+    from .services.batch import iter_inputs, run_batch
+
+    jobdesc = jobdesc_file.read().strip() if jobdesc_file else None
+    if llm and not jobdesc:
+        raise click.UsageError("--llm necesita --jobdesc")
+    if save_as:
+        from .extensions import db
+        from .models import User
+        if not db.session.get(User, save_as):
+            raise click.ClickException(f"No existe el usuario {save_as}")
+        # run_batch hace fork: que los hijos no hereden conexiones abiertas
+        db.session.remove()
+        db.engine.dispose()
+
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(output, fieldnames=_CSV_FIELDS + (["exec_id"] if save_as else []))
+        writer.writeheader()
+
+    n = errors = 0
+    work_ms = 0.0
+    t0 = time.perf_counter()
+    for row in run_batch(iter_inputs(paths), workers=workers, jobdesc=jobdesc, llm=llm):
+        n += 1
+        errors += bool(row.get("error"))
+        work_ms += (row.get("timings_ms") or {}).get("total", 0.0)
+        if save_as and not row.get("error"):
+            row["exec_id"] = _save_execution(save_as, row, jobdesc if row.get("feedback_text") else None)
+        if writer:
+            writer.writerow({**_csv_row(row), **({"exec_id": row.get("exec_id")} if save_as else {})})
+        else:
+            output.write(json.dumps(row, ensure_ascii=False) + "\n")
+        output.flush()
+
+    wall = time.perf_counter() - t0
+    click.echo(f"{n} archivos · {errors} con error · {wall:.2f} s · "
+               f"{n / max(wall, 1e-9):.1f} archivos/s · trabajo {work_ms / 1000:.2f} s "
+               f"(x{work_ms / 1000 / max(wall, 1e-9):.2f} en paralelo)", err=True)
+    if save_as and llm:
+        from .services.similarity import sync_from_db
+        sync_from_db()
+
+
+# -----------------------
+# jdindex
+# -----------------------
+@jdindex.command("sync")
+def jdindex_sync():
+    """Indexa las ejecuciones con JD que aún no están en el índice."""
+    from .services.similarity import jd_index, sync_from_db
+    t0 = time.perf_counter()
+    added = sync_from_db()
+    click.echo(f"{added} JDs añadidas en {time.perf_counter() - t0:.2f} s · "
+               f"{jd_index.stats()['rows']} en el índice")
+
+
+@jdindex.command("rebuild")
+def jdindex_rebuild():
+    """Vacía el índice y lo reconstruye desde la BD (p.ej. tras cambiar JD_INDEX_DIM)."""
+    from .services.similarity import jd_index, sync_from_db
+    t0 = time.perf_counter()
+    jd_index.clear()
+    added = sync_from_db()
+    click.echo(f"{added} JDs indexadas en {time.perf_counter() - t0:.2f} s")
+
+
+@jdindex.command("query")
+@click.argument("jobdesc_file", type=click.File("r", encoding="utf-8"))
+@click.option("-k", default=10, show_default=True)
+def jdindex_query(jobdesc_file, k):
+    """Top-k ejecuciones con la JD más parecida a la del archivo."""
+    from .services.similarity import jd_index
+    text = jobdesc_file.read()
+    t0 = time.perf_counter()
+    hits = jd_index.query(text, k=k)
+    ms = (time.perf_counter() - t0) * 1000
+    for exec_id, score in hits:
+        click.echo(f"{exec_id:>8d}  {score:.4f}")
+    click.echo(f"{len(hits)} resultados sobre {jd_index.stats()['rows']} JDs en {ms:.2f} ms", err=True)
+
+
+# -----------------------
+# history
+# -----------------------
+@history.command("rerender")
+@click.option("--batch", default=500, show_default=True)
+def history_rerender(batch):
+    """
+    Genera feedback_html/feedback_lang de las ejecuciones guardadas con otra
+    RENDER_VERSION (o antes de guardarlo), para que print_view no lo recalcule.
+    Sus ats_details no se pueden reconstruir sin el archivo: quedan vacíos.
+    """
+    from .extensions import db
+    from .models import Execution
+    from .services.ai import sanitize_markdown, detectar_idioma, RENDER_VERSION
+
+    last, n = 0, 0
+    while True:
+        rows = (Execution.query.options(Execution.with_body())
+                .filter(Execution.id > last,
+                        db.or_(Execution.render_version.is_(None), Execution.render_version != RENDER_VERSION))
+                .order_by(Execution.id).limit(batch).all())
+        if not rows:
+            break
+        for ex in rows:
+            ex.feedback_html = sanitize_markdown(ex.feedback_text or "")
+            ex.feedback_lang = detectar_idioma((ex.feedback_text or "") + " " + (ex.jd_lang or ""))
+            ex.render_version = RENDER_VERSION
+        db.session.commit()
+        n += len(rows)
+        last = rows[-1].id
+    click.echo(f"{n} ejecuciones actualizadas a {RENDER_VERSION}")
+
+
+# -----------------------
+# stats
+# -----------------------
+@stats_cli.command("rebuild")
+@click.option("--days", type=int, default=None,
+              help="Solo los últimos N días (por defecto, todo el historial).")
+def stats_rebuild(days):
+    """Recalcula los agregados diarios desde executions (backfill tras migrar)."""
+    from datetime import datetime, timedelta
+    from .services import stats
+
+    since = datetime.utcnow().date() - timedelta(days=days - 1) if days else None
+    t0 = time.perf_counter()
+    n = stats.rebuild(since=since)
+    click.echo(f"{n} filas de daily_stats{' desde ' + since.isoformat() if since else ''} "
+               f"en {time.perf_counter() - t0:.1f} s")
+
+
+# -----------------------
+# jobs
+# -----------------------
+@jobs_cli.command("purge")
+@click.option("--hours", type=float, default=None,
+              help="Antigüedad mínima en horas (por defecto ANALYSIS_JOB_RETENTION_HOURS).")
+def jobs_purge(hours):
+    """Borra los jobs terminados (done/failed) más antiguos que la retención."""
+    from flask import current_app
+    from .services.jobs import purge_finished
+
+    if hours is None:
+        hours = float(current_app.config.get("ANALYSIS_JOB_RETENTION_HOURS", 24)) or 24
+    n = purge_finished(hours)
+    click.echo(f"{n} jobs terminados de más de {hours:g} h borrados")
+
+
+# -----------------------
+# schema
+# -----------------------
+@schema.command("plans")
+@click.option("--app-db", is_flag=True,
+              help="Usa la BD configurada (SQLite, ya migrada) en vez de una en memoria creada desde los modelos.")
+@click.option("-v", "--verbose", is_flag=True, help="Muestra el plan de todas las consultas.")
+def schema_plans(app_db, verbose):
+    """
+    Comprueba con EXPLAIN QUERY PLAN que cada consulta caliente
+    (services/query_plans.HOT_QUERIES) usa un índice. Sale con código 1 si
+    alguna recorre una tabla: sirve como test de regresión en CI.
+    """
+    from sqlalchemy import create_engine
+    from .extensions import db
+    from .services import query_plans
+
+    if app_db:
+        engine = db.engine
+        if engine.dialect.name != "sqlite":
+            raise click.UsageError("--app-db solo vale con SQLite (EXPLAIN QUERY PLAN)")
+    else:
+        engine = create_engine("sqlite://")
+        db.metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        results = query_plans.check(conn)
+    for r in results:
+        click.echo(f"{'ok  ' if r.ok else 'FAIL'} {r.name}")
+        for problem in r.problems:
+            click.echo(f"       - {problem}")
+        if verbose or not r.ok:
+            for line in r.plan:
+                click.echo(f"         {line}")
+    good, bad = query_plans.summary(results)
+    click.echo(f"{good} consultas con índice, {bad} con recorrido completo")
+    if bad:
+        raise SystemExit(1)
@@ -20,8 +20,71 @@ class BaseConfig:
     # LLM
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
+    # Timeouts (OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT, GEMINI_TIMEOUT) y
+    # breaker (LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS, LLM_BREAKER_SLOW_SECONDS:
+    # 90 s por defecto, sobre los timeouts; en streaming cuenta hasta el primer trozo)
+    # se leen del entorno en services/ai.py y services/breaker.py.
+
+    # Modo auto "hedged": si OpenAI no respondió en N s, se lanza Gemini en paralelo
+    LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+    LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "8"))
+
+    # Streaming del LLM a la página por SSE (/jobs/<id>/stream). Apagado por
+    # defecto: cada stream abierto ocupa un thread de gunicorn mientras dura la
+    # generación. STREAM_MAX_OPEN acota los streams por worker; por encima el
+    # endpoint responde 429 y la página cae al polling de /jobs/<id>.
+    LLM_STREAMING_ENABLED = os.getenv("LLM_STREAMING_ENABLED", "false").lower() == "true"
+    STREAM_MAX_OPEN = int(os.getenv("STREAM_MAX_OPEN", "4"))
+    STREAM_FLUSH_SECONDS = float(os.getenv("STREAM_FLUSH_SECONDS", "0.3"))   # escritura del parcial en BD
+    STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "0.25"))    # lectura desde el endpoint SSE
+
+    # Sin ningún LLM disponible, devolver el análisis local de palabras clave
+    KEYWORD_FALLBACK_ENABLED = os.getenv("KEYWORD_FALLBACK_ENABLED", "true").lower() == "true"
+
+    # Batch (un CV contra varias JDs): tope de JDs por envío y llamadas LLM simultáneas
+    BATCH_MAX_JDS = int(os.getenv("BATCH_MAX_JDS", "20"))
+    BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", "4"))
+
+    # Índice de JDs similares (instance/jd_index). JD_REUSE_THRESHOLD > 0 reutiliza
+    # el feedback de un análisis previo del mismo CV con una JD de coseno >= umbral
+    JD_INDEX_ENABLED = os.getenv("JD_INDEX_ENABLED", "true").lower() == "true"
+    JD_INDEX_DIM = int(os.getenv("JD_INDEX_DIM", "1024"))
+    JD_REUSE_THRESHOLD = float(os.getenv("JD_REUSE_THRESHOLD", "0"))
+
+    # Panel admin: agregados diarios (daily_stats) cacheados STATS_CACHE_TTL s por proceso
+    STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "30"))
+    STATS_DAYS = int(os.getenv("STATS_DAYS", "30"))
+
+    # Trazas por etapa (services/tracing.py): cabecera Server-Timing y /admin/metrics
+    # (Prometheus; sin sesión admin, con "Authorization: Bearer $METRICS_TOKEN")
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
 
     DONATIONS_ENABLED = os.getenv("DONATIONS_ENABLED", "true").lower() == "true"
+
+    # Tope del body en la capa WSGI: 2 MB de CV (main.MAX_MB) + margen para JD/campos
+    MAX_CONTENT_LENGTH = 3 * 1024 * 1024
+
+    # Cola de análisis (hilos por proceso de gunicorn y tope de espera del polling)
+    ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+    ANALYSIS_JOB_TIMEOUT = int(os.getenv("ANALYSIS_JOB_TIMEOUT", "300"))
+    # Jobs terminados (done/failed) se borran pasadas N horas: el resultado ya
+    # está en executions. 0 desactiva la purga automática (queda `flask jobs purge`).
+    ANALYSIS_JOB_RETENTION_HOURS = float(os.getenv("ANALYSIS_JOB_RETENTION_HOURS", "24"))
+
+    # Caché de resultados CV+JD (tamaño/TTL en services/ai.py); "false" la desactiva
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+
+    # Caché de extracción por hash del archivo (memoria + disco opcional en instance/)
+    EXTRACT_CACHE_MB = int(os.getenv("EXTRACT_CACHE_MB", "64"))
+    EXTRACT_CACHE_DISK = os.getenv("EXTRACT_CACHE_DISK", "false").lower() == "true"
+    EXTRACT_CACHE_DISK_MB = int(os.getenv("EXTRACT_CACHE_DISK_MB", "256"))
+
+    # Parseo en procesos aparte (0 = en el hilo del request/job)
+    EXTRACT_POOL_WORKERS = int(os.getenv("EXTRACT_POOL_WORKERS", "0"))
+    EXTRACT_POOL_TIMEOUT = float(os.getenv("EXTRACT_POOL_TIMEOUT", "20"))
+    EXTRACT_POOL_MAX_TASKS = int(os.getenv("EXTRACT_POOL_MAX_TASKS", "50"))  # reciclaje de cada hijo
     
 class DevConfig(BaseConfig):
     DEBUG = True
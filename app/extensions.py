@@ -1,11 +1,11 @@
 from flask_sqlalchemy import SQLAlchemy
-from openai import OpenAI
+from openai import OpenAI, DefaultHttpxClient
 import google.generativeai as genai
-import os, logging
+import httpx
+import os, logging, threading
 from sqlalchemy import MetaData
 
 _log = logging.getLogger(__name__)
-_openai_singleton = None
 
 # Convención de nombres recomendable para Alembic
 metadata = MetaData(naming_convention={
@@ -17,20 +17,55 @@ metadata = MetaData(naming_convention={
 })
 db = SQLAlchemy(metadata=metadata)
 
+# ---- Registro de clientes LLM (uno por proceso)
+# Un cliente OpenAI con pool HTTP keep-alive vive mientras viva el worker: nos
+# ahorramos TLS + conexión por análisis. Se indexa por pid porque tras el fork
+# de gunicorn los sockets heredados son del padre: en el hijo se descartan (sin
+# cerrarlos) y se crea uno nuevo.
+_clients = {"pid": None, "openai": None, "gemini": False}
+_clients_lock = threading.Lock()
+_http_stats = {"requests": 0, "connections": 0, "created": 0, "gemini_configure": 0}
+
+def _ensure_pid():
+    if _clients["pid"] != os.getpid():
+        _clients.update({"pid": os.getpid(), "openai": None, "gemini": False})
+        _http_stats.update({"requests": 0, "connections": 0})
+
+def _trace(event_name, info):
+    # httpcore avisa de cada conexión TCP nueva; el resto de requests reusan keep-alive
+    if event_name == "connection.connect_tcp.complete":
+        with _clients_lock:
+            _http_stats["connections"] += 1
+
+def _on_request(request):
+    request.extensions["trace"] = _trace
+    with _clients_lock:
+        _http_stats["requests"] += 1
+
 def openai_client():
-    global _openai_singleton
-    if _openai_singleton:
-        return _openai_singleton
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         _log.error("OPENAI_API_KEY no está definido en el entorno")
         return None
-    try:
-        _openai_singleton = OpenAI(api_key=api_key)
-        return _openai_singleton
-    except Exception as e:
-        _log.exception("No se pudo crear el cliente de OpenAI: %s", e)
-        return None
+    with _clients_lock:
+        _ensure_pid()
+        if _clients["openai"] is not None:
+            return _clients["openai"]
+        try:
+            http_client = DefaultHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "20")),
+                    max_keepalive_connections=int(os.getenv("OPENAI_POOL_KEEPALIVE", "10")),
+                    keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60")),
+                ),
+                event_hooks={"request": [_on_request]},
+            )
+            _clients["openai"] = OpenAI(api_key=api_key, http_client=http_client)
+            _http_stats["created"] += 1
+            return _clients["openai"]
+        except Exception as e:
+            _log.exception("No se pudo crear el cliente de OpenAI: %s", e)
+            return None
 
 # ---- Gemini (importación segura)
 try:
@@ -42,5 +77,27 @@ def gemini_client():
     key = os.getenv("GEMINI_API_KEY")
     if not key:
         return None
-    genai.configure(api_key=key)
+    with _clients_lock:
+        _ensure_pid()
+        if _clients["gemini"]:
+            return genai  # configure() recrea los clientes internos: solo una vez por proceso
+        # GEMINI_API_ENDPOINT permite apuntar a un servidor fake local (tests de timeouts)
+        endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        if endpoint:
+            genai.configure(api_key=key, transport="rest", client_options={"api_endpoint": endpoint})
+        else:
+            genai.configure(api_key=key)
+        _clients["gemini"] = True
+        _http_stats["gemini_configure"] += 1
     return genai
+
+def client_stats():
+    """Reuso de conexiones del cliente OpenAI de este proceso."""
+    with _clients_lock:
+        st = dict(_http_stats)
+        st["pid"] = os.getpid()
+        st["openai_ready"] = _clients["pid"] == os.getpid() and _clients["openai"] is not None
+        st["gemini_ready"] = _clients["pid"] == os.getpid() and bool(_clients["gemini"])
+    st["reused"] = max(0, st["requests"] - st["connections"])
+    st["reuse_rate"] = round(st["reused"] / st["requests"], 4) if st["requests"] else None
+    return st
@@ -56,6 +56,7 @@ STRINGS = {
         "err.login": "Inicia sesión para analizar tu CV.",
         "err.no_file": "No se recibió ningún archivo. Selecciona un PDF o DOCX.",
         "err.no_jd": "Falta la descripción del puesto.",
+        "err.too_many_jds": "Puedes comparar hasta {max_jds} descripciones de puesto a la vez.",
         "err.bad_ext": "Formato no permitido. Solo PDF o DOCX.",
         "err.empty": "El archivo está vacío o no se pudo leer.",
         "err.too_big": "El archivo supera {max_mb} MB.",
@@ -67,6 +68,7 @@ STRINGS = {
         "ai.title": "Análisis de la IA",
         "ai.model_1": "Model 1",
         "ai.model_2": "Model 2",
+        "ai.model_3": "Palabras clave (local)",
         "ai.download_print": "Versión imprimible",
         "ai.match_jd": "Coincidencia con Job Description",
         "ai.match_ats": "Coincidencia con Plantilla CV ATS",
@@ -139,6 +141,15 @@ STRINGS = {
         # Overlay
         "overlay.processing": "Procesando análisis…",
         "overlay.processing.alt": "Procesando análisis (accesible)",
+        "overlay.streaming": "Generando el análisis (vista previa):",
+        "overlay.keywords": "Coincidencia de palabras clave: {score}%",
+
+        # Palabras clave (score local)
+        "kw.title": "Palabras clave de la descripción del puesto",
+        "kw.score": "Coincidencia de palabras clave",
+        "kw.matched": "Presentes en tu CV",
+        "kw.missing": "No aparecen en tu CV",
+        "kw.fallback_md": "**Análisis por palabras clave** (el análisis con IA no está disponible en este momento; inténtalo de nuevo más tarde).\n\n**Presentes en tu CV:** {matched}\n\n**No aparecen en tu CV:** {missing}",
 
         # Donación
         "donate_blurb.title": "Apóyanos",
@@ -208,6 +219,7 @@ STRINGS = {
         "err.login": "Sign in to analyze your resume.",
         "err.no_file": "No file received. Please select a PDF or DOCX.",
         "err.no_jd": "Job description is missing.",
+        "err.too_many_jds": "You can compare up to {max_jds} job descriptions at once.",
         "err.bad_ext": "Format not allowed. PDF or DOCX only.",
         "err.empty": "The file is empty or could not be read.",
         "err.too_big": "The file exceeds {max_mb} MB.",
@@ -219,6 +231,7 @@ STRINGS = {
         "ai.title": "AI Analysis",
         "ai.model_1": "Model 1",
         "ai.model_2": "Model 2",
+        "ai.model_3": "Keywords (local)",
         "ai.download_print": "Printable version",
         "ai.match_jd": "Match with Job Description",
         "ai.match_ats": "Match with ATS CV Template",
@@ -291,6 +304,15 @@ STRINGS = {
         # Overlay
         "overlay.processing": "Processing analysis…",
         "overlay.processing.alt": "Processing analysis (accessible)",
+        "overlay.streaming": "Generating the analysis (preview):",
+        "overlay.keywords": "Keyword match: {score}%",
+
+        # Keywords (local score)
+        "kw.title": "Job description keywords",
+        "kw.score": "Keyword match",
+        "kw.matched": "Found in your CV",
+        "kw.missing": "Missing from your CV",
+        "kw.fallback_md": "**Keyword analysis** (the AI analysis is not available right now; please try again later).\n\n**Found in your CV:** {matched}\n\n**Missing from your CV:** {missing}",
 
         # Donation
         "donate_blurb.title": "Support Us",
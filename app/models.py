@@ -1,6 +1,18 @@
+import json
 from datetime import datetime
+from sqlalchemy.orm import deferred, undefer_group
 from .extensions import db
 
+# Columnas grandes de Execution (feedback, JD, ATS): grupo diferido "body"
+EXECUTION_BODY = "body"
+
+
+def _body(column):
+    # No se cargan con la fila: los listados (historial, admin) leen solo
+    # metadatos. Leerlas sin Execution.with_body() lanza error en vez de
+    # hacer un SELECT escondido por fila.
+    return deferred(column, group=EXECUTION_BODY, raiseload=True)
+
 
 class Membership(db.Model):
     __tablename__ = "memberships"
@@ -22,6 +34,9 @@ class Membership(db.Model):
 
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        db.Index("ix_users_created_at_email", "created_at", "email"),  # listado admin (keyset)
+    )
 
     # PK por email (como ya tenías)
     email         = db.Column(db.String(320), primary_key=True)
@@ -63,6 +78,10 @@ class User(db.Model):
 
 class Execution(db.Model):
     __tablename__ = "executions"
+    __table_args__ = (
+        db.Index("ix_executions_created_at_id", "created_at", "id"),               # historial (keyset)
+        db.Index("ix_executions_email_created_at_id", "email", "created_at", "id"),  # por usuario
+    )
 
     id               = db.Column(db.Integer, primary_key=True, autoincrement=True)
     email            = db.Column(db.String(320), db.ForeignKey("users.email"))
@@ -74,15 +93,62 @@ class Execution(db.Model):
     model_vendor     = db.Column(db.String(20))
     model_name       = db.Column(db.String(50))
     score            = db.Column(db.Integer)
-    feedback_text    = db.Column(db.Text)
+    feedback_text    = _body(db.Column(db.Text))
     created_at       = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     ats_score        = db.Column(db.Integer, nullable=True)
+    keyword_score    = db.Column(db.Integer, nullable=True)   # score local de palabras clave (services/keywords.py)
+    file_sha256      = db.Column(db.String(64), index=True)   # hash del CV subido
+    jobdesc          = _body(db.Column(db.Text))              # JD analizada (índice de similares, services/similarity.py)
+    # Lo que pintan print/PDF, guardado al analizar (ver ai.RENDER_VERSION)
+    feedback_html    = _body(db.Column(db.Text))              # feedback ya sanitizado
+    feedback_lang    = db.Column(db.String(5))                # idioma del feedback/disclaimer
+    ats_details_json = _body(db.Column(db.Text))              # ats_details en JSON compacto
+    render_version   = db.Column(db.String(32))
+    # Etapas del análisis en ms y tokens del LLM (services/tracing.py)
+    timings_json     = db.Column(db.Text)
+    llm_tokens_in    = db.Column(db.Integer)
+    llm_tokens_out   = db.Column(db.Integer)
+
+    @property
+    def ats_details(self):
+        return json.loads(self.ats_details_json) if self.ats_details_json else None
+
+    @property
+    def timings(self):
+        return json.loads(self.timings_json) if self.timings_json else None
+
+    @staticmethod
+    def with_body():
+        """Opción de carga para leer también feedback/JD/ATS (un solo SELECT)."""
+        return undefer_group(EXECUTION_BODY)
 
     user = db.relationship("User", back_populates="executions")
 
 
+class DailyStat(db.Model):
+    """Agregado diario de ejecuciones por proveedor e idioma (lo mantiene services/stats.py)."""
+    __tablename__ = "daily_stats"
+    __table_args__ = (
+        db.UniqueConstraint("day", "model_vendor", "resume_lang", name="uq_daily_stats_key"),
+    )
+
+    id           = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    day          = db.Column(db.Date, nullable=False)                      # UTC, como created_at
+    model_vendor = db.Column(db.String(20), nullable=False, default="")    # "" = sin proveedor
+    resume_lang  = db.Column(db.String(5), nullable=False, default="")
+    executions   = db.Column(db.Integer, nullable=False, default=0)
+    score_sum    = db.Column(db.Integer, nullable=False, default=0)
+    score_count  = db.Column(db.Integer, nullable=False, default=0)        # filas con score (para la media)
+    ats_sum      = db.Column(db.Integer, nullable=False, default=0)
+    ats_count    = db.Column(db.Integer, nullable=False, default=0)
+
+
 class Comment(db.Model):
     __tablename__ = "comments"
+    __table_args__ = (
+        db.Index("ix_comments_created_at_id", "created_at", "id"),
+        db.Index("ix_comments_email_created_at_id", "email", "created_at", "id"),  # límite rodante / export
+    )
 
     id         = db.Column(db.Integer, primary_key=True, autoincrement=True)
     email      = db.Column(db.String(320), db.ForeignKey("users.email"), nullable=True)
@@ -91,3 +157,23 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     user = db.relationship("User", back_populates="comments")
+
+
+class AnalysisJob(db.Model):
+    __tablename__ = "analysis_jobs"
+    __table_args__ = (
+        db.Index("ix_analysis_jobs_status_created_at", "status", "created_at"),  # jobs activos / caducados
+    )
+
+    id           = db.Column(db.String(32), primary_key=True)                    # uuid4().hex
+    email        = db.Column(db.String(320), index=True)
+    status       = db.Column(db.String(10), nullable=False, default="queued")    # queued/running/done/failed
+    error_key    = db.Column(db.String(50))                                      # clave i18n del error
+    error_params = db.Column(db.Text)                                            # JSON
+    result_json  = db.Column(db.Text)                                            # JSON que pinta index.html
+    partial_text = db.Column(db.Text)                                            # salida parcial del LLM (streaming)
+    preview_json = db.Column(db.Text)                                            # JSON previo al LLM (palabras clave)
+    exec_id      = db.Column(db.Integer)
+    created_at   = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at   = db.Column(db.DateTime)
+    finished_at  = db.Column(db.DateTime)
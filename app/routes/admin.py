@@ -1,8 +1,17 @@
 # app/routes/admin.py
+import hmac
 from flask import (Blueprint, render_template, session, redirect, url_for,
-                   current_app, flash, request)
-from ..extensions import db
+                   current_app, flash, request, jsonify, Response)
+from ..extensions import db, client_stats
 from ..models import User, Execution, Comment, Membership
+from ..services import jobs
+from ..services.ai import result_cache, hedge_stats
+from ..services.breaker import breakers
+from ..services.files import extract_cache_stats, clear_extract_cache, extract_pool_stats
+from ..services import similarity, stats, tracing
+from ..services.pagination import keyset_page, approx_count, clamp_per_page
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import contains_eager, undefer
 
 bp = Blueprint("admin", __name__, url_prefix="/admin")  # 👈 prefijo /admin
 
@@ -11,8 +20,15 @@ def _is_admin():
     admin = current_app.config.get("ADMIN_EMAIL")
     return bool(admin and email and email.lower() == admin.lower())
 
+def _metrics_token_ok():
+    token = current_app.config.get("METRICS_TOKEN")
+    auth = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(auth, f"Bearer {token}")
+
 @bp.before_request
 def require_admin():
+    if request.endpoint == "admin.metrics" and _metrics_token_ok():
+        return  # scraper de Prometheus (sin sesión)
     if not _is_admin():
         flash("Acceso solo para admin.", "danger")
         return redirect(url_for("main.index"))
@@ -27,8 +43,13 @@ def ensure_level1():
     return m
 
 # ---------- helpers opcionales ----------
+_memberships_seeded = False
+
 def seed_default_memberships():
-    """Crea niveles básicos si la tabla está vacía."""
+    """Crea niveles básicos si la tabla está vacía (se comprueba una vez por proceso)."""
+    global _memberships_seeded
+    if _memberships_seeded:
+        return
     if Membership.query.count() == 0:
         db.session.add_all([
             Membership(code="LEVEL_1", title="Nivel 1", max_execs=10,  is_active=True),
@@ -36,20 +57,133 @@ def seed_default_memberships():
             Membership(code="LEVEL_3", title="Nivel 3", max_execs=100, is_active=True),
         ])
         db.session.commit()
+    _memberships_seeded = True
 
 # ---------- panel ----------
 @bp.route("/")
 def panel():
     seed_default_memberships()  # crea niveles por defecto si no existen
-    users_count = User.query.count()
-    execs_count = Execution.query.count()
-    comments_count = Comment.query.count()
+    # Totales y uso por día desde daily_stats (services/stats.py), no contando tablas
+    dash = stats.dashboard()
     levels = Membership.query.order_by(Membership.id.asc()).all()
     return render_template("admin/panel.html",
-                           users_count=users_count,
-                           execs_count=execs_count,
-                           comments_count=comments_count,
-                           levels=levels)
+                           users_count=dash["totals"]["users"],
+                           execs_count=dash["totals"]["executions"],
+                           comments_count=dash["totals"]["comments"],
+                           dash=dash,
+                           levels=levels,
+                           result_cache=result_cache.stats(),
+                           extract_cache=extract_cache_stats())
+
+@bp.route("/stats")
+def stats_json():
+    """Agregados diarios de los últimos ?days= días (JSON, máx. 366)."""
+    days = max(1, min(request.args.get("days", current_app.config.get("STATS_DAYS", 30), type=int), 366))
+    return jsonify(stats.dashboard(days))
+
+# ---------- métricas ----------
+@bp.route("/metrics")
+def metrics():
+    """Histogramas de duración por etapa y tokens de LLM, formato texto de Prometheus."""
+    return Response(tracing.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ---------- cola de análisis ----------
+@bp.route("/jobs/stats")
+def jobs_stats():
+    """Profundidad de cola y throughput del pool de análisis (JSON)."""
+    return jsonify(jobs.stats())
+
+@bp.route("/cache/stats")
+def cache_stats():
+    """Aciertos/fallos de las cachés del proceso (JSON)."""
+    return jsonify({
+        "enabled": current_app.config.get("RESULT_CACHE_ENABLED", True),
+        "results": result_cache.stats(),
+        "extraction": extract_cache_stats(),
+        "extract_pool": extract_pool_stats(),
+    })
+
+@bp.route("/cache/clear", methods=["POST"])
+def cache_clear():
+    result_cache.clear()
+    clear_extract_cache()
+    flash("Cachés vaciadas.", "success")
+    return redirect(url_for("admin.panel"))
+
+# ---------- LLMs ----------
+@bp.route("/llm/breakers")
+def llm_breakers():
+    """Estado de los circuit breakers por vendor (JSON, este proceso)."""
+    return jsonify({name: b.snapshot() for name, b in breakers.items()})
+
+@bp.route("/llm/hedge")
+def llm_hedge():
+    """Carreras OpenAI/Gemini del modo auto hedged: cuántas y quién ganó (JSON)."""
+    return jsonify({
+        "enabled": current_app.config.get("LLM_HEDGE_ENABLED", False),
+        "after_seconds": current_app.config.get("LLM_HEDGE_AFTER_SECONDS"),
+        **hedge_stats,
+    })
+
+@bp.route("/llm/clients")
+def llm_clients():
+    """Reuso de conexiones de los clientes LLM del proceso (JSON)."""
+    return jsonify(client_stats())
+
+@bp.route("/llm/breakers/reset", methods=["POST"])
+def llm_breakers_reset():
+    for b in breakers.values():
+        b.reset()
+    flash("Circuit breakers reiniciados.", "success")
+    return redirect(url_for("admin.panel"))
+
+# ---------- JDs similares ----------
+def _jd_rows(pairs):
+    """[(exec_id, score)] -> filas con un resumen de cada Execution."""
+    ids = [i for i, _ in pairs]
+    execs = ({e.id: e for e in Execution.query.options(undefer(Execution.jobdesc))
+                                          .filter(Execution.id.in_(ids)).all()} if ids else {})
+    rows = []
+    for exec_id, score in pairs:
+        e = execs.get(exec_id)
+        rows.append({
+            "exec_id": exec_id,
+            "similarity": round(score, 4),
+            "email": e.email if e else None,
+            "created_at": e.created_at.isoformat() if e else None,
+            "score": e.score if e else None,
+            "jobdesc": (e.jobdesc or "")[:200] if e else None,
+        })
+    return rows
+
+@bp.route("/jd/similar")
+def jd_similar():
+    """Top-k JDs más parecidas a ?q= (texto) o a la JD de ?exec_id= (JSON)."""
+    k = min(request.args.get("k", 10, type=int), 100)
+    text = request.args.get("q", "")
+    exec_id = request.args.get("exec_id", type=int)
+    if exec_id:
+        e = db.session.get(Execution, exec_id, options=[undefer(Execution.jobdesc)])
+        text = (e.jobdesc if e else None) or ""
+    if not text.strip():
+        return jsonify({"error": "q o exec_id (con JD) requerido"}), 400
+    return jsonify(_jd_rows(similarity.jd_index.query(text, k=k)))
+
+@bp.route("/jd/popular")
+def jd_popular():
+    """Grupos de JDs casi iguales entre las más recientes (ofertas populares, JSON)."""
+    threshold = request.args.get("threshold", 0.9, type=float)
+    window = min(request.args.get("window", similarity.POPULAR_MAX_WINDOW, type=int),
+                 similarity.POPULAR_MAX_WINDOW)
+    groups = similarity.jd_index.popular(threshold=threshold, window=window)
+    for g in groups:
+        leader = db.session.get(Execution, g["leader"], options=[undefer(Execution.jobdesc)])
+        g["jobdesc"] = (leader.jobdesc or "")[:200] if leader else None
+    return jsonify(groups)
+
+@bp.route("/jd/index")
+def jd_index_stats():
+    return jsonify(similarity.jd_index.stats())
 
 # ---------- comentarios ----------
 @bp.route("/clear-comments", methods=["POST"])
@@ -97,22 +231,43 @@ def memberships_edit(mid):
 # ---------- usuarios ----------
 @bp.route("/users")
 def users_list():
-    users = (User.query
-                .order_by(User.created_at.desc())
-                .all())
-    # calcula uso y límite (si no llevas el cache execs_used)
+    """
+    Usuarios por fecha de alta, paginados por cursor (?after / ?before) y con
+    búsqueda ?q= en email/nombre. Una consulta por página: la membresía va en
+    el mismo JOIN y el nº de ejecuciones en una subconsulta por fila que usa
+    el índice (email, created_at, id).
+    """
+    q = (request.args.get("q") or "").strip()[:100]
+    per_page = clamp_per_page(request.args.get("per_page"), default=50)
+
+    n_execs = (select(func.count(Execution.id))
+               .where(Execution.email == User.email)
+               .correlate(User)
+               .scalar_subquery())
+    stmt = (select(User, n_execs)
+            .outerjoin(User.membership)
+            .options(contains_eager(User.membership)))
+    criteria = []
+    if q:
+        criteria = [or_(User.email.icontains(q, autoescape=True),
+                        User.full_name.icontains(q, autoescape=True))]
+        stmt = stmt.where(*criteria)
+
+    page = keyset_page(stmt, [User.created_at, User.email], per_page=per_page,
+                       after=request.args.get("after"), before=request.args.get("before"))
+    # uso = contador de cupo (execs_used, lo lleva services/analysis.reserve_quota)
     rows = []
-    for u in users:
-        used = Execution.query.filter_by(email=u.email).count()
-        limit = u.exec_limit  # property de tu modelo User
-        rows.append((u, used, limit, max(0, (limit or 0) - used)))
-    levels = Membership.query.order_by(Membership.id.asc()).all()
-    return render_template("admin/users.html", rows=rows, levels=levels)
+    for u, execs in page.items:
+        used = u.execs_used or 0
+        limit = u.exec_limit  # property de tu modelo User (membership ya cargada)
+        rows.append((u, used, limit, max(0, (limit or 0) - used), execs))
+    total = approx_count(User, *criteria, cache_key=f"users:q={q.lower()}" if q else None)
+    return render_template("admin/users.html", rows=rows, page=page, q=q, total=total)
 
 @bp.route("/users/<email>")
 def user_detail(email):
     u = User.query.get_or_404(email)
-    used = Execution.query.filter_by(email=email).count()
+    used = u.execs_used or 0
     levels = Membership.query.order_by(Membership.id.asc()).all()
     return render_template("admin/user_detail.html", user=u, used=used, levels=levels)
 
@@ -1,12 +1,16 @@
-from flask import Blueprint, render_template, session, redirect, url_for, request, current_app, Response, flash, send_file, make_response, abort
+from flask import Blueprint, render_template, session, redirect, url_for, request, current_app, Response, flash, send_file, make_response, abort, stream_with_context
 from datetime import datetime
-import math, csv, io
+import math
 
 from ..extensions import db
 from ..models import Execution, Comment
 from ..services.pdf import render_analysis_pdf
 from ..models import Execution, Comment, User
-from ..services.ai import sanitize_markdown, detectar_idioma, disclaimer_text
+from ..services.ai import sanitize_markdown, detectar_idioma, disclaimer_text, RENDER_VERSION
+from ..services.pagination import keyset_page, approx_count, clamp_per_page
+from ..services.export import (EXECUTION_FIELDS, COMMENT_FIELDS, export_stmt, stream_rows,
+                               csv_chunks, encode_chunks)
+from sqlalchemy import select
 
 
 bp = Blueprint("history", __name__, url_prefix="/history")
@@ -21,6 +25,35 @@ def _is_admin():
     admin = current_app.config.get("ADMIN_EMAIL")
     return bool(admin and email and email.lower() == admin.lower())
 
+def _rendered(ex):
+    """(feedback_html, idioma): lo guardado al analizar o, en filas antiguas, recalculado."""
+    if ex.feedback_html is not None and ex.render_version == RENDER_VERSION:
+        return ex.feedback_html, ex.feedback_lang or "es"
+    idioma = detectar_idioma((ex.feedback_text or "") + " " + (ex.jd_lang or ""))  # 'es'/'en'
+    return sanitize_markdown(ex.feedback_text or ""), idioma
+
+def _with_body(ex):
+    """La misma Execution con feedback/ATS cargados (diferidos por defecto); tras el 304."""
+    return db.session.get(Execution, ex.id, options=[Execution.with_body()], populate_existing=True)
+
+def _etag(ex, kind):
+    # Una Execution no cambia: la respuesta solo depende de la versión de render,
+    # de la app (plantillas) y del idioma de la interfaz
+    lang = (session.get("lang") or "es").lower()
+    return f"{kind}-{ex.id}-{RENDER_VERSION}-{current_app.config.get('APP_VERSION', 'v0')}-{lang}"
+
+def _not_modified(etag):
+    """304 si el navegador ya tiene esta versión (antes de renderizar nada)."""
+    if request.if_none_match.contains(etag):
+        resp = make_response("", 304)
+        return _cache_headers(resp, etag)
+    return None
+
+def _cache_headers(resp, etag):
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
 @bp.route("/history")
 def history():
     email = session.get("user_email")
@@ -29,29 +62,27 @@ def history():
     if not admin:
         abort(403)  # o: flash("Acceso solo para admin"); return redirect(url_for("main.index"))
     
-    page_exec = int(request.args.get("page_exec", 1))
-    page_cmt  = int(request.args.get("page_cmt", 1))
-    per_page  = int(request.args.get("per_page", 20))
-
-    exec_q = Execution.query.order_by(Execution.created_at.desc())
-    cmt_q  = Comment.query.order_by(Comment.created_at.desc())
-
-    executions = exec_q.limit(per_page).offset((page_exec-1)*per_page).all()
-    total_exec = exec_q.count()
-    pages_exec = max(1, (total_exec + per_page - 1)//per_page)
-
-    comments = cmt_q.limit(per_page).offset((page_cmt-1)*per_page).all()
-    total_cmt = cmt_q.count()
-    pages_cmt = max(1, (total_cmt + per_page - 1)//per_page)
+    # Keyset sobre (created_at, id) con índices compuestos: cada lista lleva su
+    # cursor (?exec_after/?exec_before, ?cmt_after/?cmt_before) y conserva el de la otra
+    per_page = clamp_per_page(request.args.get("per_page"), default=20)
+    cursors = {k: request.args.get(k) for k in ("exec_after", "exec_before", "cmt_after", "cmt_before")}
+
+    exec_page = keyset_page(select(Execution), [Execution.created_at, Execution.id],
+                            after=cursors["exec_after"], before=cursors["exec_before"],
+                            per_page=per_page)
+    cmt_page = keyset_page(select(Comment), [Comment.created_at, Comment.id],
+                           after=cursors["cmt_after"], before=cursors["cmt_before"],
+                           per_page=per_page)
 
     return render_template(
         "history.html",
         is_admin=True,
         email=email,
-        executions=executions,
-        comments=comments,
-        page_exec=page_exec, pages_exec=pages_exec,
-        page_cmt=page_cmt,   pages_cmt=pages_cmt,
+        executions=exec_page.items,
+        comments=cmt_page.items,
+        exec_page=exec_page, cmt_page=cmt_page,
+        total_exec=approx_count(Execution), total_cmt=approx_count(Comment),
+        cursors=cursors,
         per_page=per_page,
     )
 
@@ -64,49 +95,22 @@ def export_history():
     is_admin = _is_admin()
     kind = (request.args.get("kind") or "executions").lower()
 
-    si = io.StringIO()
-    w = csv.writer(si)
-
+    gz = request.args.get("gzip") in ("1", "true")
     now = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
 
+    # CSV en streaming: solo las columnas exportadas, por lotes, sin armarlo en memoria
     if kind == "comments":
-        q = Comment.query.order_by(Comment.created_at.desc())
-        if not is_admin:
-            q = q.filter(Comment.email == viewer)
-        w.writerow(["created_at", "name", "email", "text"])
-        for c in q.all():
-            w.writerow([
-                c.created_at.isoformat(),
-                c.name or "",
-                c.email or "",
-                (c.text or "").replace("\n", " ")
-            ])
+        fields, stmt = COMMENT_FIELDS, export_stmt(COMMENT_FIELDS, Comment, None if is_admin else viewer)
         filename = f"comments_{'all' if is_admin else viewer}_{now}.csv"
     else:
-        q = Execution.query.order_by(Execution.created_at.desc())
-        if not is_admin:
-            q = q.filter(Execution.email == viewer)
-        w.writerow(["created_at","email","filename","ext","size_bytes","model_vendor","model_name","score","resume_lang","jd_lang"])
-        for e in q.all():
-            w.writerow([
-                e.created_at.isoformat(),
-                e.email,
-                e.uploaded_filename or "",
-                e.uploaded_ext or "",
-                e.uploaded_size or 0,
-                e.model_vendor or "",
-                e.model_name or "",
-                e.score if e.score is not None else "",
-                e.resume_lang or "",
-                e.jd_lang or ""
-            ])
+        fields, stmt = EXECUTION_FIELDS, export_stmt(EXECUTION_FIELDS, Execution, None if is_admin else viewer)
         filename = f"executions_{'all' if is_admin else viewer}_{now}.csv"
 
-    out = si.getvalue()
+    body = encode_chunks(csv_chunks(fields, stream_rows(db.session, stmt)), gzip=gz)
     return Response(
-        out,
-        mimetype="text/csv; charset=utf-8",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        stream_with_context(body),
+        mimetype="application/gzip" if gz else "text/csv; charset=utf-8",
+        headers={"Content-Disposition": f"attachment; filename={filename}{'.gz' if gz else ''}"}
     )
 
 @bp.route("/download-pdf/<int:exec_id>")
@@ -125,13 +129,19 @@ def download_pdf(exec_id):
         flash("No tienes acceso a este análisis.", "danger")
         return redirect(url_for("history.history"))
 
-    buffer = render_analysis_pdf(ex)
-    return send_file(
+    etag = _etag(ex, "pdf")
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+
+    buffer = render_analysis_pdf(_with_body(ex))
+    resp = send_file(
         buffer,
         as_attachment=True,
         download_name=f"analisis_{ex.id}.pdf",
         mimetype="application/pdf"
     )
+    return _cache_headers(resp, etag)
 
 @bp.route("/print/<int:exec_id>")
 def print_view(exec_id):
@@ -139,17 +149,19 @@ def print_view(exec_id):
     if not ex:
         abort(404)
 
-    # Sanitiza el feedback; si ya guardas HTML, puedes omitir sanitize_markdown
-    feedback_html = sanitize_markdown(ex.feedback_text or "")
+    etag = _etag(ex, "print")
+    cached = _not_modified(etag)
+    if cached:
+        return cached
 
-    # Idioma para el disclaimer (simple pero suficiente)
-    idioma = detectar_idioma((ex.feedback_text or "") + " " + (ex.jd_lang or ""))  # 'es'/'en'
+    # HTML sanitizado, idioma y ATS guardados al analizar: aquí solo se leen
+    # (en ejecuciones antiguas sin ats_details el bloque se oculta)
+    ex = _with_body(ex)
+    feedback_html, idioma = _rendered(ex)
     disclaimer = disclaimer_text(idioma)
+    ats_details = ex.ats_details
 
-    # Si no persistes ats_details, pasa None y el bloque se ocultará automáticamente
-    ats_details = None
-
-    return render_template(
+    html = render_template(
         "print_analysis.html",
         created_at=ex.created_at,
         email=ex.email,
@@ -163,3 +175,4 @@ def print_view(exec_id):
         ats_details=ats_details,
         max_mb=2  # o current_app.config.get("MAX_MB", 2)
     )
+    return _cache_headers(make_response(html), etag)
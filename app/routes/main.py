@@ -2,22 +2,21 @@
 from flask import (
     Blueprint, render_template, request,
     session, redirect, url_for, flash, make_response,
-    send_from_directory, current_app, jsonify
+    send_from_directory, current_app, jsonify, Response, stream_with_context
 )
 from datetime import datetime
-from sqlalchemy import asc
+from sqlalchemy import asc, func, select
+from werkzeug.exceptions import RequestEntityTooLarge
 
 from ..extensions import db
-from ..models import User, Execution, Comment, Membership
-from ..services.security import allowed_file, looks_suspicious
-from ..services.files import extract_pdf, extract_docx
-from ..services.ai import (
-    analizar_openai, analizar_gemini, extraer_score,
-    sanitize_markdown, detectar_idioma, disclaimer_text
-)
-from ..services.ats import evaluate_ats_compliance
+from ..models import Comment, AnalysisJob
+from ..services.security import allowed_file
+from ..services.files import read_upload, UploadTooLarge
+from ..services.analysis import run_analysis, run_batch_match, check_quota, AnalysisError
+from ..services.jobs import submit_job, expire_stale
+from ..services import tracing
 from ..i18n import tr   # <-- i18n helper
-import re
+import json, os, threading, time
 
 bp = Blueprint("main", __name__)
 MAX_MB = 2
@@ -27,6 +26,24 @@ def _is_admin():
     admin = current_app.config.get("ADMIN_EMAIL")
     return bool(admin and email and email.lower() == admin.lower())
 
+def _include_job_timings(result):
+    """Etapas del análisis (guardadas por el job) en el Server-Timing de esta respuesta."""
+    t = tracing.current()
+    if t is not None:
+        t.include(result.pop("timings", None), prefix="analysis-")
+
+@bp.app_errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    # El body supera MAX_CONTENT_LENGTH: werkzeug corta antes de bufferizarlo
+    lang = (session.get("lang") or "es").lower()
+    # Es app-wide: /batch y los clientes JSON esperan un 413, no el redirect del formulario
+    wants_json = (request.accept_mimetypes.accept_json
+                  and not request.accept_mimetypes.accept_html)
+    if request.path == url_for("main.batch_match") or wants_json:
+        return jsonify({"error": tr(lang, "err.too_big", max_mb=MAX_MB)}), 413
+    flash(tr(lang, "err.too_big", max_mb=MAX_MB))
+    return redirect(url_for("main.index"))
+
 @bp.route("/favicon.ico")
 def favicon():
     return send_from_directory(
@@ -98,231 +115,84 @@ def index():
                 flash(T("err.bad_ext"))
                 return redirect(url_for("main.index"))
 
-            data = file.read() or b""
-            if not data:
-                flash(T("err.empty"))
-                return redirect(url_for("main.index"))
-
-            if len(data) > MAX_MB * 1024 * 1024:
+            # Lectura por bloques con corte temprano (MAX_CONTENT_LENGTH ya acota el body)
+            try:
+                with tracing.stage("upload"):
+                    data = read_upload(file.stream, MAX_MB * 1024 * 1024)
+            except UploadTooLarge:
                 flash(T("err.too_big", max_mb=MAX_MB))
                 return redirect(url_for("main.index"))
 
-            # Extensión segura
-            ext = filename.rsplit(".", 1)[-1].lower()
-
-            # Extraer texto y metadatos (incluye fuentes normalizadas en meta["fonts"])
-            if ext == "pdf":
-                cv_text, pdf_meta = extract_pdf(data)   # -> (texto, {"pages","images","fonts"})
-                docx_meta = None
-            else:  # docx
-                cv_text, docx_meta = extract_docx(data) # -> (texto, {"tables","images","fonts"})
-                pdf_meta = None
-
-            cv_text = cv_text or ""
-
-            if looks_suspicious(cv_text[:100000]):
-                flash(T("err.malicious"))
+            if not data:
+                flash(T("err.empty"))
                 return redirect(url_for("main.index"))
 
-            # Idioma del CV
-            res_lang = detectar_idioma(cv_text)  # 'en' / 'es'
-
-            # Fuentes para ATS (PDF o DOCX)
-            doc_fonts = None
-            if pdf_meta and isinstance(pdf_meta.get("fonts"), list):
-                doc_fonts = pdf_meta["fonts"]
-            elif docx_meta and isinstance(docx_meta.get("fonts"), list):
-                doc_fonts = docx_meta["fonts"]
-
-            # ATS score (estructura/lineamientos + tipografía)
-            score_ats, ats_details = evaluate_ats_compliance(
-                text=cv_text,
-                lang_code=res_lang,
-                ext=ext,
-                pdf_meta=pdf_meta,
-                docx_meta=docx_meta,
-                docx_fonts=doc_fonts
-            )
-
-            # ========= LLMs =========
-            model_vendor = None
-            model_name   = None
-            model_used   = None
-            feedback_text = None
-            oi_error = None
-
-            nombre_persona = name or email
-
-            # modelo elegido por admin (por defecto: auto)
-            selected_model = session.get("selected_model", "auto")
-            if selected_model not in ("auto", "openai", "gemini"):
-                selected_model = "auto"
-
-            if selected_model == "gemini":
-                fb_gemini = analizar_gemini(cv_text, jobdesc, nombre=None)
-                if fb_gemini:
-                    feedback_text = fb_gemini
-                    model_vendor  = "gemini"
-                    model_name    = "gemini-1.5-flash"
-                    model_used    = 2
-
-            elif selected_model == "openai":
-                fb_openai, oi_error = analizar_openai(cv_text, jobdesc, nombre=None)
-                if fb_openai:
-                    feedback_text = fb_openai
-                    model_vendor  = "openai"
-                    model_name    = "gpt-4o"
-                    model_used    = 1
-
-            else:  # auto
-                fb_openai, oi_error = analizar_openai(cv_text, jobdesc, nombre=None)
-                if fb_openai:
-                    feedback_text = fb_openai
-                    model_vendor  = "openai"
-                    model_name    = "gpt-4o"
-                    model_used    = 1
-                else:
-                    fb_gemini = analizar_gemini(cv_text, jobdesc, nombre=None)
-                    if fb_gemini:
-                        feedback_text = fb_gemini
-                        model_vendor  = "gemini"
-                        model_name    = "gemini-1.5-flash"
-                        model_used    = 2
-
-            if not feedback_text:
-                current_app.logger.error(
-                    "No se pudo generar feedback con el modelo '%s'. vendor=openai err=%s cv_len=%s jd_len=%s",
-                    selected_model, oi_error, len(cv_text or ""), len(jobdesc or "")
-                )
-                flash(T("err.analysis"))
+            # Sin cupo ni se encola (la reserva atómica la hace run_analysis)
+            try:
+                check_quota(email)
+            except AnalysisError as e:
+                session["limit_modal"] = {"limit": e.params.get("limit")}
                 return redirect(url_for("main.index"))
 
-            # Extraer score JD y limpiar encabezado numérico si viene como "NN%"
-            score_jd = extraer_score(feedback_text) if feedback_text else None
-            if feedback_text:
-                lines = feedback_text.splitlines()
-                if lines:
-                    first = lines[0].strip()
-                    if re.fullmatch(r"\d{1,3}\s*%", first):
-                        lines = lines[1:]
-                    elif re.match(r"^(Analysis for|Análisis (para|de))\b", first, re.IGNORECASE):
-                        lines = lines[1:]
-                feedback_text = "\n".join(lines).lstrip()
-
-            feedback_html = sanitize_markdown(feedback_text) if feedback_text else None
-
-            # Disclaimer según idioma (se pinta en plantilla)
-            idioma_detectado = detectar_idioma(cv_text + " " + jobdesc)
-            disclaimer = disclaimer_text(idioma_detectado)
-
-            def _default_membership():
-                return Membership.query.filter_by(code="level_1").first()   
-
-            # Persistencia
-            u = db.session.get(User, email)
-            if not u:
-                u = User(email=email)
-                db.session.add(u)
-            # asigna nivel 1 por defecto si existe
-            m = _default_membership()
-            if m:
-                u.membership = m
-                db.session.add(u)
-
-            if name: u.full_name = name
-            if picture: u.picture = picture
-            if occ: u.occupation = occ
-            db.session.commit()
-
-            # 0) Asegura que el usuario existe/trae su nivel
-            u = db.session.get(User, email)
-            if not u:
-                u = User(email=email)
-                # asigna nivel por defecto si existe                
-                m = Membership.query.filter_by(code="level_1").first()
-                if m:
-                    u.membership = m
-                db.session.add(u)
-                db.session.commit()
-
-            # 1) Calcula usados y límite
-            # Opción A: usar columna cacheada
-            # used = u.execs_used or 0
-
-            # Opción B (si prefieres calcular en vivo):
-            # from ..models import Execution
-            used = db.session.query(Execution).filter(Execution.email == email).count()
-
-            limit = u.exec_limit
-
-            if used >= limit:
-                # Guardamos datos para el modal en sesión
-                session["limit_modal"] = {
-                    "limit": limit,
-                    "lang": session.get("lang", "es")
-                }
-                return redirect(url_for("main.index"))       
-
-            jd_lang = detectar_idioma(jobdesc)
-
-            ex = Execution(
-                email=email,
-                uploaded_filename=filename,
-                uploaded_ext=ext,
-                uploaded_size=len(data),
-                resume_lang=res_lang,
-                jd_lang=jd_lang,
-                model_vendor=model_vendor,
-                model_name=model_name,
-                score=score_jd,
-                feedback_text=feedback_text,
-                ats_score=score_ats
+            # El análisis (extracción, ATS, LLM y persistencia) corre en el pool
+            # de services/jobs.py; la página sigue /jobs/<id>/stream (SSE) o
+            # hace polling a /jobs/<id>.
+            job_id = submit_job(
+                email, run_analysis,
+                stream=current_app.config.get("LLM_STREAMING_ENABLED", False),
+                email=email, name=name, picture=picture, occupation=occ,
+                filename=filename, data=data, jobdesc=jobdesc,
+                selected_model=session.get("selected_model", "auto"),
+                # admin puede forzar una llamada fresca con nocache=1
+                use_cache=(current_app.config.get("RESULT_CACHE_ENABLED", True)
+                           and not (_is_admin() and request.form.get("nocache"))),
             )
-            db.session.add(ex)
-            db.session.commit()
-
-            # incrementa usado (si usas execs_used)
-            u.execs_used = (u.execs_used or 0) + 1
-            db.session.commit()
-
-            # último análisis en users
-            u.last_model_vendor = model_vendor
-            u.last_model_name = model_name
-            u.last_score = score_jd
-            u.last_exec_id = ex.id
-            u.last_analysis_at = ex.created_at
-            db.session.commit()
-
-            resp = make_response(render_template(
-                "index.html",
-                # i18n helpers
-                t=T, is_en=is_en, lang=lang,
-                email=email, name=name, picture=picture,
-                feedback=feedback_html,
-                disclaimer=disclaimer,
-                score_jd=score_jd,
-                score_ats=score_ats,
-                ats_details=ats_details,
-                model_used=model_used,
-                exec_id=ex.id,
-                max_mb=MAX_MB,
-                jobdesc=jobdesc,
-                just_analyzed=True,
-                is_admin=_is_admin(),
-                show_limit_modal=False, limit_for_modal=None
-            ))
-            resp.headers["Content-Type"] = "text/html; charset=utf-8"
-            resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0, s-maxage=0"
-            resp.headers["Pragma"] = "no-cache"
-            return resp
+            return redirect(url_for("main.index", job=job_id))
 
+        except RequestEntityTooLarge:
+            raise  # lo atiende request_too_large
         except Exception:
             current_app.logger.exception("Error durante el análisis")
             flash(tr(lang, "err.generic"))
             return redirect(url_for("main.index"))
         
     limit_modal_data = session.pop("limit_modal", None)
-        
+
+    # GET con ?job=<id>: resultado listo o análisis aún en cola
+    job = None
+    job_id = request.args.get("job")
+    if email and job_id:
+        job = AnalysisJob.query.filter_by(id=job_id, email=email).first()
+
+    if job and job.status == "done":
+        result = json.loads(job.result_json or "{}")
+        _include_job_timings(result)
+        resp = make_response(render_template(
+            "index.html",
+            # i18n helpers
+            t=T, is_en=is_en, lang=lang,
+            email=email, name=name, picture=picture,
+            feedback=result.get("feedback"),
+            disclaimer=result.get("disclaimer"),
+            score_jd=result.get("score_jd"),
+            score_ats=result.get("score_ats"),
+            ats_details=result.get("ats_details"),
+            keywords=result.get("keywords"),
+            model_used=result.get("model_used"),
+            exec_id=result.get("exec_id"),
+            max_mb=MAX_MB,
+            jobdesc=None,
+            just_analyzed=True,
+            is_admin=_is_admin(),
+            show_limit_modal=False, limit_for_modal=None
+        ))
+        resp.headers["Content-Type"] = "text/html; charset=utf-8"
+        resp.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0, s-maxage=0"
+        resp.headers["Pragma"] = "no-cache"
+        return resp
+
+    pending_job = job.id if job and job.status in ("queued", "running") else None
+
     # GET
     return render_template(
         "index.html",
@@ -332,16 +202,208 @@ def index():
         email=email, name=name, picture=picture,
         feedback=None,
         score_jd=None, score_ats=None,
-        ats_details=None,
+        ats_details=None, keywords=None,
         model_used=None, exec_id=None,
         max_mb=MAX_MB, jobdesc=None,
         just_analyzed=False,
         is_admin=_is_admin(),
         show_limit_modal=bool(limit_modal_data),
-        limit_for_modal=(limit_modal_data or {}).get("limit")
+        limit_for_modal=(limit_modal_data or {}).get("limit"),
+        pending_job=pending_job
     )
 
 
+@bp.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Estado del análisis en cola (JSON para el polling de index.html)."""
+    lang = (session.get("lang") or "es").lower()
+    email = session.get("user_email")
+    if not email:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    job = AnalysisJob.query.filter_by(id=job_id, email=email).first()
+    if not job:
+        return jsonify({"error": "Not found"}), 404
+
+    expire_stale(job)
+    data = {"id": job.id, "status": job.status}
+
+    if job.status == "done":
+        result = json.loads(job.result_json or "{}")
+        _include_job_timings(result)
+        if result.get("batch"):
+            # batch: ranking en JSON, con enlace a cada Execution guardada
+            for m in result["matches"]:
+                if m.get("exec_id"):
+                    m["url"] = url_for("history.print_view", exec_id=m["exec_id"])
+                if m.get("error"):
+                    m["error"] = tr(lang, m["error"], **(m.pop("error_params", None) or {}))
+            data["matches"] = result["matches"]
+            data["score_ats"] = result.get("score_ats")
+        else:
+            data["redirect"] = url_for("main.index", job=job.id)
+    elif job.status == "failed":
+        params = json.loads(job.error_params or "{}")
+        if job.error_key == "err.limit_reached":
+            # Guardamos datos para el modal en sesión
+            session["limit_modal"] = {"limit": params.get("limit"), "lang": lang}
+        else:
+            flash(tr(lang, job.error_key or "err.generic", **params))
+        data["redirect"] = url_for("main.index")
+
+    resp = jsonify(data)
+    resp.headers["Cache-Control"] = "no-store"
+    return resp
+
+
+@bp.route("/batch", methods=["POST"])
+def batch_match():
+    """
+    Un CV contra varias JDs (campo `jobdesc` repetido). Encola el job y
+    devuelve 202 con su id; GET /jobs/<id> trae el ranking cuando termina.
+    """
+    lang = (session.get("lang") or "es").lower()
+    email = session.get("user_email")
+    if not email:
+        return jsonify({"error": tr(lang, "err.login")}), 401
+
+    file = request.files.get("cv")
+    filename = ((file.filename or "").strip() if file else "")
+    jobdescs = [jd.strip() for jd in request.form.getlist("jobdesc") if jd and jd.strip()]
+    max_jds = int(current_app.config.get("BATCH_MAX_JDS", 20))
+
+    if not filename:
+        return jsonify({"error": tr(lang, "err.no_file")}), 400
+    if not allowed_file(filename):
+        return jsonify({"error": tr(lang, "err.bad_ext")}), 400
+    if not jobdescs:
+        return jsonify({"error": tr(lang, "err.no_jd")}), 400
+    if len(jobdescs) > max_jds:
+        return jsonify({"error": tr(lang, "err.too_many_jds", max_jds=max_jds)}), 400
+
+    try:
+        with tracing.stage("upload"):
+            data = read_upload(file.stream, MAX_MB * 1024 * 1024)
+    except UploadTooLarge:
+        return jsonify({"error": tr(lang, "err.too_big", max_mb=MAX_MB)}), 413
+    if not data:
+        return jsonify({"error": tr(lang, "err.empty")}), 400
+
+    # Cada JD cuenta como un análisis: se rechaza entero si no alcanza el cupo
+    try:
+        check_quota(email, len(jobdescs))
+    except AnalysisError as e:
+        return jsonify({"error": tr(lang, e.key, **e.params)}), 403
+
+    job_id = submit_job(
+        email, run_batch_match,
+        email=email, name=session.get("user_name"), picture=session.get("user_picture"),
+        occupation=(request.form.get("occupation") or "").strip()[:200],
+        filename=filename, data=data, jobdescs=jobdescs,
+        selected_model=session.get("selected_model", "auto"),
+        use_cache=current_app.config.get("RESULT_CACHE_ENABLED", True),
+    )
+    return jsonify({"job_id": job_id, "status_url": url_for("main.job_status", job_id=job_id)}), 202
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+# Streams SSE abiertos en este proceso (cada uno ocupa un thread de gunicorn)
+_streams = {"sem": None, "pid": None}
+_streams_lock = threading.Lock()
+
+
+def _stream_slot():
+    """Semáforo del proceso ya adquirido, o None si no queda hueco."""
+    with _streams_lock:
+        if _streams["sem"] is None or _streams["pid"] != os.getpid():
+            _streams["sem"] = threading.BoundedSemaphore(
+                max(1, int(current_app.config.get("STREAM_MAX_OPEN", 4))))
+            _streams["pid"] = os.getpid()
+        sem = _streams["sem"]
+    return sem if sem.acquire(blocking=False) else None
+
+
+# Al comparar el parcial nuevo con lo ya enviado basta con el final: si el
+# texto cambió (otro vendor) el solapamiento no coincide y se manda un reset
+_OVERLAP = 32
+
+
+@bp.route("/jobs/<job_id>/stream")
+def job_stream(job_id):
+    """
+    Server-Sent Events con la salida parcial del LLM mientras el job corre.
+    event keywords → score local de palabras clave (antes que el LLM);
+    delta → {"text": trozo nuevo}; reset → {"text": todo} (cambió el vendor);
+    end → {"status", "status_url"}: la página consulta status_url para redirigir.
+    Con el streaming apagado responde 204 y sin hueco libre (STREAM_MAX_OPEN)
+    429: en los dos casos la página vuelve al polling de /jobs/<id>.
+    """
+    email = session.get("user_email")
+    if not email:
+        return jsonify({"error": "Unauthorized"}), 401
+    if not db.session.query(AnalysisJob.id).filter_by(id=job_id, email=email).first():
+        return jsonify({"error": "Not found"}), 404
+    if not current_app.config.get("LLM_STREAMING_ENABLED", False):
+        return "", 204
+
+    status_url = url_for("main.job_status", job_id=job_id)
+    slot = _stream_slot()
+    if slot is None:
+        resp = jsonify({"error": "Too many streams", "status_url": status_url})
+        resp.headers["Retry-After"] = "5"
+        return resp, 429
+
+    interval = float(current_app.config.get("STREAM_POLL_SECONDS", 0.25))
+    timeout = int(current_app.config.get("ANALYSIS_JOB_TIMEOUT", 300))
+    job = AnalysisJob.__table__.c
+    where = job.id == job_id
+
+    def events():
+        sent, status, preview_sent = "", "gone", False
+        deadline = time.monotonic() + timeout
+        yield "retry: 3000\n\n"
+        while time.monotonic() < deadline:
+            # Cada tick lee el estado, la longitud del parcial y solo su cola nueva
+            # (más el solapamiento); el preview solo hasta haberlo enviado
+            start = max(0, len(sent) - _OVERLAP)
+            cols = [job.status, func.length(job.partial_text), func.substr(job.partial_text, start + 1)]
+            if not preview_sent:
+                cols.append(job.preview_json)
+            row = db.session.execute(select(*cols).where(where)).first()
+            db.session.rollback()  # cierra la transacción: la próxima lectura ve lo nuevo
+            if row is None:
+                status = "gone"
+                break
+            status, length, tail = row[0], row[1] or 0, row[2] or ""
+            if not preview_sent and row[3]:
+                preview_sent = True
+                yield _sse("keywords", json.loads(row[3]).get("keywords") or {})
+            if length:  # al terminar se borra (longitud 0): eso no es un reset
+                if length >= len(sent) and tail.startswith(sent[start:]):
+                    piece = tail[len(sent) - start:]
+                    if piece:
+                        sent += piece
+                        yield _sse("delta", {"text": piece})
+                else:
+                    sent = db.session.execute(select(job.partial_text).where(where)).scalar() or ""
+                    db.session.rollback()
+                    yield _sse("reset", {"text": sent})
+            if status in ("done", "failed"):
+                break
+            time.sleep(interval)
+        yield _sse("end", {"status": status, "status_url": status_url})
+
+    resp = Response(stream_with_context(events()), mimetype="text/event-stream")
+    resp.headers["Cache-Control"] = "no-store"
+    resp.headers["X-Accel-Buffering"] = "no"  # que nginx no bufferice el stream
+    # call_on_close corre aunque el cliente se vaya antes de leer el primer evento
+    resp.call_on_close(slot.release)
+    return resp
+
+
 @bp.route('/feedback', methods=['POST'])
 def leave_comment():
     lang = (session.get("lang") or "es").lower()
@@ -1,19 +1,20 @@
-import re, langdetect, markdown, bleach
+import re, markdown, bleach
 from uuid import uuid4
 from ..extensions import openai_client, gemini_client
-import os, time, json
-from openai import OpenAI
+from .cache import TTLCache
+from .breaker import breakers
+from . import tracing
+from .lang import detectar_idioma  # noqa: F401
+import os, time, json, hashlib, threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from openai import Timeout
 
 # -------------------------------
 # Utilidades de idioma y puntaje
 # -------------------------------
 
-def detectar_idioma(texto):
-    try:
-        idioma = langdetect.detect(texto)
-        return "es" if idioma.startswith("es") else "en"
-    except Exception:
-        return "en"
+# detectar_idioma vive en services/lang.py (prefijo acotado, semilla fija y memo);
+# se reexporta aquí porque el resto de la app lo importa de este módulo.
 
 def extraer_score(texto):
     """
@@ -157,30 +158,87 @@ Avoid unnecessary repetition and keep it clear, concise, and professional.
     return prompt
 
 
+# -------------------------------
+# Caché de resultados (CV + JD idénticos)
+# -------------------------------
+# Súbelo cada vez que cambie _build_prompt o el post-proceso del texto:
+# invalida las respuestas guardadas con el prompt anterior.
+PROMPT_VERSION = "foda-v1"
+
+result_cache = TTLCache(
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", "512")),
+    ttl=int(os.getenv("RESULT_CACHE_TTL", str(24 * 3600))),
+)
+
+def _normalize_jobdesc(job_desc: str) -> str:
+    return " ".join((job_desc or "").split()).casefold()
+
+def result_cache_key(file_hash: str, job_desc: str, vendor: str, model: str | None) -> str:
+    """Clave por contenido: hash del archivo + JD normalizada + vendor/modelo + prompt."""
+    raw = "\x1f".join([
+        file_hash, _normalize_jobdesc(job_desc), vendor or "", model or "", PROMPT_VERSION
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
 # -------------------------------
 # LLMs (stateless por request)
 # -------------------------------
 MAX_CHARS = 9000  # recorta entradas muy largas para evitar vacíos por tokens
 
+# Timeouts por vendor (segundos): sin ellos un brown-out retiene el hilo hasta
+# que gunicorn lo mata a los 120 s.
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_READ_TIMEOUT    = float(os.getenv("OPENAI_READ_TIMEOUT", "60"))
+GEMINI_TIMEOUT         = float(os.getenv("GEMINI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES     = int(os.getenv("OPENAI_MAX_RETRIES", "0"))
+
 def _trim(txt, maxlen=MAX_CHARS):
     txt = txt or ""
     return txt[:maxlen]
 
-def analizar_openai(cv_text, job_desc, nombre: str | None = None):
+def _openai_usage(usage):
+    if usage is not None:
+        tracing.add_tokens("openai", getattr(usage, "prompt_tokens", 0), getattr(usage, "completion_tokens", 0))
+
+def _gemini_usage(out):
+    usage = getattr(out, "usage_metadata", None)
+    if usage is not None:
+        tracing.add_tokens("gemini", getattr(usage, "prompt_token_count", 0),
+                           getattr(usage, "candidates_token_count", 0))
+
+def analizar_openai(cv_text, job_desc, nombre: str | None = None, on_delta=None,
+                    prompt_cache_key: str | None = None, idioma: str | None = None):
     """
     Devuelve (texto_markdown, error). Usa Chat Completions (más estable).
     - Recorta entradas largas
     - Reintenta si viene vacío
     - Loguea breve diagnóstico si no hay contenido
+    - Con `on_delta(texto_acumulado)` usa stream=True y lo llama por cada trozo
+    - `prompt_cache_key`: mismo valor para prompts con el mismo prefijo
+      (instrucciones + CV) → OpenAI reutiliza el prefijo cacheado
+    - `idioma`: el del CV+JD si quien llama ya lo detectó
     """
-    idioma = detectar_idioma((cv_text or "") + " " + (job_desc or ""))
+    idioma = idioma or detectar_idioma((cv_text or "") + " " + (job_desc or ""))
     prompt = _build_prompt(_trim(cv_text), _trim(job_desc), idioma, nombre)
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
+    if not os.getenv("OPENAI_API_KEY"):
         return None, "OPENAI_API_KEY no está definido"
 
-    client = OpenAI(api_key=api_key)
+    # Cliente del proceso (pool keep-alive); with_options comparte ese pool.
+    # Antes de allow(): en half-open allow() reserva la sonda y un return sin
+    # record_* la dejaría pendiente para siempre.
+    base = openai_client()
+    if base is None:
+        return None, "No se pudo crear el cliente de OpenAI"
+
+    breaker = breakers["openai"]
+    if not breaker.allow():
+        return None, "Circuit breaker de OpenAI abierto"
+
+    client = base.with_options(
+        timeout=Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        max_retries=OPENAI_MAX_RETRIES,  # reintentos del SDK; el breaker ve el total
+    )
 
     # modelos sugeridos para dev: gpt-4o-mini ; prod: gpt-4o
     model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
@@ -192,20 +250,52 @@ def analizar_openai(cv_text, job_desc, nombre: str | None = None):
         {"role": "user", "content": prompt},
     ]
 
+    # prompt_cache_key va en extra_body: funciona también con SDKs sin el parámetro
+    extra = {"extra_body": {"prompt_cache_key": prompt_cache_key}} if prompt_cache_key else {}
+
     last_err = None
+    t0 = time.monotonic()
     for attempt in range(2):  # 1 retry sencillo
+        first_at = None
         try:
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.2,
-                max_tokens=1200,  # suficiente para el análisis
-            )
-            text = ""
-            if resp and resp.choices:
-                text = (resp.choices[0].message.content or "").strip()
+            if on_delta is None:
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.2,
+                    max_tokens=1200,  # suficiente para el análisis
+                    **extra,
+                )
+                _openai_usage(getattr(resp, "usage", None))
+                text = ""
+                if resp and resp.choices:
+                    text = (resp.choices[0].message.content or "").strip()
+            else:
+                stream = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.2,
+                    max_tokens=1200,
+                    stream=True,
+                    stream_options={"include_usage": True},  # el último trozo trae los tokens
+                    **extra,
+                )
+                text = ""
+                for chunk in stream:
+                    piece = chunk.choices[0].delta.content if chunk.choices else None
+                    if piece:
+                        if not text:
+                            first_at = time.monotonic()
+                        text += piece
+                        on_delta(text)
+                    if getattr(chunk, "usage", None):
+                        _openai_usage(chunk.usage)
+                text = text.strip()
 
             if text:
+                # En streaming el breaker mide hasta el primer trozo: la duración
+                # total depende de lo larga que sea la respuesta
+                breaker.record_success((first_at if first_at else time.monotonic()) - t0)
                 return text, None
 
             # sin texto: intenta segundo intento
@@ -215,6 +305,8 @@ def analizar_openai(cv_text, job_desc, nombre: str | None = None):
             last_err = f"Excepción OpenAI: {e}"
             break
 
+    breaker.record_failure(last_err or "sin contenido", latency=time.monotonic() - t0)
+
     # diagnóstico breve (no loguees prompts completos en prod)
     try:
         # en tu logger de Flask:
@@ -228,28 +320,133 @@ def analizar_openai(cv_text, job_desc, nombre: str | None = None):
 
     return None, last_err or "Respuesta vacía de OpenAI"
 
-def analizar_gemini(cv_text, job_desc, nombre: str | None = None):
+def analizar_gemini(cv_text, job_desc, nombre: str | None = None, on_delta=None,
+                    idioma: str | None = None):
     """
     Devuelve texto markdown con el mismo formato que OpenAI.
     Stateless: no reusamos chat/historial entre llamadas.
+    Con `on_delta(texto_acumulado)` usa stream=True, igual que analizar_openai.
     """
-    idioma = detectar_idioma((cv_text or "") + " " + (job_desc or ""))
+    idioma = idioma or detectar_idioma((cv_text or "") + " " + (job_desc or ""))
     prompt = _build_prompt(cv_text, job_desc, idioma, nombre=None)  # forzamos neutro
 
     try:
         g = gemini_client()
-        if not g:
-            return None
-        model = g.GenerativeModel("gemini-1.5-flash")
-        out = model.generate_content(prompt)
-        return getattr(out, "text", None)
     except Exception:
+        g = None
+    if not g:
+        return None
+
+    breaker = breakers["gemini"]
+    if not breaker.allow():
+        return None
+
+    t0 = time.monotonic()
+    first_at = None  # primer trozo en streaming: es lo que mide el breaker
+    try:
+        model = g.GenerativeModel("gemini-1.5-flash")
+        if on_delta is None:
+            out = model.generate_content(prompt, request_options={"timeout": GEMINI_TIMEOUT})
+            text = getattr(out, "text", None)
+            _gemini_usage(out)
+        else:
+            out = model.generate_content(prompt, stream=True,
+                                         request_options={"timeout": GEMINI_TIMEOUT})
+            text = ""
+            for chunk in out:
+                piece = getattr(chunk, "text", None)
+                if piece:
+                    if not text:
+                        first_at = time.monotonic()
+                    text += piece
+                    on_delta(text)
+            _gemini_usage(out)  # tras consumir el stream: totales de toda la respuesta
+    except Exception as e:
+        breaker.record_failure(f"Excepción Gemini: {e}", latency=time.monotonic() - t0)
         return None
 
+    if text:
+        breaker.record_success((first_at or time.monotonic()) - t0)
+    else:
+        breaker.record_failure("Gemini sin contenido", latency=time.monotonic() - t0)
+    return text
+
+# -------------------------------
+# Modo "hedged" (auto): OpenAI y, si tarda, Gemini en paralelo
+# -------------------------------
+_hedge = {"executor": None, "pid": None}
+_hedge_lock = threading.Lock()
+hedge_stats = {"calls": 0, "hedged": 0, "won_openai": 0, "won_gemini": 0, "failed": 0}
+
+def _hedge_executor():
+    with _hedge_lock:
+        if _hedge["executor"] is None or _hedge["pid"] != os.getpid():
+            _hedge["executor"] = ThreadPoolExecutor(
+                max_workers=int(os.getenv("LLM_HEDGE_THREADS", "16")),
+                thread_name_prefix="llm-hedge",
+            )
+            _hedge["pid"] = os.getpid()
+        return _hedge["executor"]
+
+def _count(key):
+    with _hedge_lock:
+        hedge_stats[key] += 1
+
+def analizar_hedged(cv_text, job_desc, hedge_after: float, idioma: str | None = None):
+    """
+    Devuelve (texto, vendor, error). Lanza OpenAI; si no hay respuesta válida en
+    `hedge_after` segundos (o falla antes), lanza Gemini y gana el primero con
+    texto. El perdedor no se puede interrumpir a mitad de la llamada HTTP: se
+    cancela si aún no empezó y, si no, su resultado se descarta.
+    """
+    pool = _hedge_executor()
+    _count("calls")
+
+    def _openai():
+        return analizar_openai(cv_text, job_desc, nombre=None, idioma=idioma)
+
+    def _gemini():
+        return analizar_gemini(cv_text, job_desc, nombre=None, idioma=idioma), None
+
+    pending = {pool.submit(tracing.wrap(_openai)): "openai"}
+    done, _ = wait(pending, timeout=hedge_after)
+    last_err = None
+    gemini_started = False
+
+    while True:
+        for fut in done:
+            vendor = pending.pop(fut)
+            try:
+                text, err = fut.result()
+            except Exception as e:
+                text, err = None, str(e)
+            if text:
+                for other in pending:
+                    other.cancel()
+                _count(f"won_{vendor}")
+                return text, vendor, None
+            last_err = err or last_err
+
+        if not gemini_started:
+            gemini_started = True
+            if pending:
+                _count("hedged")  # OpenAI sigue en vuelo: carrera
+            pending[pool.submit(tracing.wrap(_gemini))] = "gemini"
+
+        if not pending:
+            _count("failed")
+            return None, None, last_err
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
 # -------------------------------
 # Sanitizado a HTML seguro
 # -------------------------------
 
+# Súbelo si cambian las etiquetas permitidas o las extensiones de markdown:
+# el HTML guardado en Execution con otra versión se vuelve a generar al leerlo.
+SANITIZER_VERSION = "san-v1"
+RENDER_VERSION = f"{PROMPT_VERSION}+{SANITIZER_VERSION}"
+
 def sanitize_markdown(md_text):
     allowed_tags = [
         "p","ul","ol","li","strong","em","b","i","br","hr","blockquote","code","pre",
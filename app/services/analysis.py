@@ -0,0 +1,550 @@
+# app/services/analysis.py
+"""
+Pipeline completo de un análisis: extracción → ATS → LLM → persistencia.
+
+Antes vivía dentro de main.index; ahora lo ejecuta el pool de services/jobs.py
+para que el request de subida no quede bloqueado por la latencia del LLM.
+Devuelve un dict serializable con lo que necesita index.html para pintar.
+"""
+import hashlib, json, os, re, threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import User, Execution, Membership
+from .security import looks_suspicious
+from .files import extract_document, ExtractionFailed
+from .ai import (
+    analizar_openai, analizar_gemini, analizar_hedged, extraer_score,
+    sanitize_markdown, detectar_idioma, disclaimer_text,
+    result_cache, result_cache_key, RENDER_VERSION
+)
+from .ats import evaluate_ats_compliance
+from .keywords import keyword_match
+from .lang import combine_langs
+from . import similarity, stats, tracing
+from ..i18n import tr
+
+
+class AnalysisError(Exception):
+    """Error esperado del pipeline; `key` es la clave i18n que verá el usuario."""
+
+    def __init__(self, key: str, **params):
+        super().__init__(key)
+        self.key = key
+        self.params = params
+
+
+def _models_tag() -> str:
+    """Modelos configurados; forman parte de la clave de caché."""
+    return "|".join([os.getenv("OPENAI_MODEL", "gpt-4o-mini"), "gemini-1.5-flash"])
+
+
+# -------------------------------
+# Cupo: users.execs_used es el contador
+# -------------------------------
+# Límite efectivo en SQL, igual que User.exec_limit (override > nivel > 10)
+def _limit_expr():
+    level = (select(Membership.max_execs)
+             .where(Membership.id == User.membership_id)
+             .scalar_subquery())
+    return func.coalesce(User.exec_limit_override, level, 10)
+
+
+def _ensure_user(email):
+    """Crea el usuario (con el nivel por defecto) si aún no existe."""
+    if db.session.get(User, email):
+        return
+    m = Membership.query.filter_by(code="level_1").first()
+    db.session.add(User(email=email, execs_used=0, membership=m))
+    try:
+        db.session.commit()
+    except IntegrityError:  # otro worker lo creó a la vez
+        db.session.rollback()
+
+
+def check_quota(email, needed=1):
+    """Lanza AnalysisError('err.limit_reached') si al usuario no le quedan `needed` análisis (sin reservar)."""
+    u = db.session.get(User, email)
+    limit = u.exec_limit if u else 10
+    used = (u.execs_used or 0) if u else 0
+    if used + needed > limit:
+        raise AnalysisError("err.limit_reached", limit=limit)
+
+
+def reserve_quota(email, needed=1):
+    """
+    Reserva `needed` análisis ANTES de extraer/llamar al LLM: un único UPDATE
+    condicional (execs_used + n <= límite) que la BD serializa por fila, así
+    dos workers no pueden pasar el límite a la vez. Se confirma enseguida para
+    no retener el lock mientras dura el análisis. Si no hay cupo lanza
+    AnalysisError('err.limit_reached'); si el análisis falla, release_quota.
+    """
+    _ensure_user(email)
+    res = db.session.execute(
+        update(User)
+        .where(User.email == email,
+               func.coalesce(User.execs_used, 0) + needed <= _limit_expr())
+        .values(execs_used=func.coalesce(User.execs_used, 0) + needed)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if res.rowcount != 1:
+        u = db.session.get(User, email)
+        raise AnalysisError("err.limit_reached", limit=u.exec_limit)
+
+
+def release_quota(email, n=1):
+    """Devuelve `n` análisis reservados que no llegaron a guardarse."""
+    if n <= 0:
+        return
+    db.session.rollback()  # por si la transacción del que falló quedó abierta
+    db.session.execute(
+        update(User)
+        .where(User.email == email)
+        .values(execs_used=case((User.execs_used > n, User.execs_used - n), else_=0))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+
+
+def run_analysis(*, email, name, picture, occupation, filename, data, jobdesc,
+                 selected_model="auto", use_cache=True, on_delta=None, on_preview=None):
+    """
+    `on_delta(texto)` recibe la salida parcial del LLM (streaming) y
+    `on_preview(dict)` el score local de palabras clave antes del LLM; opcionales.
+    """
+    ext = filename.rsplit(".", 1)[-1].lower()
+
+    if selected_model not in ("auto", "openai", "gemini"):
+        selected_model = "auto"
+
+    # Sin cupo no se extrae ni se gasta LLM; si algo falla se devuelve el hueco
+    with tracing.stage("quota"):
+        reserve_quota(email)
+    try:
+        # Mismo archivo + misma JD + mismo modelo/prompt => mismo resultado, sin LLM
+        file_hash = hashlib.sha256(data).hexdigest()
+        key = result_cache_key(file_hash, jobdesc, selected_model, _models_tag())
+        out = result_cache.get(key) if use_cache else None
+        if out is None:
+            out = _analyze(ext, data, file_hash, jobdesc, selected_model, on_delta, on_preview)
+            if out["model_vendor"] != "local":  # el fallback sin LLM no se cachea
+                result_cache.set(key, out)
+
+        with tracing.stage("persist"):
+            return _persist(
+                email=email, name=name, picture=picture, occupation=occupation,
+                filename=filename, ext=ext, size=len(data), out=out,
+                file_hash=file_hash, jobdesc=jobdesc, trace=tracing.current(),
+            )
+    except BaseException:
+        release_quota(email)
+        raise
+
+
+# -------------------------------
+# Batch: un CV contra varias JDs
+# -------------------------------
+_fanout = {"executor": None, "pid": None}
+_fanout_lock = threading.Lock()
+
+
+def _fanout_executor(app):
+    """Pool por proceso para las llamadas al LLM del batch: acota la concurrencia."""
+    with _fanout_lock:
+        if _fanout["executor"] is None or _fanout["pid"] != os.getpid():
+            _fanout["executor"] = ThreadPoolExecutor(
+                max_workers=max(1, int(app.config.get("BATCH_LLM_CONCURRENCY", 4))),
+                thread_name_prefix="batch-llm",
+            )
+            _fanout["pid"] = os.getpid()
+        return _fanout["executor"]
+
+
+def run_batch_match(*, email, name, picture, occupation, filename, data, jobdescs,
+                    selected_model="auto", use_cache=True):
+    """
+    Un CV contra varias JDs: se extrae y evalúa (ATS) una sola vez y las
+    llamadas al LLM salen en paralelo (BATCH_LLM_CONCURRENCY). Todas comparten
+    el prefijo instrucciones + CV del prompt (prompt_cache_key = hash del CV).
+    Cada JD cuenta como un análisis en el cupo (se reservan todas al empezar y
+    se devuelven las que fallen) y guarda su propia Execution.
+    """
+    ext = filename.rsplit(".", 1)[-1].lower()
+    if selected_model not in ("auto", "openai", "gemini"):
+        selected_model = "auto"
+
+    with tracing.stage("quota"):
+        reserve_quota(email, len(jobdescs))
+    saved = 0
+    try:
+        file_hash = hashlib.sha256(data).hexdigest()
+        cv = _extract(ext, data, file_hash)
+        app = current_app._get_current_object()
+
+        parent = tracing.current()
+
+        def one(jobdesc):
+            # Traza propia por JD (lo suyo también suma en la del job): es la que se guarda
+            with tracing.trace("analysis", parent=parent) as t:
+                key = result_cache_key(file_hash, jobdesc, selected_model, _models_tag())
+                out = result_cache.get(key) if use_cache else None
+                if out is None:
+                    with app.app_context():
+                        out = {**cv["out"], **_feedback(cv["text"], jobdesc, selected_model,
+                                                        prompt_cache_key=file_hash, file_hash=file_hash,
+                                                        res_lang=cv["out"]["res_lang"])}
+                    if out["model_vendor"] != "local":
+                        result_cache.set(key, out)
+            return out, t
+
+        pool = _fanout_executor(app)
+        futures = [pool.submit(tracing.wrap(one), jd) for jd in jobdescs]
+
+        matches = []
+        for i, (jobdesc, fut) in enumerate(zip(jobdescs, futures)):
+            item = {"index": i, "jobdesc": jobdesc[:160], "error": None}
+            try:
+                out, jd_trace = fut.result()
+                with tracing.stage("persist"):
+                    res = _persist(
+                        email=email, name=name, picture=picture, occupation=occupation,
+                        filename=filename, ext=ext, size=len(data), out=out,
+                        file_hash=file_hash, jobdesc=jobdesc, trace=jd_trace,
+                    )
+                saved += 1
+                item.update(exec_id=res["exec_id"], score_jd=res["score_jd"],
+                            score_ats=res["score_ats"], model_used=res["model_used"],
+                            keyword_score=(res["keywords"] or {}).get("score"))
+            except AnalysisError as e:
+                item["error"], item["error_params"] = e.key, e.params
+            matches.append(item)
+    finally:
+        release_quota(email, len(jobdescs) - saved)
+
+    # Mejor coincidencia primero (score del LLM o, sin él, el de palabras clave); errores al final
+    def _rank(m):
+        score = m.get("score_jd") if m.get("score_jd") is not None else m.get("keyword_score")
+        return (score is None, -(score or 0), m["index"])
+    matches.sort(key=_rank)
+    return {"batch": True, "score_ats": cv["out"]["score_ats"], "matches": matches}
+
+
+def evaluate_document(cv_text, meta, ext):
+    """Idioma + score ATS de un CV ya extraído (sin BD ni LLM)."""
+    # meta: PDF -> {"pages","images","fonts"} ; DOCX -> {"tables","images","fonts"}
+    pdf_meta = meta if ext == "pdf" else None
+    docx_meta = meta if ext != "pdf" else None
+
+    # Idioma del CV
+    with tracing.stage("lang"):
+        res_lang = detectar_idioma(cv_text)  # 'en' / 'es'
+
+    # Fuentes para ATS (PDF o DOCX)
+    doc_fonts = None
+    if pdf_meta and isinstance(pdf_meta.get("fonts"), list):
+        doc_fonts = pdf_meta["fonts"]
+    elif docx_meta and isinstance(docx_meta.get("fonts"), list):
+        doc_fonts = docx_meta["fonts"]
+
+    # ATS score (estructura/lineamientos + tipografía)
+    with tracing.stage("ats"):
+        score_ats, ats_details = evaluate_ats_compliance(
+            text=cv_text,
+            lang_code=res_lang,
+            ext=ext,
+            pdf_meta=pdf_meta,
+            docx_meta=docx_meta,
+            docx_fonts=doc_fonts
+        )
+    return res_lang, score_ats, ats_details
+
+
+def _analyze(ext, data, file_hash, jobdesc, selected_model, on_delta=None, on_preview=None):
+    """Extracción + ATS + LLM. Solo depende del contenido (cacheable)."""
+    cv = _extract(ext, data, file_hash)
+    return {**cv["out"], **_feedback(cv["text"], jobdesc, selected_model, on_delta,
+                                     on_preview=on_preview, file_hash=file_hash,
+                                     res_lang=cv["out"]["res_lang"])}
+
+
+def _extract(ext, data, file_hash):
+    """Texto del CV + idioma + ATS; lo comparten el análisis simple y el batch."""
+    # Extraer texto y metadatos (incluye fuentes normalizadas en meta["fonts"])
+    # PDF -> {"pages","images","fonts"} ; DOCX -> {"tables","images","fonts"}
+    try:
+        with tracing.stage("extract"):
+            cv_text, meta = extract_document(data, ext, sha256=file_hash)
+    except ExtractionFailed:
+        raise AnalysisError("err.empty")
+    cv_text = cv_text or ""
+
+    with tracing.stage("security"):
+        suspicious = looks_suspicious(cv_text[:100000])
+    if suspicious:
+        raise AnalysisError("err.malicious")
+
+    res_lang, score_ats, ats_details = evaluate_document(cv_text, meta, ext)
+    return {
+        "text": cv_text,
+        "out": {"res_lang": res_lang, "score_ats": score_ats, "ats_details": ats_details},
+    }
+
+
+def _feedback(cv_text, jobdesc, selected_model, on_delta=None, prompt_cache_key=None,
+              on_preview=None, file_hash=None, res_lang=None):
+    """
+    Palabras clave (local) + LLM + post-proceso del texto para una JD.
+    Sin LLM disponible devuelve el resultado por palabras clave (model_vendor
+    "local") o, si está desactivado, lanza AnalysisError. Con JD_REUSE_THRESHOLD
+    y `file_hash`, reutiliza el feedback de un análisis previo del mismo CV con
+    una JD casi igual. `res_lang` (idioma del CV) evita volver a detectarlo.
+    """
+    # Idiomas una sola vez por análisis: JD, CV y, derivado de ambos, el del
+    # prompt/disclaimer (antes se detectaba CV+JD otras dos veces)
+    with tracing.stage("lang"):
+        jd_lang = detectar_idioma(jobdesc)
+        idioma_detectado = combine_langs(cv_text, res_lang or detectar_idioma(cv_text), jobdesc, jd_lang)
+    with tracing.stage("keywords"):
+        keywords = keyword_match(cv_text, jobdesc, lang=jd_lang)
+    if on_preview:
+        on_preview({"keywords": keywords})
+
+    # ========= LLMs =========
+    model_vendor = None
+    model_name   = None
+    model_used   = None
+    feedback_text = None
+    oi_error = None
+    with tracing.stage("similar"):
+        reused = _similar_execution(file_hash, jobdesc, selected_model) if file_hash else None
+
+    # Con feedback reutilizado esta etapa queda en ~0 ms (no hay llamada)
+    with tracing.stage("llm"):
+        if reused:
+            feedback_text = reused.feedback_text
+            model_vendor  = reused.model_vendor
+            model_name    = reused.model_name
+            model_used    = 1 if reused.model_vendor == "openai" else 2
+            if on_delta:
+                on_delta(feedback_text)
+
+        elif selected_model == "gemini":
+            fb_gemini = analizar_gemini(cv_text, jobdesc, nombre=None, on_delta=on_delta,
+                                        idioma=idioma_detectado)
+            if fb_gemini:
+                feedback_text = fb_gemini
+                model_vendor  = "gemini"
+                model_name    = "gemini-1.5-flash"
+                model_used    = 2
+
+        elif selected_model == "openai":
+            fb_openai, oi_error = analizar_openai(cv_text, jobdesc, nombre=None, on_delta=on_delta,
+                                                  prompt_cache_key=prompt_cache_key,
+                                                  idioma=idioma_detectado)
+            if fb_openai:
+                feedback_text = fb_openai
+                model_vendor  = "openai"
+                model_name    = "gpt-4o"
+                model_used    = 1
+
+        elif current_app.config.get("LLM_HEDGE_ENABLED"):  # auto, en carrera (sin streaming)
+            feedback_text, model_vendor, oi_error = analizar_hedged(
+                cv_text, jobdesc, current_app.config.get("LLM_HEDGE_AFTER_SECONDS", 8.0),
+                idioma=idioma_detectado,
+            )
+            if model_vendor == "openai":
+                model_name, model_used = "gpt-4o", 1
+            elif model_vendor == "gemini":
+                model_name, model_used = "gemini-1.5-flash", 2
+
+        else:  # auto
+            # Con el breaker de OpenAI abierto esto vuelve al instante y pasamos a Gemini
+            fb_openai, oi_error = analizar_openai(cv_text, jobdesc, nombre=None, on_delta=on_delta,
+                                                  prompt_cache_key=prompt_cache_key,
+                                                  idioma=idioma_detectado)
+            if fb_openai:
+                feedback_text = fb_openai
+                model_vendor  = "openai"
+                model_name    = "gpt-4o"
+                model_used    = 1
+            else:
+                # si OpenAI llegó a emitir algo, el parcial de Gemini lo reemplaza
+                fb_gemini = analizar_gemini(cv_text, jobdesc, nombre=None, on_delta=on_delta,
+                                            idioma=idioma_detectado)
+                if fb_gemini:
+                    feedback_text = fb_gemini
+                    model_vendor  = "gemini"
+                    model_name    = "gemini-1.5-flash"
+                    model_used    = 2
+
+    if not feedback_text:
+        current_app.logger.error(
+            "No se pudo generar feedback con el modelo '%s'. vendor=openai err=%s cv_len=%s jd_len=%s",
+            selected_model, oi_error, len(cv_text or ""), len(jobdesc or "")
+        )
+        if not (current_app.config.get("KEYWORD_FALLBACK_ENABLED", True) and keywords["score"] is not None):
+            raise AnalysisError("err.analysis")
+        # Ambos vendors caídos: al menos el análisis local de palabras clave
+        feedback_text = tr(
+            idioma_detectado, "kw.fallback_md",
+            matched=", ".join(keywords["matched"]) or "—",
+            missing=", ".join(keywords["missing"]) or "—",
+        )
+        model_vendor, model_name, model_used = "local", keywords["version"], 3
+
+    # Extraer score JD y limpiar encabezado numérico si viene como "NN%"
+    # (el feedback reutilizado ya viene limpio: su score es el guardado).
+    # El fallback local no pasa por extraer_score: cualquier número de una
+    # palabra clave ("windows 10") saldría como score; el suyo es el de keywords.
+    if model_vendor == "local":
+        score_jd = keywords["score"]
+    else:
+        score_jd = reused.score if reused else (extraer_score(feedback_text) if feedback_text else None)
+    if feedback_text and model_vendor != "local":
+        lines = feedback_text.splitlines()
+        if lines:
+            first = lines[0].strip()
+            if re.fullmatch(r"\d{1,3}\s*%", first):
+                lines = lines[1:]
+            elif re.match(r"^(Analysis for|Análisis (para|de))\b", first, re.IGNORECASE):
+                lines = lines[1:]
+        feedback_text = "\n".join(lines).lstrip()
+
+    with tracing.stage("render"):
+        feedback_html = sanitize_markdown(feedback_text) if feedback_text else None
+    disclaimer = disclaimer_text(idioma_detectado)  # se pinta en plantilla
+
+    return {
+        "jd_lang": jd_lang,
+        "keywords": keywords,
+        "keyword_score": keywords["score"],
+        "score_jd": score_jd,
+        "feedback_text": feedback_text,
+        "feedback_html": feedback_html,
+        "feedback_lang": idioma_detectado,
+        "disclaimer": disclaimer,
+        "model_vendor": model_vendor,
+        "model_name": model_name,
+        "model_used": model_used,
+    }
+
+
+def _similar_execution(file_hash, jobdesc, selected_model):
+    """
+    Execution previa del mismo CV (sha256) cuya JD se parece a `jobdesc` al
+    menos JD_REUSE_THRESHOLD (coseno del índice de JDs). 0 = desactivado.
+    """
+    threshold = float(current_app.config.get("JD_REUSE_THRESHOLD", 0) or 0)
+    if threshold <= 0 or not current_app.config.get("JD_INDEX_ENABLED", True):
+        return None
+    q = (db.session.query(Execution.id)
+         .filter(Execution.file_sha256 == file_hash,
+                 Execution.feedback_text.isnot(None),
+                 Execution.model_vendor.in_(("openai", "gemini")))
+         .order_by(Execution.id.desc()).limit(200))
+    if selected_model != "auto":
+        q = q.filter(Execution.model_vendor == selected_model)
+    candidates = [row[0] for row in q]
+    if not candidates:
+        return None
+    hits = similarity.jd_index.query(jobdesc, k=1, min_score=threshold, candidates=candidates)
+    return db.session.get(Execution, hits[0][0], options=[Execution.with_body()]) if hits else None
+
+
+def _compact_json(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")) if value is not None else None
+
+
+def _new_execution(*, email, filename, ext, size, out, file_hash=None, jobdesc=None):
+    return Execution(
+        email=email,
+        uploaded_filename=filename,
+        uploaded_ext=ext,
+        uploaded_size=size,
+        resume_lang=out["res_lang"],
+        jd_lang=out["jd_lang"],
+        model_vendor=out["model_vendor"],
+        model_name=out["model_name"],
+        score=out["score_jd"],
+        feedback_text=out["feedback_text"],
+        ats_score=out["score_ats"],
+        keyword_score=out.get("keyword_score"),
+        file_sha256=file_hash,
+        jobdesc=jobdesc,
+        feedback_html=out["feedback_html"],
+        feedback_lang=out.get("feedback_lang"),
+        ats_details_json=_compact_json(out["ats_details"]),
+        render_version=RENDER_VERSION,
+    )
+
+
+def _persist(*, email, name, picture, occupation, filename, ext, size, out,
+             file_hash=None, jobdesc=None, trace=None):
+    """
+    Guarda el análisis en UNA transacción (un solo commit): datos del usuario,
+    Execution y último análisis. El cupo ya lo descontó reserve_quota; si
+    algo falla no queda nada a medias (y quien llama devuelve la reserva).
+    Con `trace` (services/tracing) guarda también sus etapas y tokens.
+    """
+    try:
+        u = db.session.get(User, email)
+        if not u:
+            u = User(email=email, execs_used=0)
+            db.session.add(u)
+        # asigna nivel 1 por defecto si existe (solo a quien no tiene nivel)
+        if u.membership_id is None:
+            m = Membership.query.filter_by(code="level_1").first()
+            if m:
+                u.membership = m
+
+        if name: u.full_name = name
+        if picture: u.picture = picture
+        if occupation: u.occupation = occupation
+
+        ex = _new_execution(email=email, filename=filename, ext=ext, size=size, out=out,
+                            file_hash=file_hash, jobdesc=jobdesc)
+        if trace is not None:
+            ex.timings_json = _compact_json(trace.snapshot())
+            ex.llm_tokens_in, ex.llm_tokens_out = trace.tokens_total()
+        db.session.add(ex)
+        db.session.flush()  # id y created_at para el usuario
+        stats.record_execution(ex)  # agregado diario del panel, en la misma transacción
+
+        # Último análisis en un UPDATE (sin releer el usuario)
+        db.session.execute(
+            update(User).where(User.email == email).values(
+                last_model_vendor=out["model_vendor"],
+                last_model_name=out["model_name"],
+                last_score=out["score_jd"],
+                last_exec_id=ex.id,
+                last_analysis_at=ex.created_at,
+            ).execution_options(synchronize_session=False)  # el commit expira `u` igual
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Índice de JDs similares (en disco; si falla no se pierde el análisis,
+    # `flask jdindex sync` lo recupera). Desactivado no se toca: ni en memoria.
+    if jobdesc and current_app.config.get("JD_INDEX_ENABLED", True):
+        try:
+            similarity.jd_index.add(ex.id, jobdesc)
+        except Exception:
+            current_app.logger.exception("No se pudo indexar la JD de la ejecución %s", ex.id)
+
+    return {
+        "exec_id": ex.id,
+        "feedback": out["feedback_html"],
+        "disclaimer": out["disclaimer"],
+        "score_jd": out["score_jd"],
+        "score_ats": out["score_ats"],
+        "ats_details": out["ats_details"],
+        "keywords": out.get("keywords"),
+        "model_used": out["model_used"],
+    }
@@ -3,6 +3,8 @@ import re
 from collections import Counter
 from typing import Dict, List, Optional, Iterable
 
+from .matcher import PatternSet
+
 SECTION_SYNONYMS: Dict[str, List[str]] = {
     "perfil profesional": [
         r"\bperfil profesional\b", r"\bresumen profesional\b", r"\bresumen\b",
@@ -28,6 +30,9 @@ SECTION_SYNONYMS: Dict[str, List[str]] = {
     ],
 }
 
+# Todos los sinónimos en una sola regex precompilada (una pasada por CV)
+_SECTION_MATCHER = PatternSet(SECTION_SYNONYMS, ignore_case=True)
+
 GOOD_FONTS = {
     "arial", "helvetica", "calibri", "verdana",
     "roboto", "georgia", "times new roman",
@@ -40,9 +45,9 @@ def estimate_pages_from_words(word_count: int) -> int:
 
 def _detect_sections(text_lower: str):
     present, missing = [], []
-    for canonical, patterns in SECTION_SYNONYMS.items():
-        hit = any(re.search(p, text_lower, flags=re.IGNORECASE) for p in patterns)
-        (present if hit else missing).append(canonical)
+    hits = _SECTION_MATCHER.find_all(text_lower)
+    for canonical in SECTION_SYNONYMS:
+        (present if canonical in hits else missing).append(canonical)
     return present, missing, len(present)
 
 # ---- Normalización de nombres de fuentes ----
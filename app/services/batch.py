@@ -0,0 +1,166 @@
+# app/services/batch.py
+"""
+Scoring ATS por lotes, fuera de la web (lo usa `flask ats batch`).
+
+Recorre carpetas/zips de PDF/DOCX, extrae y evalúa cada CV en un pool de
+procesos y devuelve los resultados a medida que terminan. No toca la BD ni los
+LLMs: el LLM solo se llama si se pasa una JD y llm=True; guardar en BD lo
+decide quien llama.
+"""
+import multiprocessing, os, time, zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from .security import ALLOWED_EXTS, looks_suspicious
+
+# (nombre, ext, ruta | None, bytes | None): de carpetas viaja la ruta (el hijo
+# lee el archivo); de un zip viajan los bytes del miembro.
+BatchInput = Tuple[str, str, Optional[str], Optional[bytes]]
+
+
+def _ext(name: str) -> str:
+    return name.rsplit(".", 1)[-1].lower() if "." in name else ""
+
+
+def iter_inputs(paths: Iterable[str]) -> Iterator[BatchInput]:
+    """PDF/DOCX dentro de `paths` (archivos, carpetas recursivas o .zip)."""
+    for p in paths:
+        if os.path.isdir(p):
+            for root, dirs, names in os.walk(p):
+                dirs.sort()
+                for n in sorted(names):
+                    full = os.path.join(root, n)
+                    if _ext(n) in ALLOWED_EXTS:
+                        yield os.path.relpath(full, p), _ext(n), full, None
+                    elif _ext(n) == "zip":
+                        yield from _iter_zip(full)
+        elif _ext(p) == "zip":
+            yield from _iter_zip(p)
+        elif _ext(p) in ALLOWED_EXTS:
+            yield os.path.basename(p), _ext(p), p, None
+
+
+def _iter_zip(path: str) -> Iterator[BatchInput]:
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or _ext(info.filename) not in ALLOWED_EXTS:
+                continue
+            yield f"{os.path.basename(path)}:{info.filename}", _ext(info.filename), None, zf.read(info)
+
+
+def score_file(name: str, ext: str, path: Optional[str] = None, data: Optional[bytes] = None,
+               jobdesc: Optional[str] = None, llm: bool = False) -> Dict[str, Any]:
+    """Extracción + ATS (+ LLM opcional) de un CV. Se ejecuta en el proceso hijo."""
+    from .files import _parse
+    from .analysis import evaluate_document
+
+    t0 = time.perf_counter()
+    row: Dict[str, Any] = {"file": name, "ext": ext, "error": None}
+    timings = row["timings_ms"] = {}
+    try:
+        if data is None:
+            with open(path, "rb") as fh:
+                data = fh.read()
+        row["size"] = len(data)
+        t1 = time.perf_counter()
+        timings["read"] = round((t1 - t0) * 1000, 2)
+
+        cv_text, meta = _parse(data, ext)
+        cv_text = cv_text or ""
+        t2 = time.perf_counter()
+        timings["extract"] = round((t2 - t1) * 1000, 2)
+
+        row["suspicious"] = looks_suspicious(cv_text[:100000])
+        if not cv_text.strip():
+            row["error"] = "empty"
+        else:
+            lang, score_ats, details = evaluate_document(cv_text, meta, ext)
+            row.update({
+                "lang": lang,
+                "score_ats": score_ats,
+                "pages": details.get("pages"),
+                "sections_present": details.get("sections_present"),
+                "sections_missing": details.get("sections_missing"),
+                "ats_details": details,
+            })
+        timings["ats"] = round((time.perf_counter() - t2) * 1000, 2)
+
+        if llm and jobdesc and not row["error"] and not row["suspicious"]:
+            t3 = time.perf_counter()
+            row.update(_llm_score(cv_text, jobdesc, row.get("lang")))
+            timings["llm"] = round((time.perf_counter() - t3) * 1000, 2)
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+
+    timings["total"] = round((time.perf_counter() - t0) * 1000, 2)
+    return row
+
+
+def _llm_score(cv_text: str, jobdesc: str, cv_lang: Optional[str] = None) -> Dict[str, Any]:
+    """Igual que el modo auto de la web (OpenAI → Gemini), sin caché ni BD."""
+    from .ai import analizar_openai, analizar_gemini, extraer_score, detectar_idioma
+    from .lang import combine_langs
+
+    jd_lang = detectar_idioma(jobdesc)
+    idioma = combine_langs(cv_text, cv_lang or detectar_idioma(cv_text), jobdesc, jd_lang)
+    text, _ = analizar_openai(cv_text, jobdesc, nombre=None, idioma=idioma)
+    vendor = "openai" if text else None
+    if not text:
+        text = analizar_gemini(cv_text, jobdesc, nombre=None, idioma=idioma)
+        vendor = "gemini" if text else None
+    return {
+        "jd_lang": jd_lang,
+        "feedback_lang": idioma,
+        "model_vendor": vendor,
+        "score_jd": extraer_score(text) if text else None,
+        "feedback_text": text,
+    }
+
+
+def _warm_up():
+    from .files import _parse  # noqa: F401  (fitz, docx)
+    from .analysis import evaluate_document  # noqa: F401
+    from .ai import detectar_idioma
+    detectar_idioma("warm up del detector de idioma")
+
+
+def run_batch(inputs: Iterable[BatchInput], workers: int = 0,
+              jobdesc: Optional[str] = None, llm: bool = False) -> Iterator[Dict[str, Any]]:
+    """
+    Procesa `inputs` en paralelo y va devolviendo cada resultado al terminar
+    (orden de llegada, no de entrada). Como mucho 4×workers archivos en vuelo,
+    para no cargar un zip entero en memoria. workers <= 0 → nº de CPUs.
+    """
+    workers = workers if workers > 0 else (os.cpu_count() or 1)
+    inputs = iter(inputs)
+    max_in_flight = workers * 4
+
+    # En el CLI no hay threads (a diferencia de gunicorn), así que "fork" es
+    # seguro: cargamos aquí módulos y perfiles de langdetect y los hijos los
+    # heredan en vez de importarlos cada uno (segundos con spawn).
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods:
+        _warm_up()
+    ctx = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending = {}
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                item = next(inputs, None)
+                if item is None:
+                    exhausted = True
+                    break
+                name, ext, path, data = item
+                pending[pool.submit(score_file, name, ext, path, data, jobdesc, llm)] = (name, ext)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name, ext = pending.pop(fut)
+                try:
+                    yield fut.result()
+                except Exception as e:  # el hijo murió (p.ej. un PDF que tumba a MuPDF)
+                    yield {"file": name, "ext": ext, "error": f"{type(e).__name__}: {e}",
+                           "timings_ms": {}}
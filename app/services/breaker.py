@@ -0,0 +1,117 @@
+# app/services/breaker.py
+"""
+Circuit breaker por vendor de LLM.
+
+closed    → llamadas normales; N fallos (o respuestas lentas) seguidos lo abren.
+open      → se rechaza al instante durante `reset_timeout` segundos.
+half_open → pasado ese tiempo se deja pasar UNA llamada de prueba: si va bien
+            se cierra, si falla se vuelve a abrir.
+
+El estado es por proceso (cada worker de gunicorn aprende por su cuenta).
+"""
+import os, threading, time
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3,
+                 reset_timeout: float = 30.0, slow_call_seconds: float | None = None):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.slow_call_seconds = slow_call_seconds
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0              # consecutivos
+        self.opened_at = None
+        self._probe_in_flight = False
+        self.totals = {"success": 0, "failure": 0, "slow": 0, "rejected": 0, "opened": 0}
+        self.last_error = None
+        self.last_latency = None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.totals["rejected"] += 1
+                    return False
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open":
+                if self._probe_in_flight:
+                    self.totals["rejected"] += 1
+                    return False
+                self._probe_in_flight = True
+            return True
+
+    def is_open(self) -> bool:
+        """True si ahora mismo se rechazaría la llamada (sin consumir la prueba)."""
+        with self._lock:
+            return (self.state == "open"
+                    and time.monotonic() - self.opened_at < self.reset_timeout)
+
+    def record_success(self, latency: float):
+        slow = self.slow_call_seconds is not None and latency > self.slow_call_seconds
+        if slow:
+            self.record_failure(f"lenta: {latency:.1f}s", latency=latency, slow=True)
+            return
+        with self._lock:
+            self.totals["success"] += 1
+            self.last_latency = latency
+            self.failures = 0
+            self.state = "closed"
+            self._probe_in_flight = False
+
+    def record_failure(self, error: str, latency: float | None = None, slow: bool = False):
+        with self._lock:
+            self.totals["slow" if slow else "failure"] += 1
+            self.last_error = error
+            self.last_latency = latency
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.totals["opened"] += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "failure_threshold": self.failure_threshold,
+                "reset_timeout": self.reset_timeout,
+                "slow_call_seconds": self.slow_call_seconds,
+                "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+                "last_error": self.last_error,
+                "last_latency": round(self.last_latency, 3) if self.last_latency is not None else None,
+                **self.totals,
+            }
+
+
+def _from_env(name: str) -> CircuitBreaker:
+    # Por encima de los timeouts de lectura (60 s): una respuesta larga pero
+    # correcta no debe contar como fallo. Con streaming se mide hasta el primer
+    # trozo (ver ai.py), no la generación entera.
+    slow = os.getenv("LLM_BREAKER_SLOW_SECONDS", "90")
+    return CircuitBreaker(
+        name,
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+        slow_call_seconds=float(slow) if slow else None,
+    )
+
+
+breakers = {
+    "openai": _from_env("openai"),
+    "gemini": _from_env("gemini"),
+}
@@ -0,0 +1,96 @@
+# app/services/cache.py
+"""
+Caché en memoria LRU + TTL, thread-safe, con contadores de aciertos/fallos.
+
+Es por proceso (cada worker de gunicorn tiene la suya); lo usan los servicios
+que quieren evitar repetir trabajo caro para el mismo contenido.
+"""
+import threading, time
+from collections import OrderedDict
+
+
+class TTLCache:
+    def __init__(self, maxsize: int = 256, ttl: float | None = None,
+                 max_bytes: int | None = None, sizeof=None):
+        """
+        - maxsize:   máximo de entradas (LRU)
+        - ttl:       segundos de vida de cada entrada (None = sin expiración)
+        - max_bytes: tope opcional de tamaño total; requiere `sizeof(value)`
+        """
+        self.maxsize = max(1, int(maxsize))
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expira, valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires, value, _ = item
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        nbytes = int(self.sizeof(value)) if self.sizeof else 0
+        if self.max_bytes is not None and nbytes > self.max_bytes:
+            return  # no cabe nunca; no desalojamos todo por una sola entrada
+        expires = (time.monotonic() + self.ttl) if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires, value, nbytes)
+            self._bytes += nbytes
+            while len(self._data) > self.maxsize or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            value = self._data[key][1]
+            self._remove(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        _, _, nbytes = self._data.pop(key)
+        self._bytes -= nbytes
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
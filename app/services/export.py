@@ -0,0 +1,96 @@
+# app/services/export.py
+"""
+Exportación CSV en streaming (historial de ejecuciones y comentarios).
+
+Antes se armaba el CSV entero en memoria a partir de `q.all()` (objetos ORM
+completos, con feedback_text incluido). Ahora:
+- se piden solo las columnas que van al CSV
+- las filas llegan por lotes (yield_per → cursor de servidor en Postgres)
+- se escribe en trozos de ~64 KB y, si se pide, se comprimen con gzip al vuelo
+
+La memoria queda acotada por el lote y el trozo, no por el tamaño del export.
+"""
+import csv, io, zlib
+from typing import Iterable, Iterator
+
+from sqlalchemy import select
+
+from ..models import Execution, Comment
+
+FETCH_BATCH = 1000
+CHUNK_BYTES = 64 * 1024
+
+
+def _iso(v):
+    return v.isoformat() if v else ""
+
+
+def _oneline(v):
+    return (v or "").replace("\n", " ")
+
+
+# (cabecera, columna, formato) en el orden del CSV
+EXECUTION_FIELDS = [
+    ("created_at",   Execution.created_at,        _iso),
+    ("email",        Execution.email,             lambda v: v or ""),
+    ("filename",     Execution.uploaded_filename, lambda v: v or ""),
+    ("ext",          Execution.uploaded_ext,      lambda v: v or ""),
+    ("size_bytes",   Execution.uploaded_size,     lambda v: v or 0),
+    ("model_vendor", Execution.model_vendor,      lambda v: v or ""),
+    ("model_name",   Execution.model_name,        lambda v: v or ""),
+    ("score",        Execution.score,             lambda v: v if v is not None else ""),
+    ("resume_lang",  Execution.resume_lang,       lambda v: v or ""),
+    ("jd_lang",      Execution.jd_lang,           lambda v: v or ""),
+]
+
+COMMENT_FIELDS = [
+    ("created_at", Comment.created_at, _iso),
+    ("name",       Comment.name,       lambda v: v or ""),
+    ("email",      Comment.email,      lambda v: v or ""),
+    ("text",       Comment.text,       _oneline),
+]
+
+
+def export_stmt(fields, model, email=None):
+    """SELECT de solo las columnas del CSV, más recientes primero (índice (created_at, id))."""
+    stmt = select(*[col for _, col, _ in fields]).order_by(model.created_at.desc(), model.id.desc())
+    if email is not None:
+        stmt = stmt.where(model.email == email)
+    return stmt
+
+
+def stream_rows(conn, stmt, batch: int = FETCH_BATCH) -> Iterator[tuple]:
+    """Filas de `stmt` por lotes; `conn` puede ser db.session o una Connection."""
+    result = conn.execute(stmt.execution_options(yield_per=batch))
+    for part in result.partitions():
+        yield from part
+
+
+def csv_chunks(fields, rows: Iterable[tuple], chunk_bytes: int = CHUNK_BYTES) -> Iterator[str]:
+    """CSV (cabecera + filas) en trozos de ~chunk_bytes caracteres."""
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow([name for name, _, _ in fields])
+    fmts = [fmt for _, _, fmt in fields]
+    for row in rows:
+        w.writerow([fmt(v) for fmt, v in zip(fmts, row)])
+        if buf.tell() >= chunk_bytes:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def encode_chunks(chunks: Iterable[str], gzip: bool = False) -> Iterator[bytes]:
+    """UTF-8 y, con gzip=True, un stream gzip válido comprimido a medida que llega."""
+    if not gzip:
+        for chunk in chunks:
+            yield chunk.encode("utf-8")
+        return
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = cabecera gzip
+    for chunk in chunks:
+        data = z.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield z.flush()
@@ -1,13 +1,47 @@
 # app/services/files.py
 from __future__ import annotations
 
-import io
+import io, os, json, hashlib, itertools, logging, signal, threading
+import queue as queue_mod
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, CancelledError
+from concurrent.futures.process import BrokenProcessPool
 from typing import Tuple, Dict, Any, List, Set
 
 import fitz  # PyMuPDF
 from docx import Document
 from docx.opc.constants import RELATIONSHIP_TYPE as RT
 
+from .cache import TTLCache
+
+_log = logging.getLogger(__name__)
+
+
+# -----------------------
+# Lectura acotada del upload
+# -----------------------
+class UploadTooLarge(Exception):
+    pass
+
+
+def read_upload(stream, max_bytes: int, chunk_size: int = 64 * 1024) -> bytearray:
+    """
+    Lee el archivo subido por bloques y aborta apenas supera `max_bytes`, en vez
+    de cargarlo entero para luego medirlo. Werkzeug ya lo tiene en un
+    SpooledTemporaryFile; aquí solo copiamos hasta el límite.
+    Devuelve un bytearray: hashlib, PyMuPDF (stream=) y BytesIO lo aceptan tal
+    cual, sin otra copia a bytes.
+    """
+    buf = bytearray()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if len(buf) + len(chunk) > max_bytes:
+            raise UploadTooLarge()
+        buf += chunk
+    return buf
+
 
 def _normalize_font_name(name: str) -> str:
     """
@@ -54,34 +88,41 @@ def extract_pdf(data: bytes) -> Tuple[str, Dict[str, Any]]:
       - pages: int
       - images: int
       - fonts: list[str]  (familias normalizadas)
+
+    Cada página se maqueta una sola vez: texto plano y spans (fuentes) salen del
+    mismo TextPage. Con los flags de "text" la salida es idéntica a llamar
+    get_text("text") + get_text("dict") por separado (solo cambia que el dict
+    ya no incluye bloques de imagen, que aquí se ignoraban).
     """
     doc = fitz.open(stream=data, filetype="pdf")
     pages = doc.page_count
 
     text_parts: List[str] = []
     images = 0
-    fonts: Set[str] = set()
+    raw_fonts: Set[str] = set()
 
     for page in doc:
+        tp = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+
         # Texto "plano"
-        text_parts.append(page.get_text("text"))
+        text_parts.append(page.get_text("text", textpage=tp))
 
         # Contar imágenes reales de la página
         images += len(page.get_images(full=True))
 
-        # Extraer fuentes a partir de los spans
-        d = page.get_text("dict")
-        for block in d.get("blocks", []):
+        # Fuentes a partir de los spans (mismo TextPage, sin re-maquetar)
+        for block in tp.extractDICT().get("blocks", []):
             if block.get("type") != 0:
                 continue
             for line in block.get("lines", []):
                 for span in line.get("spans", []):
-                    fname = _normalize_font_name(span.get("font") or "")
-                    if fname:
-                        fonts.add(fname)
+                    raw_fonts.add(span.get("font") or "")
 
     doc.close()
 
+    # Normalizamos cada nombre distinto una sola vez (no por span)
+    fonts: Set[str] = {f for f in map(_normalize_font_name, raw_fonts) if f}
+
     text = "\n".join(text_parts).strip()
     meta = {
         "pages": pages,
@@ -144,3 +185,330 @@ def extract_docx(data: bytes) -> Tuple[str, Dict[str, Any]]:
         "fonts": sorted([f for f in fonts if f]),
     }
     return text, meta
+
+
+# -----------------------
+# Pool de procesos para el parseo
+# -----------------------
+# PyMuPDF y python-docx retienen el GIL: dentro de los hilos de gunicorn un DOCX
+# grande serializa a todo el worker. Con EXTRACT_POOL_WORKERS > 0 el parseo va a
+# procesos aparte (con timeout y reciclaje tras N documentos para acotar fugas);
+# con 0 se parsea en el mismo hilo, como antes.
+#
+# El timeout lo aplica el propio hijo (SIGALRM alrededor del parseo): solo
+# cuenta el parseo, no la espera en la cola, y el hijo aborta ese documento y
+# sigue atendiendo. El pool entero solo se descarta si un hijo muere o no
+# responde ni a su alarma (colgado en C): ProcessPoolExecutor no permite matar
+# un hijo suelto sin romper el pool. Ese plazo de respaldo del padre empieza
+# cuando el hijo avisa (cola `started`) de que tomó la tarea.
+
+class ExtractionFailed(Exception):
+    """El parseo excedió el timeout o el proceso hijo murió."""
+
+
+class _Deadline(Exception):
+    pass
+
+
+def _on_alarm(signum, frame):
+    raise _Deadline()
+
+
+def _parse(data, ext: str) -> Tuple[str, Dict[str, Any]]:
+    return extract_pdf(data) if ext == "pdf" else extract_docx(data)
+
+
+_started_queue = None  # en el hijo: cola para avisar al padre de que empieza una tarea
+
+
+def _init_child(queue):
+    global _started_queue
+    _started_queue = queue
+
+
+def _parse_with_deadline(data, ext: str, timeout: float, task_id: int = None) -> Tuple[str, Dict[str, Any]]:
+    """Corre en el hijo (hilo principal): `_parse` con alarma de `timeout` segundos."""
+    if _started_queue is not None and task_id is not None:
+        _started_queue.put(task_id)
+    if not hasattr(signal, "setitimer"):  # Windows: queda el plazo de respaldo del padre
+        return _parse(data, ext)
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    try:
+        # La alarma puede saltar justo al armarla o al desarmarla: todo dentro del except
+        try:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            return _parse(data, ext)
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    except _Deadline:
+        raise ExtractionFailed("timeout")
+    finally:
+        signal.signal(signal.SIGALRM, previous)
+
+
+_pool = {"executor": None, "pid": None, "workers": 0, "timeout": 20, "max_tasks": 50,
+         "tasks": 0, "timeouts": 0, "crashes": 0, "restarts": 0}
+_pool_lock = threading.Lock()
+_task_ids = itertools.count(1)
+_waiting: Dict[int, threading.Event] = {}  # task_id -> se activa cuando un hijo la toma (o termina)
+_listener_stop = None
+
+# Margen sobre el timeout antes de dar al hijo por colgado (no atendió su alarma)
+_HUNG_GRACE = 10.0
+
+
+def init_extract_pool(app):
+    """Lee EXTRACT_POOL_* (se llama desde create_app); el pool se crea perezoso."""
+    _pool["workers"] = int(app.config.get("EXTRACT_POOL_WORKERS", 0))
+    _pool["timeout"] = float(app.config.get("EXTRACT_POOL_TIMEOUT", 20))
+    _pool["max_tasks"] = int(app.config.get("EXTRACT_POOL_MAX_TASKS", 50)) or None
+
+
+def _listen(queue, stop):
+    # Un hilo por pool: pasa los avisos de los hijos a los Event de quien espera
+    while not stop.is_set():
+        try:
+            task_id = queue.get(timeout=1)
+        except (queue_mod.Empty, OSError, EOFError):
+            continue
+        with _pool_lock:
+            event = _waiting.get(task_id)
+        if event is not None:
+            event.set()
+
+
+def _get_pool():
+    # Por pid: tras el fork de gunicorn cada worker arranca su propio pool.
+    # "spawn" es obligatorio para max_tasks_per_child (reciclaje de procesos).
+    # Cada pool lleva su propia cola de avisos: si se recicla matando hijos, la
+    # vieja puede quedar a medio escribir y se abandona con su hilo.
+    global _listener_stop
+    with _pool_lock:
+        if _pool["executor"] is None or _pool["pid"] != os.getpid():
+            ctx = multiprocessing.get_context("spawn")
+            queue = ctx.Queue()
+            _listener_stop = threading.Event()
+            threading.Thread(target=_listen, args=(queue, _listener_stop),
+                             name="extract-started", daemon=True).start()
+            _pool["executor"] = ProcessPoolExecutor(
+                max_workers=_pool["workers"],
+                mp_context=ctx,
+                max_tasks_per_child=_pool["max_tasks"],
+                initializer=_init_child,
+                initargs=(queue,),
+            )
+            _pool["pid"] = os.getpid()
+        return _pool["executor"]
+
+
+def _reset_pool(executor):
+    """Descarta un pool roto o con un hijo colgado (se recrea en el próximo uso)."""
+    with _pool_lock:
+        if _pool["executor"] is not executor:
+            return
+        _pool["executor"] = None
+        _pool["restarts"] += 1
+        if _listener_stop is not None:
+            _listener_stop.set()
+    # No hay API pública para matar un hijo ocupado; sin esto el hilo colgado
+    # seguiría consumiendo CPU hasta terminar.
+    for proc in list((getattr(executor, "_processes", None) or {}).values()):
+        try:
+            proc.terminate()
+        except Exception:
+            pass
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit(data, ext: str):
+    """
+    Encola el parseo y devuelve (pool, futuro, evento de inicio). Si el pool ya
+    estaba roto o cerrado (otro hilo lo recicló), reintenta una vez en uno nuevo.
+    """
+    task_id = next(_task_ids)
+    started = threading.Event()
+    with _pool_lock:
+        _waiting[task_id] = started
+    for attempt in (1, 2):
+        executor = _get_pool()
+        try:
+            fut = executor.submit(_parse_with_deadline, data, ext, _pool["timeout"], task_id)
+        except (BrokenProcessPool, RuntimeError):
+            if attempt == 2:
+                with _pool_lock:
+                    _waiting.pop(task_id, None)
+                raise ExtractionFailed("crash")
+            _reset_pool(executor)
+            continue
+
+        def _done(_fut):
+            with _pool_lock:
+                _waiting.pop(task_id, None)
+            started.set()  # terminó (o se canceló) sin llegar a avisar: no hay que esperar más
+
+        fut.add_done_callback(_done)
+        return executor, fut, started
+
+
+def parse_document(data, ext: str, _retry: bool = True) -> Tuple[str, Dict[str, Any]]:
+    """Parsea en el pool de procesos si está habilitado; si no, en este hilo."""
+    if _pool["workers"] <= 0:
+        return _parse(data, ext)
+
+    executor, fut, started = _submit(data, ext)
+    with _pool_lock:
+        _pool["tasks"] += 1
+    try:
+        # La espera en cola no tiene plazo; el de respaldo cuenta desde que un hijo la toma
+        started.wait()
+        return fut.result(timeout=_pool["timeout"] + _HUNG_GRACE)
+    except ExtractionFailed:
+        # El hijo cortó el parseo con su alarma y sigue vivo: no hay que reciclar nada
+        with _pool_lock:
+            _pool["timeouts"] += 1
+        _log.warning("Extracción %s superó %ss", ext, _pool["timeout"])
+        raise
+    except FutureTimeout:
+        with _pool_lock:
+            _pool["timeouts"] += 1
+        _log.error("Un proceso de extracción no respondió a su alarma (%s); reciclando el pool", ext)
+        _reset_pool(executor)
+        raise ExtractionFailed("timeout")
+    except CancelledError:
+        # Otro hilo recicló el pool antes de que un hijo tomara esta tarea
+        if not _retry:
+            raise ExtractionFailed("crash")
+        return parse_document(data, ext, _retry=False)
+    except BrokenProcessPool:
+        with _pool_lock:
+            _pool["crashes"] += 1
+        _log.error("Un proceso de extracción murió (%s); reciclando el pool", ext)
+        _reset_pool(executor)
+        raise ExtractionFailed("crash")
+
+
+def extract_pool_stats() -> Dict[str, Any]:
+    with _pool_lock:
+        return {k: v for k, v in _pool.items() if k not in ("executor", "pid")}
+
+
+# -----------------------
+# Caché de extracción (memoria + disco opcional)
+# -----------------------
+# El mismo CV suele subirse contra muchas JDs seguidas: guardamos (texto, meta)
+# por SHA-256 del archivo y el parseo con PyMuPDF/python-docx se hace una vez.
+
+def _entry_size(entry) -> int:
+    text, meta = entry
+    return len(text.encode("utf-8")) + len(json.dumps(meta))
+
+_mem_cache = TTLCache(maxsize=10_000, max_bytes=64 * 1024 * 1024, sizeof=_entry_size)
+_disk = {"dir": None, "max_bytes": 0, "hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+_disk_lock = threading.Lock()
+
+
+def init_extract_cache(app):
+    """Configura los tiers según EXTRACT_CACHE_* (se llama desde create_app)."""
+    global _mem_cache
+    _mem_cache = TTLCache(
+        maxsize=10_000,
+        max_bytes=int(app.config.get("EXTRACT_CACHE_MB", 64)) * 1024 * 1024,
+        sizeof=_entry_size,
+    )
+    if app.config.get("EXTRACT_CACHE_DISK", False):
+        path = os.path.join(app.instance_path, "extract_cache")
+        os.makedirs(path, exist_ok=True)
+        _disk["dir"] = path
+        _disk["max_bytes"] = int(app.config.get("EXTRACT_CACHE_DISK_MB", 256)) * 1024 * 1024
+    else:
+        _disk["dir"] = None
+
+
+def _disk_get(digest):
+    path = os.path.join(_disk["dir"], digest + ".json")
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            raw = json.load(fh)
+        os.utime(path)  # "toca" el archivo: el desalojo va por mtime (LRU aproximado)
+    except (OSError, ValueError):
+        with _disk_lock:
+            _disk["misses"] += 1
+        return None
+    with _disk_lock:
+        _disk["hits"] += 1
+    return raw["text"], raw["meta"]
+
+
+def _disk_set(digest, entry):
+    text, meta = entry
+    path = os.path.join(_disk["dir"], digest + ".json")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"text": text, "meta": meta}, fh, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError:
+        _log.warning("No se pudo escribir la caché de extracción en %s", path, exc_info=True)
+        return
+    with _disk_lock:
+        _disk["writes"] += 1
+        _disk_evict()
+
+
+def _disk_evict():
+    files = []
+    total = 0
+    for e in os.scandir(_disk["dir"]):
+        if e.is_file() and e.name.endswith(".json"):
+            st = e.stat()
+            files.append((st.st_mtime, st.st_size, e.path))
+            total += st.st_size
+    files.sort()
+    while files and total > _disk["max_bytes"]:
+        _, size, path = files.pop(0)
+        try:
+            os.remove(path)
+            total -= size
+            _disk["evictions"] += 1
+        except OSError:
+            pass
+
+
+def extract_document(data: bytes, ext: str, sha256: str | None = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    extract_pdf/extract_docx con caché por contenido. ext: 'pdf' | 'docx'.
+    `sha256` permite reutilizar el hash si quien llama ya lo calculó.
+    """
+    digest = (sha256 or hashlib.sha256(data).hexdigest()) + "." + ext
+    entry = _mem_cache.get(digest)
+    if entry is not None:
+        return entry
+
+    if _disk["dir"]:
+        entry = _disk_get(digest)
+        if entry is not None:
+            _mem_cache.set(digest, entry)
+            return entry
+
+    entry = parse_document(data, ext)
+    _mem_cache.set(digest, entry)
+    if _disk["dir"]:
+        _disk_set(digest, entry)
+    return entry
+
+
+def clear_extract_cache():
+    """Vacía el tier de memoria (el de disco se conserva: sobrevive reinicios)."""
+    _mem_cache.clear()
+
+
+def extract_cache_stats() -> Dict[str, Any]:
+    stats = {"memory": _mem_cache.stats(), "disk": None}
+    if _disk["dir"]:
+        with _disk_lock:
+            disk = {k: v for k, v in _disk.items() if k != "dir"}
+            entries = [e for e in os.scandir(_disk["dir"]) if e.name.endswith(".json")]
+            disk["size"] = len(entries)
+            disk["bytes"] = sum(e.stat().st_size for e in entries)
+        stats["disk"] = disk
+    return stats
@@ -0,0 +1,270 @@
+# app/services/jobs.py
+"""
+Cola local de análisis.
+
+Cada envío crea una fila AnalysisJob (queued → running → done/failed) y se
+ejecuta en un ThreadPoolExecutor del proceso; el estado vive en la BD para que
+cualquier worker de gunicorn pueda responder al polling de /jobs/<id>.
+Con stream=True la salida parcial del LLM se va volcando en partial_text, que
+lee el endpoint SSE /jobs/<id>/stream.
+Los jobs terminados se borran pasadas ANALYSIS_JOB_RETENTION_HOURS
+(purge_finished, desde submit_job como mucho cada _PURGE_EVERY s por proceso,
+o con `flask jobs purge`).
+"""
+import json, logging, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy import delete, update
+
+from ..extensions import db
+from ..models import AnalysisJob
+from .analysis import AnalysisError
+from . import tracing
+
+_log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_stats = {
+    "submitted": 0,
+    "completed": 0,
+    "failed": 0,
+    "running": 0,
+    "busy_seconds": 0.0,
+    "wait_seconds": 0.0,
+    "streamed": 0,               # jobs que emitieron al menos un trozo
+    "first_delta_seconds": 0.0,  # suma de (primer trozo - inicio del job)
+}
+_started_at = time.time()
+_PURGE_EVERY = 600
+_last_purge = 0.0
+
+
+def _get_executor(app):
+    """Pool perezoso por proceso (gunicorn hace fork después de importar)."""
+    global _executor, _executor_pid
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, int(app.config.get("ANALYSIS_WORKERS", 4))),
+                thread_name_prefix="analysis",
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+class _PartialWriter:
+    """
+    Callback on_delta: guarda el texto acumulado en analysis_jobs.partial_text.
+    El primer trozo se escribe al instante (TTFB) y el resto como mucho cada
+    `interval` s. Usa el engine directamente para no mezclarse con la sesión
+    del análisis.
+    """
+
+    def __init__(self, engine, job_id, interval, started):
+        self.engine = engine
+        self.job_id = job_id
+        self.interval = interval
+        self.started = started
+        self._last = None
+
+    def __call__(self, text):
+        now = time.monotonic()
+        if self._last is None:
+            with _lock:
+                _stats["streamed"] += 1
+                _stats["first_delta_seconds"] += now - self.started
+        elif now - self._last < self.interval:
+            return
+        self._last = now
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    AnalysisJob.__table__.update()
+                    .where(AnalysisJob.__table__.c.id == self.job_id)
+                    .values(partial_text=text)
+                )
+        except Exception:
+            _log.warning("No se pudo guardar el parcial del job %s", self.job_id, exc_info=True)
+
+    def preview(self, data):
+        """Callback on_preview: resultado local previo al LLM (se escribe siempre)."""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    AnalysisJob.__table__.update()
+                    .where(AnalysisJob.__table__.c.id == self.job_id)
+                    .values(preview_json=json.dumps(data))
+                )
+        except Exception:
+            _log.warning("No se pudo guardar el preview del job %s", self.job_id, exc_info=True)
+
+
+def submit_job(owner, fn, stream=False, **kwargs) -> str:
+    """
+    Crea el job de `owner` (email) en estado 'queued' y lo encola; devuelve su id.
+    Con stream=True `fn` recibe además on_delta y on_preview (ver _PartialWriter).
+    """
+    app = current_app._get_current_object()
+    job = AnalysisJob(id=uuid4().hex, email=owner, status="queued")
+    db.session.add(job)
+    db.session.commit()
+
+    with _lock:
+        _stats["submitted"] += 1
+    _get_executor(app).submit(_run_job, app, job.id, time.monotonic(), fn, kwargs, stream)
+    _maybe_purge(app)
+    return job.id
+
+
+def purge_finished(hours: float) -> int:
+    """
+    Borra los jobs done/failed creados hace más de `hours` horas (sus
+    result_json/partial_text ya no los lee nadie: el resultado vive en
+    executions). Confirma y devuelve cuántos borró.
+    """
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    n = db.session.execute(
+        delete(AnalysisJob)
+        .where(AnalysisJob.status.in_(("done", "failed")), AnalysisJob.created_at < cutoff)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    return n
+
+
+def _maybe_purge(app):
+    """purge_finished con la retención configurada, como mucho cada _PURGE_EVERY s."""
+    global _last_purge
+    hours = float(app.config.get("ANALYSIS_JOB_RETENTION_HOURS", 24))
+    now = time.monotonic()
+    with _lock:
+        if hours <= 0 or (_last_purge and now - _last_purge < _PURGE_EVERY):
+            return
+        _last_purge = now
+    try:
+        n = purge_finished(hours)
+        if n:
+            _log.info("Purgados %s jobs terminados de más de %sh", n, hours)
+    except Exception:
+        _log.warning("No se pudo purgar analysis_jobs", exc_info=True)
+        db.session.rollback()
+
+
+class _Expired(Exception):
+    pass
+
+
+def _run_job(app, job_id, queued_at, fn, kwargs, stream=False):
+    started = time.monotonic()
+    with _lock:
+        _stats["running"] += 1
+        _stats["wait_seconds"] += started - queued_at
+
+    ok = False
+    # Traza del análisis (etapas, SQL y tokens); la espera en cola es su primera etapa
+    trace, trace_token = tracing.start("analysis")
+    trace.add("queue", (started - queued_at) * 1000)
+    with app.app_context():
+        try:
+            # Si expiró mientras esperaba en la cola ya no se ejecuta
+            claimed = db.session.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, AnalysisJob.status == "queued")
+                .values(status="running", started_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                raise _Expired()
+
+            if stream:
+                writer = _PartialWriter(
+                    db.engine, job_id, float(app.config.get("STREAM_FLUSH_SECONDS", 0.3)), started
+                )
+                kwargs = dict(kwargs, on_delta=writer, on_preview=writer.preview)
+
+            try:
+                result = fn(**kwargs)
+                if isinstance(result, dict):
+                    result["timings"] = trace.snapshot()  # Server-Timing de la página de resultado
+                final = {"status": "done", "result_json": json.dumps(result),
+                         "exec_id": (result or {}).get("exec_id")}
+                ok = True
+            except AnalysisError as e:
+                db.session.rollback()
+                final = {"status": "failed", "error_key": e.key, "error_params": json.dumps(e.params)}
+            except Exception:
+                app.logger.exception("Error durante el análisis (job=%s)", job_id)
+                db.session.rollback()
+                final = {"status": "failed", "error_key": "err.generic"}
+
+            # Solo si sigue en running: si expire_stale ya lo dio por fallido y el
+            # cliente pudo verlo, el estado final no debe cambiar por detrás
+            done = db.session.execute(
+                update(AnalysisJob)
+                .where(AnalysisJob.id == job_id, AnalysisJob.status == "running")
+                .values(partial_text=None, preview_json=None,  # ya está en result_json / Execution
+                        finished_at=datetime.utcnow(), **final)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            if not done:
+                _log.warning("Job %s terminó tras haber expirado; se deja como estaba", job_id)
+        except _Expired:
+            _log.warning("Job %s expiró antes de empezar; no se ejecuta", job_id)
+        except Exception:
+            _log.exception("No se pudo actualizar el job %s", job_id)
+            db.session.rollback()
+    tracing.finish(trace_token, getattr(fn, "__name__", ""))
+
+    with _lock:
+        _stats["running"] -= 1
+        _stats["busy_seconds"] += time.monotonic() - started
+        _stats["completed" if ok else "failed"] += 1
+
+
+def expire_stale(job) -> bool:
+    """Marca como fallido un job que quedó colgado (p.ej. reinicio del worker)."""
+    timeout = int(current_app.config.get("ANALYSIS_JOB_TIMEOUT", 300))
+    if job.status not in ("queued", "running"):
+        return False
+    if (datetime.utcnow() - job.created_at).total_seconds() < timeout:
+        return False
+    # Condicional: el hilo del job pudo terminarlo entre la lectura y este UPDATE
+    expired = db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id == job.id, AnalysisJob.status.in_(("queued", "running")))
+        .values(status="failed", error_key="err.analysis", finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()  # expira `job`: quien llama relee el estado real
+    return bool(expired)
+
+
+def stats() -> dict:
+    """Contadores del proceso actual + profundidad de cola global (BD)."""
+    with _lock:
+        s = dict(_stats)
+    finished = s["completed"] + s["failed"]
+    uptime = max(1e-6, time.time() - _started_at)
+    s.update({
+        "pid": os.getpid(),
+        "workers": int(current_app.config.get("ANALYSIS_WORKERS", 4)),
+        "queue_depth": max(0, s["submitted"] - finished - s["running"]),
+        "throughput_per_min": round(finished / uptime * 60, 3),
+        "avg_run_seconds": round(s["busy_seconds"] / finished, 3) if finished else None,
+        "avg_wait_seconds": round(s["wait_seconds"] / finished, 3) if finished else None,
+        "avg_first_delta_seconds": (round(s["first_delta_seconds"] / s["streamed"], 3)
+                                    if s["streamed"] else None),
+        "uptime_seconds": round(uptime, 1),
+    })
+    rows = (db.session.query(AnalysisJob.status, db.func.count(AnalysisJob.id))
+            .filter(AnalysisJob.status.in_(("queued", "running")))
+            .group_by(AnalysisJob.status).all())
+    s["db"] = {status: n for status, n in rows}
+    return s
@@ -0,0 +1,133 @@
+# app/services/keywords.py
+"""
+Score local de palabras clave CV ↔ JD (sin LLM, en milisegundos).
+
+- Tokeniza ambos textos (minúsculas, sin acentos, conserva c++, c#, node.js…)
+- Quita stopwords es/en y aplica un stemming ligero por sufijos
+- Pondera los términos de la JD estilo BM25: saturación de tf en la JD e IDF
+  calculado sobre los párrafos de la JD (lo que se repite en todos pesa poco;
+  el CV no entra, si no los términos que sí tiene saldrían penalizados)
+- Crédito por término en el CV con la normalización de longitud de BM25
+
+Devuelve score 0–100 y las palabras clave presentes/ausentes. Determinista:
+mismo CV + misma JD → mismo resultado.
+"""
+import math, re, unicodedata
+from collections import Counter
+from typing import Dict, List
+
+KEYWORDS_VERSION = "kw-v1"
+
+# BM25: k1/b para el CV (documento), k3 para la JD (consulta)
+K1, B, K3 = 1.2, 0.75, 1.5
+AVG_CV_TERMS = 450  # longitud "típica" de un CV en términos útiles
+TOP_N = 15
+
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+_BLOCK_RE = re.compile(r"\n\s*\n|\n(?=\s*[-•*·])")
+
+STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante e el ella
+ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos fue ha han hasta hay la las
+le les lo los mas me mi mis mucho muy nada ni no nos o otra otras otro otros para pero poco por porque
+que quien se sea ser si sin sobre son su sus tambien te tiene tienen todo todos tu un una unas uno unos
+y ya asi cada debe deben donde esta estan hacer nuestro nuestra nuestros nuestras puede pueden
+the and or of to in for on with at by from as an be is are was were been this that these those it its
+we our you your they their he she his her will would can could should may might must not no yes
+about into over under than then so such very more most other some any all each both per via etc
+also using use used within across including include includes
+""".split())
+
+# Relleno típico de ofertas de empleo y CVs (no diferencia a un candidato)
+BOILERPLATE = frozenset("""
+experiencia anos ano requisitos requisito responsabilidades funciones buscamos ofrecemos empresa puesto
+candidato candidata conocimiento conocimientos deseable indispensable nivel manejo capacidad trabajo
+equipo excelente buen buena fuerte solida minimo beneficios salario oportunidad area perfil
+experience years year requirements requirement responsibilities role company job position candidate
+ability strong excellent good knowledge skills skill team work working plus preferred required
+minimum benefits salary opportunity looking join ideal
+""".split())
+
+_SUFFIXES_ES = (
+    "amientos", "imientos", "aciones", "uciones", "amiento", "imiento", "idades", "adoras",
+    "adores", "ancias", "encias", "mente", "acion", "ucion", "ancia", "encia", "adora", "ador",
+    "ables", "ibles", "istas", "iendo", "idad", "able", "ible", "ista", "ivas", "ivos", "ando",
+    "ados", "idos", "iva", "ivo", "ado", "ido", "es", "as", "os", "a", "o", "e", "s",
+)
+_SUFFIXES_EN = (
+    "ational", "ization", "fulness", "ousness", "iveness", "ations", "ation", "ments", "ment",
+    "ness", "ings", "ing", "edly", "ies", "ers", "ed", "er", "es", "ly", "s",
+)
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin diacríticos (educación → educacion)."""
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def stem(token: str, lang: str = "es") -> str:
+    """Stemming ligero por sufijos; no toca tokens técnicos (c++, node.js) ni cortos."""
+    if len(token) <= 4 or not token.isalpha():
+        return token
+    for suf in (_SUFFIXES_EN if lang == "en" else _SUFFIXES_ES):
+        if token.endswith(suf) and len(token) - len(suf) >= 4:
+            return token[: -len(suf)]
+    return token
+
+
+def tokenize(text: str, lang: str = "es") -> List[tuple]:
+    """[(stem, forma original)] sin stopwords ni números sueltos."""
+    out = []
+    for tok in _TOKEN_RE.findall(_fold(text)):
+        tok = tok.strip(".-")
+        if len(tok) < 2 or tok.isdigit() or tok in STOPWORDS or tok in BOILERPLATE:
+            continue
+        out.append((stem(tok, lang), tok))
+    return out
+
+
+def _blocks(text: str) -> List[str]:
+    return [b for b in _BLOCK_RE.split(text or "") if b.strip()]
+
+
+def keyword_match(cv_text: str, job_desc: str, lang: str = "es") -> Dict:
+    """Score 0–100 de cobertura de la JD por el CV + palabras clave presentes/ausentes."""
+    jd_tokens = tokenize(job_desc, lang)
+    cv_tokens = tokenize(cv_text, lang)
+    if not jd_tokens:
+        return {"score": None, "matched": [], "missing": [], "terms": 0, "version": KEYWORDS_VERSION}
+
+    q_tf = Counter(s for s, _ in jd_tokens)
+    cv_tf = Counter(s for s, _ in cv_tokens)
+
+    # Forma más frecuente de cada stem en la JD, para mostrarla
+    surface: Dict[str, Counter] = {}
+    for s, tok in jd_tokens:
+        surface.setdefault(s, Counter())[tok] += 1
+
+    # IDF local: cada párrafo de la JD es un "documento"
+    docs = [{s for s, _ in tokenize(b, lang)} for b in _blocks(job_desc)]
+    n_docs = max(1, len(docs))
+    df = Counter(s for d in docs for s in d if s in q_tf)
+
+    norm = 1 - B + B * (len(cv_tokens) / AVG_CV_TERMS)
+    weighted = []
+    total = got = 0.0
+    for s, tf in q_tf.items():
+        idf = math.log(1 + (n_docs - df[s] + 0.5) / (df[s] + 0.5))
+        w = (K3 + 1) * tf / (K3 + tf) * idf
+        f = cv_tf.get(s, 0)
+        credit = min(1.0, f * (K1 + 1) / (f + K1 * norm)) if f else 0.0
+        total += w
+        got += w * credit
+        weighted.append((w, credit, surface[s].most_common(1)[0][0]))
+
+    weighted.sort(key=lambda x: -x[0])
+    return {
+        "score": round(100 * got / total) if total else None,
+        "matched": [t for w, c, t in weighted if c > 0][:TOP_N],
+        "missing": [t for w, c, t in weighted if c == 0][:TOP_N],
+        "terms": len(q_tf),
+        "version": KEYWORDS_VERSION,
+    }
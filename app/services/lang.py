@@ -0,0 +1,71 @@
+# app/services/lang.py
+"""
+Detección de idioma ('es' / 'en') barata y determinista.
+
+langdetect es probabilístico (muestrea n-gramas al azar) y recorre el texto
+entero: sin semilla el mismo CV podía salir 'es' en un análisis y 'en' en el
+siguiente. Aquí:
+- se fija DetectorFactory.seed → misma entrada, mismo resultado
+- solo se mira un prefijo acotado (LANG_SAMPLE_CHARS)
+- el resultado se memoiza por hash de ese prefijo (LRU por proceso)
+- el idioma de "CV + JD" sale de los dos ya detectados si coinciden; si no,
+  de una muestra con la mitad de cada uno (combine_langs)
+"""
+import hashlib, os, threading
+
+import langdetect
+from langdetect import DetectorFactory
+from langdetect.detector_factory import init_factory
+
+from .cache import TTLCache
+
+LANG_SAMPLE_CHARS = int(os.getenv("LANG_SAMPLE_CHARS", "2000"))
+
+DetectorFactory.seed = 0
+_init_lock = threading.Lock()
+_ready = False
+
+lang_cache = TTLCache(maxsize=int(os.getenv("LANG_CACHE_SIZE", "4096")))
+
+
+def _ensure_factory():
+    # La carga de perfiles de langdetect no es thread-safe: una sola vez, con lock
+    global _ready
+    if not _ready:
+        with _init_lock:
+            if not _ready:
+                init_factory()
+                _ready = True
+
+
+def _detect(sample: str) -> str:
+    try:
+        idioma = langdetect.detect(sample)
+        return "es" if idioma.startswith("es") else "en"
+    except Exception:
+        return "en"
+
+
+def detectar_idioma(texto) -> str:
+    """'es' o 'en' a partir del prefijo del texto (memoizado)."""
+    sample = (texto or "")[:LANG_SAMPLE_CHARS]
+    key = hashlib.sha1(sample.encode("utf-8", "ignore")).hexdigest()
+    lang = lang_cache.get(key)
+    if lang is None:
+        _ensure_factory()
+        lang = _detect(sample)
+        lang_cache.set(key, lang)
+    return lang
+
+
+def combine_langs(text_a, lang_a, text_b, lang_b) -> str:
+    """
+    Idioma de text_a + text_b: si los dos ya detectados coinciden es ese, sin
+    volver a detectar. Si no, se detecta sobre una muestra equilibrada (media
+    muestra de cada texto): el prefijo de la concatenación sería casi siempre
+    solo el CV y el resultado, en la práctica, el idioma del CV.
+    """
+    if lang_a == lang_b:
+        return lang_a
+    half = LANG_SAMPLE_CHARS // 2
+    return detectar_idioma((text_a or "")[:half] + " " + (text_b or "")[:half])
@@ -0,0 +1,92 @@
+# app/services/matcher.py
+"""
+Conjunto de patrones compilado en UNA expresión regular con grupos con nombre.
+
+Sustituye los bucles de `re.search` por patrón (uno por sinónimo/marcador):
+el texto se recorre una sola vez sin importar cuántos patrones haya.
+
+Con ignore_case no se usa re.IGNORECASE (con muchas alternativas es varias
+veces más lento en `re`): el texto se pasa a minúsculas una vez y los patrones
+se compilan en minúsculas. _fold reproduce las equivalencias de re.IGNORECASE
+que str.lower() no cubre (İ, ı, ſ), así el resultado es el mismo.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Optional, Set
+
+_PRE_LOWER = {0x130: "i"}               # İ: lower() da "i̇" (dos caracteres)
+_POST_LOWER = {0x131: "i", 0x17F: "s"}  # ı, ſ: minúsculas que re.I iguala a i, s
+_ESCAPE_OR_TEXT = re.compile(r"\\.|[^\\]+", re.DOTALL)
+
+
+def _fold(text: str) -> str:
+    # translate() es lento en texto no ASCII: solo si aparece alguno de esos caracteres
+    if "\u0130" in text:
+        text = text.translate(_PRE_LOWER)
+    text = text.lower()
+    if "\u0131" in text or "\u017f" in text:
+        text = text.translate(_POST_LOWER)
+    return text
+
+
+def _lower_pattern(pattern: str) -> str:
+    # minúsculas salvo en escapes (\S, \B, \W no son lo mismo que \s, \b, \w)
+    return _ESCAPE_OR_TEXT.sub(
+        lambda m: m.group() if m.group().startswith("\\") else m.group().lower(), pattern
+    )
+
+
+class PatternSet:
+    def __init__(self, groups: Dict[str, Iterable[str]], ignore_case: bool = False):
+        """
+        groups: nombre -> lista de regex; un nombre "aparece" si cualquiera de
+        sus patrones aparece en el texto (misma semántica que any(re.search)).
+        """
+        self.names = list(groups)
+        self.ignore_case = ignore_case
+        fix = _lower_pattern if ignore_case else (lambda p: p)
+        self._patterns = {name: [fix(p) for p in patterns] for name, patterns in groups.items()}
+        self._compiled = lru_cache(maxsize=None)(self._compile)
+        self._all = self._compiled(frozenset(self.names))
+
+    def _compile(self, names: FrozenSet[str]) -> re.Pattern:
+        selected = [(i, n) for i, n in enumerate(self.names) if n in names]
+        # Si todos empiezan por \b se saca fuera: en mitad de palabra la regex
+        # falla con una sola comprobación en vez de probar cada alternativa.
+        hoist = all(p.startswith("\\b") for _, n in selected for p in self._patterns[n])
+        strip = (lambda p: p[2:]) if hoist else (lambda p: p)
+        # Orden estable; el grupo gN identifica al nombre que casó
+        parts = [
+            f"(?P<g{i}>" + "|".join(f"(?:{strip(p)})" for p in self._patterns[n]) + ")"
+            for i, n in selected
+        ]
+        return re.compile(("\\b(?:%s)" if hoist else "%s") % "|".join(parts))
+
+    def _prepare(self, text: str) -> str:
+        return _fold(text) if self.ignore_case else text
+
+    def first(self, text: str) -> Optional[str]:
+        """Nombre del primer patrón encontrado (o None). Un solo search."""
+        m = self._all.search(self._prepare(text))
+        return self.names[int(m.lastgroup[1:])] if m else None
+
+    def find_all(self, text: str) -> Set[str]:
+        """
+        Nombres con al menos una coincidencia. Tras cada acierto se sigue
+        buscando desde esa misma posición solo con los nombres pendientes, así
+        un acierto no "tapa" a otro que empiece en el mismo sitio y el texto se
+        recorre una vez en total.
+        """
+        text = self._prepare(text)
+        found: Set[str] = set()
+        pending = frozenset(self.names)
+        pos = 0
+        while pending:
+            m = self._compiled(pending).search(text, pos)
+            if not m:
+                break
+            name = self.names[int(m.lastgroup[1:])]
+            found.add(name)
+            pending = pending - {name}
+            pos = m.start()
+        return found
@@ -0,0 +1,141 @@
+# app/services/pagination.py
+"""
+Paginación por cursor (keyset) para listados largos.
+
+En vez de OFFSET (que lee y descarta todas las filas anteriores) cada página
+pide "las N siguientes a la última que viste" ordenando por una clave única,
+p.ej. (created_at, id): con un índice compuesto en ese orden la página 5000
+cuesta lo mismo que la 1.
+
+El cursor es la clave de la primera/última fila de la página, serializada en
+base64 para la URL. El total es aproximado y se cachea unos segundos: contar
+la tabla entera en cada vista era lo más caro de la página.
+"""
+import base64, json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import func, literal, select, text, tuple_
+from sqlalchemy.engine import Row
+
+from ..extensions import db
+from .cache import TTLCache
+
+MAX_PER_PAGE = 100
+
+_count_cache = TTLCache(maxsize=256, ttl=60)
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str]   # ?after= para la página siguiente (None = no hay)
+    prev_cursor: Optional[str]   # ?before= para la anterior (None = es la primera)
+    per_page: int
+
+
+def clamp_per_page(value, default: int = 20) -> int:
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, MAX_PER_PAGE))
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], columns: Sequence) -> Optional[list]:
+    """Valores del cursor con el tipo de cada columna; None si falta o no es válido."""
+    if not cursor:
+        return None
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if len(raw) != len(columns):
+            return None
+        return [datetime.fromisoformat(v) if _is_datetime(c) else v for v, c in zip(raw, columns)]
+    except (ValueError, TypeError):
+        return None
+
+
+def _is_datetime(column) -> bool:
+    try:
+        return column.type.python_type is datetime
+    except NotImplementedError:
+        return False
+
+
+def keyset_page(stmt, columns: Sequence, *, after=None, before=None, per_page: int = 20,
+                key=None) -> Page:
+    """
+    Página de `stmt` (un select sin ORDER BY ni LIMIT) en orden descendente
+    por `columns` (la última debe ser única, p.ej. el id). `key(row)` devuelve
+    los valores de esas columnas para una fila (por defecto: atributos con el
+    mismo nombre de la primera entidad del row).
+    """
+    key = key or (lambda row: [getattr(row[0] if isinstance(row, Row) else row, c.key)
+                               for c in columns])
+    cols = tuple_(*columns)
+    after_v, before_v = decode_cursor(after, columns), decode_cursor(before, columns)
+
+    def bound(values):
+        return tuple_(*[literal(v, c.type) for v, c in zip(values, columns)])
+
+    base = stmt
+    if before_v is not None:
+        # Página anterior: se recorre hacia arriba (ASC) y se da la vuelta
+        stmt = stmt.where(cols > bound(before_v)).order_by(*[c.asc() for c in columns])
+    else:
+        if after_v is not None:
+            stmt = stmt.where(cols < bound(after_v))
+        stmt = stmt.order_by(*[c.desc() for c in columns])
+
+    rows = db.session.execute(stmt.limit(per_page + 1)).unique().all()
+    rows = [r if len(r) > 1 else r[0] for r in rows]
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if before_v is not None:
+        if not more:  # se llegó al principio: mejor la primera página completa
+            return keyset_page(base, columns, per_page=per_page, key=key)
+        rows.reverse()
+        has_prev, has_next = True, True
+    else:
+        has_prev, has_next = after_v is not None, more
+
+    return Page(
+        items=rows,
+        next_cursor=encode_cursor(key(rows[-1])) if rows and has_next else None,
+        prev_cursor=encode_cursor(key(rows[0])) if rows and has_prev else None,
+        per_page=per_page,
+    )
+
+
+def approx_count(model, *criteria, cache_key: Optional[str] = None) -> int:
+    """
+    Total aproximado para mostrar "~N": sin filtros en Postgres usa la
+    estadística del planner (pg_class.reltuples, sin leer la tabla); si no,
+    un COUNT cacheado 60 s por proceso (con filtros solo si se da `cache_key`,
+    que debe incluir los valores del filtro).
+    """
+    key = cache_key or (None if criteria else model.__tablename__)
+    cached = _count_cache.get(key) if key else None
+    if cached is not None:
+        return cached
+
+    n = None
+    if not criteria and db.engine.dialect.name == "postgresql":
+        est = db.session.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE relname = :t"),
+            {"t": model.__tablename__},
+        ).scalar()
+        if est is not None and est >= 0:  # -1 = tabla nunca analizada
+            n = int(est)
+    if n is None:
+        n = db.session.execute(select(func.count()).select_from(model).where(*criteria)).scalar()
+    if key:
+        _count_cache.set(key, n)
+    return n
@@ -0,0 +1,163 @@
+# app/services/query_plans.py
+"""
+Consultas "calientes" de la app y comprobación de su plan en SQLite.
+
+Cada entrada reproduce una consulta que corre en casi todas las peticiones
+(cupo, límite de comentarios, historial, listado admin, export...). `check`
+pide `EXPLAIN QUERY PLAN` de cada una y marca como fallo:
+- un `SCAN <tabla>` sin índice (recorrido completo de la tabla)
+- en las que filtran (seek=True), cualquier SCAN: recorrer un índice entero
+  filtrando por email no es mejor que recorrer la tabla
+- un `USE TEMP B-TREE FOR ORDER BY` en las que se piden ordenadas por índice
+
+Se ejecuta con `flask schema plans` (en CI o tras una migración): si alguien
+quita un índice o cambia una consulta y deja de usarlo, el comando sale con
+error.
+"""
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+from sqlalchemy import delete, func, literal, select, tuple_, update
+from sqlalchemy.orm import contains_eager
+
+from ..models import User, Execution, Comment, AnalysisJob, DailyStat
+
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?( USING .*)?$")
+_EMAIL = "someone@example.com"
+_CURSOR = datetime(2025, 1, 1)
+
+
+@dataclass
+class HotQuery:
+    name: str
+    build: Callable[[], object]
+    ordered: bool = False   # el ORDER BY debe salir del índice (sin ordenar en memoria)
+    seek: bool = True       # debe buscar en un índice (SEARCH), no recorrerlo
+
+
+@dataclass
+class PlanResult:
+    name: str
+    plan: List[str]
+    problems: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def _keyset(stmt, columns, last):
+    # Página siguiente de pagination.keyset_page (cursor ?after=)
+    bound = tuple_(*[literal(v, c.type) for v, c in zip(last, columns)])
+    return stmt.where(tuple_(*columns) < bound).order_by(*[c.desc() for c in columns]).limit(21)
+
+
+def _admin_users():
+    # routes/admin.users_list (sin ?q=: la búsqueda por subcadena siempre recorre)
+    n_execs = (select(func.count(Execution.id))
+               .where(Execution.email == User.email)
+               .correlate(User)
+               .scalar_subquery())
+    stmt = (select(User, n_execs)
+            .outerjoin(User.membership)
+            .options(contains_eager(User.membership)))
+    return _keyset(stmt, [User.created_at, User.email], (_CURSOR, _EMAIL))
+
+
+def _reserve_quota():
+    # services/analysis.reserve_quota
+    from .analysis import _limit_expr
+    return (update(User)
+            .where(User.email == _EMAIL,
+                   func.coalesce(User.execs_used, 0) + 1 <= _limit_expr())
+            .values(execs_used=func.coalesce(User.execs_used, 0) + 1))
+
+
+def _similar_execution():
+    # services/analysis._similar_execution
+    return (select(Execution.id)
+            .where(Execution.file_sha256 == "0" * 64,
+                   Execution.feedback_text.isnot(None),
+                   Execution.model_vendor.in_(("openai", "gemini")))
+            .order_by(Execution.id.desc()).limit(200))
+
+
+def _export(model, email):
+    from .export import export_stmt, EXECUTION_FIELDS, COMMENT_FIELDS
+    fields = EXECUTION_FIELDS if model is Execution else COMMENT_FIELDS
+    return export_stmt(fields, model, email)
+
+
+HOT_QUERIES: List[HotQuery] = [
+    HotQuery("quota.reserve", _reserve_quota),
+    HotQuery("comments.count_by_email",
+             lambda: select(func.count()).select_from(Comment).where(Comment.email == _EMAIL)),
+    HotQuery("comments.oldest_by_email",
+             lambda: select(Comment).where(Comment.email == _EMAIL)
+                                    .order_by(Comment.created_at.asc()).limit(1),
+             ordered=True),
+    HotQuery("history.executions_page",
+             lambda: _keyset(select(Execution), [Execution.created_at, Execution.id], (_CURSOR, 1)), ordered=True),
+    HotQuery("history.comments_page",
+             lambda: _keyset(select(Comment), [Comment.created_at, Comment.id], (_CURSOR, 1)), ordered=True),
+    HotQuery("history.executions_by_email",
+             lambda: _keyset(select(Execution).where(Execution.email == _EMAIL),
+                             [Execution.created_at, Execution.id], (_CURSOR, 1)), ordered=True),
+    HotQuery("export.executions_by_email", lambda: _export(Execution, _EMAIL), ordered=True),
+    HotQuery("export.executions_all", lambda: _export(Execution, None), ordered=True, seek=False),
+    HotQuery("export.comments_by_email", lambda: _export(Comment, _EMAIL), ordered=True),
+    HotQuery("admin.users_page", _admin_users, ordered=True),
+    HotQuery("admin.count_executions", lambda: select(func.count()).select_from(Execution), seek=False),
+    HotQuery("admin.count_comments", lambda: select(func.count()).select_from(Comment), seek=False),
+    HotQuery("admin.execs_by_user",
+             lambda: select(func.count(Execution.id)).where(Execution.email == _EMAIL)),
+    HotQuery("analysis.similar_execution", _similar_execution, ordered=True),
+    HotQuery("stats.dashboard_window",
+             lambda: select(DailyStat).where(DailyStat.day >= _CURSOR.date())),
+    HotQuery("stats.bump_day",
+             lambda: DailyStat.__table__.update()
+                     .where(DailyStat.day == _CURSOR.date(), DailyStat.model_vendor == "openai",
+                            DailyStat.resume_lang == "es")
+                     .values(executions=DailyStat.executions + 1)),
+    HotQuery("jobs.active_by_status",
+             lambda: select(AnalysisJob.status, func.count(AnalysisJob.id))
+                     .where(AnalysisJob.status.in_(("queued", "running")))
+                     .group_by(AnalysisJob.status)),
+    HotQuery("jobs.purge_finished",
+             lambda: delete(AnalysisJob)
+                     .where(AnalysisJob.status.in_(("done", "failed")), AnalysisJob.created_at < _CURSOR)),
+]
+
+
+def explain(conn, stmt) -> List[str]:
+    """Líneas `detail` de EXPLAIN QUERY PLAN para `stmt` (solo SQLite)."""
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    return [r[-1] for r in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall()]
+
+
+def problems_in(plan: List[str], ordered: bool, seek: bool) -> List[str]:
+    out = []
+    for line in plan:
+        m = _SCAN_RE.match(line.strip())
+        if m and not m.group(2):
+            out.append(f"recorre la tabla {m.group(1)} sin índice")
+        elif m and seek:
+            out.append(f"recorre entero un índice de {m.group(1)} en vez de buscar en él")
+        if ordered and "TEMP B-TREE FOR ORDER BY" in line:
+            out.append("ordena en memoria (el ORDER BY no sale de un índice)")
+    return out
+
+
+def check(conn, queries: List[HotQuery] = None) -> List[PlanResult]:
+    results = []
+    for q in queries or HOT_QUERIES:
+        plan = explain(conn, q.build())
+        results.append(PlanResult(q.name, plan, problems_in(plan, q.ordered, q.seek)))
+    return results
+
+
+def summary(results: List[PlanResult]) -> Tuple[int, int]:
+    bad = sum(1 for r in results if not r.ok)
+    return len(results) - bad, bad
@@ -1,4 +1,4 @@
-import re
+from .matcher import PatternSet
 
 ALLOWED_EXTS = {"pdf", "docx"}
 
@@ -8,6 +8,7 @@ SUSPICIOUS_PATTERNS = [
     r"import\s+os", r"subprocess\.Popen", r"socket\.", r"<?php", r"bash -c",
     r"powershell", r"base64,", r"rm -rf /"
 ]
+_SUSPICIOUS = PatternSet({"suspicious": SUSPICIOUS_PATTERNS}, ignore_case=True)
 
 def allowed_file(filename: str) -> bool:
     if not filename or "." not in filename: return False
@@ -15,7 +16,4 @@ def allowed_file(filename: str) -> bool:
     return ext in ALLOWED_EXTS
 
 def looks_suspicious(text: str) -> bool:
-    for pat in SUSPICIOUS_PATTERNS:
-        if re.search(pat, text, flags=re.IGNORECASE):
-            return True
-    return False
+    return _SUSPICIOUS.first(text) is not None
@@ -0,0 +1,275 @@
+# app/services/similarity.py
+"""
+Índice de similitud entre descripciones de puesto (JD) de las ejecuciones.
+
+Cada JD se convierte en un vector "hashed n-grams" (palabras, bigramas y
+4-gramas de caracteres → crc32 → `dim` posiciones con signo), normalizado L2:
+el coseno entre dos JDs es un producto escalar y el top-k sobre miles de filas
+es una multiplicación matriz·vector de NumPy.
+
+En disco (instance/jd_index/) son dos archivos binarios de solo-append:
+vectors.f32 (n × dim float32) e ids.i64 (n × int64) + meta.json. Añadir una
+ejecución es escribir una fila; al arrancar se leen tal cual (sin recalcular)
+y `sync` solo vectoriza las ejecuciones que falten. Los workers de gunicorn
+escriben bajo flock y cada uno incorpora lo que añadieron los demás al
+detectar que ids.i64 creció.
+"""
+import fcntl, json, logging, os, re, threading, zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .keywords import STOPWORDS, _fold
+
+_log = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+POPULAR_MAX_WINDOW = 2000  # popular(): matriz de similitudes window × window (16 MB en float32)
+_WORD_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*")
+
+
+def _features(text: str) -> List[str]:
+    words = [w for w in _WORD_RE.findall(_fold(text)) if w not in STOPWORDS]
+    feats = ["w:" + w for w in words]
+    feats += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"^{w}$"
+        feats += ["c:" + padded[i:i + 4] for i in range(max(1, len(padded) - 3))]
+    return feats
+
+
+def vectorize(text: str, dim: int) -> np.ndarray:
+    """Vector float32 normalizado (ceros si el texto no tiene términos útiles)."""
+    feats = _features(text)
+    if not feats:
+        return np.zeros(dim, dtype=np.float32)
+    h = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.uint64, count=len(feats))
+    idx = (h % dim).astype(np.intp)
+    sign = np.where((h >> 31) & 1, -1.0, 1.0)
+    vec = np.bincount(idx, weights=sign, minlength=dim)
+    vec = np.sign(vec) * np.log1p(np.abs(vec))  # tf sublineal
+    norm = np.linalg.norm(vec)
+    return (vec / norm if norm else vec).astype(np.float32)
+
+
+class JDIndex:
+    def __init__(self, path: Optional[str] = None, dim: int = 1024):
+        self.path = path
+        self.dim = int(dim)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset_memory()
+
+    # ---------- memoria ----------
+    def _reset_memory(self):
+        self._mat = np.zeros((0, self.dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._n = 0
+        self._idset = set()
+
+    def _grow(self, extra: int):
+        need = self._n + extra
+        if need > len(self._mat):
+            cap = max(need, 2 * len(self._mat), 256)
+            mat = np.zeros((cap, self.dim), dtype=np.float32)
+            ids = np.zeros(cap, dtype=np.int64)
+            mat[: self._n] = self._mat[: self._n]
+            ids[: self._n] = self._ids[: self._n]
+            self._mat, self._ids = mat, ids
+
+    def _push(self, ids: np.ndarray, vecs: np.ndarray):
+        self._grow(len(ids))
+        self._mat[self._n: self._n + len(ids)] = vecs
+        self._ids[self._n: self._n + len(ids)] = ids
+        self._n += len(ids)
+        self._idset.update(int(i) for i in ids)
+
+    # ---------- disco ----------
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _ensure_loaded(self):
+        """Carga por proceso (tras el fork) y trae las filas que añadieron otros workers."""
+        if self._pid != os.getpid():
+            self._reset_memory()
+            self._pid = os.getpid()
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+                self._check_meta()
+        if self.path:
+            self._read_tail()
+
+    def _check_meta(self):
+        meta = {"version": INDEX_VERSION, "dim": self.dim}
+        try:
+            with open(self._file("meta.json")) as fh:
+                if json.load(fh) == meta:
+                    return
+            _log.warning("Índice de JDs con otro formato/dim: se descarta (flask jdindex rebuild)")
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            _log.warning("meta.json del índice de JDs ilegible: se descarta")
+        self._truncate_files(0)
+        with open(self._file("meta.json"), "w") as fh:
+            json.dump(meta, fh)
+
+    def _truncate_files(self, rows: int):
+        for name, size in (("ids.i64", 8), ("vectors.f32", 4 * self.dim)):
+            with open(self._file(name), "ab") as fh:
+                fh.truncate(rows * size)
+
+    def _read_tail(self):
+        try:
+            total = os.path.getsize(self._file("ids.i64")) // 8
+        except FileNotFoundError:
+            return
+        if total <= self._n:
+            return
+        # ids.i64 se escribe después del vector: si está, su fila está completa
+        with open(self._file("ids.i64"), "rb") as fh:
+            fh.seek(self._n * 8)
+            ids = np.fromfile(fh, dtype=np.int64, count=total - self._n)
+        with open(self._file("vectors.f32"), "rb") as fh:
+            fh.seek(self._n * 4 * self.dim)
+            vecs = np.fromfile(fh, dtype=np.float32, count=len(ids) * self.dim)
+        if len(vecs) < len(ids) * self.dim:
+            ids = ids[: len(vecs) // self.dim]
+        self._push(ids, vecs.reshape(-1, self.dim)[: len(ids)])
+
+    def _append_files(self, ids: np.ndarray, vecs: np.ndarray):
+        with open(self._file("lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._read_tail()
+                keep = np.array([int(i) not in self._idset for i in ids], dtype=bool)
+                ids, vecs = ids[keep], vecs[keep]
+                if not len(ids):
+                    return
+                # Un append a medias (caída entre los dos write) deja vectores de
+                # más: se recortan a la cantidad de ids antes de escribir.
+                self._truncate_files(self._n)
+                with open(self._file("vectors.f32"), "ab") as fh:
+                    fh.write(np.ascontiguousarray(vecs, dtype=np.float32).tobytes())
+                with open(self._file("ids.i64"), "ab") as fh:
+                    fh.write(np.ascontiguousarray(ids, dtype=np.int64).tobytes())
+                self._push(ids, vecs)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    # ---------- API ----------
+    def add_many(self, items: Iterable[Tuple[int, str]]):
+        """Añade (exec_id, jobdesc); ignora ids ya indexados."""
+        items = [(int(i), t) for i, t in items if t and t.strip()]
+        if not items:
+            return 0
+        ids = np.array([i for i, _ in items], dtype=np.int64)
+        vecs = np.vstack([vectorize(t, self.dim) for _, t in items])
+        with self._lock:
+            self._ensure_loaded()
+            before = self._n
+            if self.path:
+                self._append_files(ids, vecs)
+            else:
+                keep = np.array([int(i) not in self._idset for i in ids], dtype=bool)
+                self._push(ids[keep], vecs[keep])
+            return self._n - before
+
+    def add(self, exec_id: int, jobdesc: str):
+        return self.add_many([(exec_id, jobdesc)])
+
+    def query(self, text: str, k: int = 10, min_score: float = 0.0,
+              candidates: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Top-k (exec_id, coseno) más parecidos a `text`, opcionalmente entre `candidates`."""
+        q = vectorize(text, self.dim)
+        with self._lock:
+            self._ensure_loaded()
+            mat, ids = self._mat[: self._n], self._ids[: self._n]
+        if not len(ids) or not q.any():
+            return []
+        if candidates is not None:
+            mask = np.isin(ids, np.fromiter(candidates, dtype=np.int64))
+            mat, ids = mat[mask], ids[mask]
+            if not len(ids):
+                return []
+        scores = mat @ q
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def popular(self, threshold: float = 0.9, window: int = POPULAR_MAX_WINDOW, limit: int = 20) -> List[Dict]:
+        """
+        Agrupa las últimas `window` JDs casi iguales (coseno ≥ threshold) por
+        líder: cada fila no asignada abre un grupo con todas las que se le
+        parecen. Devuelve los grupos más grandes.
+        Las similitudes salen de un solo producto matriz·matriz (window² floats,
+        por eso window se acota a POPULAR_MAX_WINDOW); el agrupado solo recorre
+        la matriz booleana resultante.
+        """
+        window = max(0, min(int(window), POPULAR_MAX_WINDOW))
+        with self._lock:
+            self._ensure_loaded()
+            start = max(0, self._n - window)
+            mat, ids = self._mat[start: self._n], self._ids[start: self._n]
+        if not len(ids):
+            return []
+        close = (mat @ mat.T) >= threshold
+        unassigned = np.ones(len(ids), dtype=bool)
+        groups = []
+        for i in range(len(ids) - 1, -1, -1):  # las más recientes como líderes
+            if not unassigned[i]:
+                continue
+            members = np.flatnonzero(unassigned & close[i])
+            unassigned[members] = False
+            groups.append({"leader": int(ids[i]), "size": int(len(members)),
+                           "exec_ids": [int(x) for x in ids[members][:50]]})
+        groups.sort(key=lambda g: -g["size"])
+        return groups[:limit]
+
+    def clear(self):
+        with self._lock:
+            self._reset_memory()
+            self._pid = os.getpid()
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+                self._check_meta()
+                self._truncate_files(0)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                "rows": self._n,
+                "dim": self.dim,
+                "path": self.path,
+                "memory_bytes": int(self._mat.nbytes + self._ids.nbytes),
+                "max_exec_id": int(self._ids[: self._n].max()) if self._n else None,
+            }
+
+
+jd_index = JDIndex()
+
+
+def init_jd_index(app):
+    """Ruta y dimensión según JD_INDEX_* (se llama desde create_app; carga perezosa)."""
+    global jd_index
+    path = os.path.join(app.instance_path, "jd_index") if app.config.get("JD_INDEX_ENABLED", True) else None
+    jd_index = JDIndex(path, dim=int(app.config.get("JD_INDEX_DIM", 1024)))
+
+
+def sync_from_db(batch: int = 500) -> int:
+    """Indexa las ejecuciones con JD que aún no están en el índice (por id creciente)."""
+    from ..extensions import db
+    from ..models import Execution
+
+    last = jd_index.stats()["max_exec_id"] or 0
+    added = 0
+    while True:
+        rows = (db.session.query(Execution.id, Execution.jobdesc)
+                .filter(Execution.id > last, Execution.jobdesc.isnot(None))
+                .order_by(Execution.id).limit(batch).all())
+        if not rows:
+            return added
+        added += jd_index.add_many(rows)
+        last = rows[-1][0]
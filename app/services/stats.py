@@ -0,0 +1,155 @@
+# app/services/stats.py
+"""
+Agregados diarios de uso para el panel admin.
+
+Cada ejecución suma 1 a su fila (día, proveedor, idioma del CV) de
+daily_stats en la misma transacción que la guarda (record_execution), así el
+panel lee unas pocas filas por día en vez de contar la tabla executions. Las
+medias se guardan como suma + número de valores.
+
+`dashboard` cachea el resultado STATS_CACHE_TTL segundos por proceso;
+`rebuild` recalcula días completos desde executions (backfill, o tras borrar
+ejecuciones a mano).
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import DailyStat, Execution, User, Comment
+from .cache import TTLCache
+from .pagination import approx_count
+
+_dashboard_cache = TTLCache(maxsize=16, ttl=30)
+
+_COUNTERS = ("executions", "score_sum", "score_count", "ats_sum", "ats_count")
+
+
+def _deltas(score, ats_score) -> Dict[str, int]:
+    return {
+        "executions": 1,
+        "score_sum": int(score or 0), "score_count": int(score is not None),
+        "ats_sum": int(ats_score or 0), "ats_count": int(ats_score is not None),
+    }
+
+
+def _bump(day: date, vendor: str, lang: str, deltas: Dict[str, int]):
+    """UPDATE de la fila del día; si aún no existe, INSERT (bajo savepoint por si otro worker gana)."""
+    t = DailyStat.__table__
+    key = (t.c.day == day, t.c.model_vendor == vendor, t.c.resume_lang == lang)
+    increment = t.update().where(*key).values({t.c[k]: t.c[k] + v for k, v in deltas.items()})
+    if db.session.execute(increment).rowcount:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(t.insert().values(day=day, model_vendor=vendor, resume_lang=lang, **deltas))
+    except IntegrityError:
+        db.session.execute(increment)
+
+
+def record_execution(ex: Execution):
+    """Suma `ex` al agregado de su día (sin commit: va en la transacción de quien guarda)."""
+    created = ex.created_at or datetime.utcnow()
+    _bump(created.date(), ex.model_vendor or "", ex.resume_lang or "", _deltas(ex.score, ex.ats_score))
+
+
+def rebuild(since: Optional[date] = None, batch: int = 5000) -> int:
+    """
+    Recalcula daily_stats desde executions (todos los días o desde `since`)
+    y confirma. Devuelve el nº de filas agregadas escritas.
+    """
+    t = DailyStat.__table__
+    stmt = select(Execution.created_at, Execution.model_vendor, Execution.resume_lang,
+                  Execution.score, Execution.ats_score)
+    if since is not None:
+        stmt = stmt.where(Execution.created_at >= datetime.combine(since, datetime.min.time()))
+
+    # La fecha se saca en Python: date()/CAST AS DATE no se comportan igual en SQLite y Postgres
+    acc = defaultdict(lambda: dict.fromkeys(_COUNTERS, 0))
+    for part in db.session.execute(stmt.execution_options(yield_per=batch)).partitions():
+        for created, vendor, lang, score, ats in part:
+            row = acc[(created.date(), vendor or "", lang or "")]
+            for k, v in _deltas(score, ats).items():
+                row[k] += v
+
+    try:
+        db.session.execute(t.delete().where(t.c.day >= since) if since is not None else t.delete())
+        if acc:
+            db.session.execute(t.insert(), [
+                {"day": d, "model_vendor": v, "resume_lang": l, **row} for (d, v, l), row in acc.items()
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    clear_cache()
+    return len(acc)
+
+
+def _avg(total, n):
+    return round(total / n, 1) if n else None
+
+
+def dashboard(days: Optional[int] = None) -> Dict:
+    """
+    Totales y series para el panel: ejecuciones por día (con media de score y
+    ATS) de los últimos `days` días, y reparto por proveedor e idioma en ese
+    periodo. Usuarios y comentarios salen de approx_count.
+    """
+    days = int(days or current_app.config.get("STATS_DAYS", 30))
+    cached = _dashboard_cache.get(days)
+    if cached is not None:
+        return cached
+
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    rows = db.session.execute(
+        select(DailyStat.day, DailyStat.model_vendor, DailyStat.resume_lang,
+               *[getattr(DailyStat, k) for k in _COUNTERS])
+        .where(DailyStat.day >= since)
+    ).all()
+
+    def bucket():
+        return dict.fromkeys(_COUNTERS, 0)
+
+    by_day, by_vendor, by_lang, window = defaultdict(bucket), defaultdict(bucket), defaultdict(bucket), bucket()
+    for day, vendor, lang, *values in rows:
+        for target in (by_day[day], by_vendor[vendor or "—"], by_lang[lang or "—"], window):
+            for k, v in zip(_COUNTERS, values):
+                target[k] += v
+
+    def summary(b):
+        return {"executions": b["executions"],
+                "avg_score": _avg(b["score_sum"], b["score_count"]),
+                "avg_ats": _avg(b["ats_sum"], b["ats_count"])}
+
+    data = {
+        "days": days,
+        "totals": {
+            "executions": db.session.execute(select(func.coalesce(func.sum(DailyStat.executions), 0))).scalar(),
+            "users": approx_count(User),
+            "comments": approx_count(Comment),
+        },
+        "window": summary(window),
+        "series": [{"day": (since + timedelta(days=i)).isoformat(),
+                    **summary(by_day.get(since + timedelta(days=i), bucket()))} for i in range(days)],
+        "by_vendor": sorted(({"vendor": k, **summary(v)} for k, v in by_vendor.items()),
+                            key=lambda r: -r["executions"]),
+        "by_lang": sorted(({"lang": k, **summary(v)} for k, v in by_lang.items()),
+                          key=lambda r: -r["executions"]),
+    }
+    _dashboard_cache.set(days, data)
+    return data
+
+
+def clear_cache():
+    _dashboard_cache.clear()
+
+
+def init_stats(app):
+    """TTL de la caché del panel según STATS_CACHE_TTL (se llama desde create_app)."""
+    global _dashboard_cache
+    _dashboard_cache = TTLCache(maxsize=16, ttl=max(1, int(app.config.get("STATS_CACHE_TTL", 30))))
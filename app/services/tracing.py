@@ -0,0 +1,276 @@
+# app/services/tracing.py
+"""
+Trazas ligeras por request y por análisis: cuánto se fue en cada etapa.
+
+- `trace(kind)` abre una traza en el contexto actual (contextvars); el
+  request web la abre en before_request y el job de análisis en su hilo.
+- `stage(nombre)` mide un bloque y lo suma a la traza en curso (no hace nada
+  si no hay traza). El tiempo de SQL se suma solo, a la etapa "db".
+- `add_tokens(vendor, in, out)` acumula tokens de los LLM.
+- `wrap(fn)` lleva la traza a otro hilo (pools de batch y hedge).
+
+Al cerrar una traza sus totales por etapa van a histogramas en memoria que
+`render_prometheus` publica en formato texto (/admin/metrics). Son por
+proceso, con label worker=<pid>: en Prometheus, `sum without(worker)`.
+"""
+import contextvars, os, threading, time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace", default=None)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Trace:
+    def __init__(self, kind: str, parent: Optional["Trace"] = None):
+        self.kind = kind
+        self.parent = parent
+        self.started = time.perf_counter()
+        self.stages: Dict[str, list] = {}   # nombre -> [ms, veces]
+        self.tokens: Dict[str, list] = {}   # vendor -> [entrada, salida]
+        self.extra: Dict[str, float] = {}   # entradas de Server-Timing ajenas (p.ej. del job)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, ms: float):
+        with self._lock:
+            s = self.stages.setdefault(name, [0.0, 0])
+            s[0] += ms
+            s[1] += 1
+        if self.parent:
+            self.parent.add(name, ms)
+
+    def add_tokens(self, vendor: str, tokens_in: int, tokens_out: int):
+        with self._lock:
+            t = self.tokens.setdefault(vendor, [0, 0])
+            t[0] += tokens_in
+            t[1] += tokens_out
+        if self.parent:
+            self.parent.add_tokens(vendor, tokens_in, tokens_out)
+
+    def include(self, timings: Optional[dict], prefix: str):
+        """Añade al Server-Timing las etapas de otra traza ya guardada (snapshot)."""
+        for name, ms in ((timings or {}).get("stages") or {}).items():
+            self.extra[prefix + name] = ms
+        if timings and timings.get("total_ms") is not None:
+            self.extra[prefix + "total"] = timings["total_ms"]
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def tokens_total(self):
+        with self._lock:
+            return (sum(t[0] for t in self.tokens.values()),
+                    sum(t[1] for t in self.tokens.values()))
+
+    def snapshot(self) -> dict:
+        """Etapas (ms), tokens y total hasta ahora, para guardar en JSON."""
+        with self._lock:
+            return {
+                "total_ms": round(self.elapsed_ms, 1),
+                "stages": {k: round(v[0], 1) for k, v in self.stages.items()},
+                "tokens": {k: {"in": v[0], "out": v[1]} for k, v in self.tokens.items()},
+            }
+
+    def server_timing(self) -> str:
+        with self._lock:
+            parts = [f"{k};dur={v[0]:.1f}" for k, v in self.stages.items()]
+        parts += [f"{k};dur={v:.1f}" for k, v in self.extra.items()]
+        parts.append(f"total;dur={self.elapsed_ms:.1f}")
+        return ", ".join(parts)
+
+
+def current() -> Optional[Trace]:
+    return _current.get()
+
+
+def start(kind: str, parent: Optional[Trace] = None):
+    """Abre una traza y devuelve (traza, token); cerrar con finish(token)."""
+    t = Trace(kind, parent)
+    return t, _current.set(t)
+
+
+def finish(token, label: str = ""):
+    """Cierra la traza del token, publica sus histogramas y restaura la anterior."""
+    t = _current.get()
+    _current.reset(token)
+    if t is not None and t.parent is None:
+        metrics.observe(t, label)
+    return t
+
+
+@contextmanager
+def trace(kind: str, label: str = "", parent: Optional[Trace] = None):
+    t, token = start(kind, parent)
+    try:
+        yield t
+    finally:
+        finish(token, label)
+
+
+@contextmanager
+def stage(name: str):
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t.add(name, (time.perf_counter() - t0) * 1000)
+
+
+def add_tokens(vendor: str, tokens_in, tokens_out):
+    tokens_in, tokens_out = int(tokens_in or 0), int(tokens_out or 0)
+    if not (tokens_in or tokens_out):
+        return
+    t = _current.get()
+    if t is not None:
+        t.add_tokens(vendor, tokens_in, tokens_out)
+    metrics.count_tokens(vendor, tokens_in, tokens_out)
+
+
+def wrap(fn):
+    """
+    `fn` para otro hilo, con el contexto (y la traza) de quien la envía.
+    Un contexto copiado no se puede usar en dos hilos a la vez: un wrap por submit.
+    """
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
+
+
+# ---------- SQL ----------
+@event.listens_for(Engine, "before_cursor_execute")
+def _sql_start(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("trace_t0", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _sql_end(conn, cursor, statement, parameters, context, executemany):
+    t = _current.get()
+    stack = conn.info.get("trace_t0")
+    if t is not None and stack:
+        t.add("db", (time.perf_counter() - stack.pop()) * 1000)
+
+
+# ---------- histogramas ----------
+class _Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_hist: Dict[tuple, list] = {}     # (kind, stage) -> [buckets..., sum, count]
+        self.total_hist: Dict[tuple, list] = {}     # (kind, label) -> idem
+        self.tokens: Dict[tuple, int] = {}          # (vendor, "in"/"out") -> total
+
+    @staticmethod
+    def _observe(table, key, seconds):
+        h = table.get(key)
+        if h is None:
+            h = table[key] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, b in enumerate(BUCKETS):
+            if seconds <= b:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+
+    def observe(self, t: Trace, label: str):
+        total = t.elapsed_ms / 1000
+        with t._lock:
+            stages = {k: v[0] / 1000 for k, v in t.stages.items()}
+        with self._lock:
+            self._observe(self.total_hist, (t.kind, label or ""), total)
+            for name, seconds in stages.items():
+                self._observe(self.stage_hist, (t.kind, name), seconds)
+
+    def count_tokens(self, vendor, tokens_in, tokens_out):
+        with self._lock:
+            for kind, n in (("in", tokens_in), ("out", tokens_out)):
+                self.tokens[(vendor, kind)] = self.tokens.get((vendor, kind), 0) + n
+
+    def reset(self):
+        with self._lock:
+            self.stage_hist.clear()
+            self.total_hist.clear()
+            self.tokens.clear()
+
+
+metrics = _Metrics()
+
+
+def _esc(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**kw) -> str:
+    return ",".join(f'{k}="{_esc(v)}"' for k, v in kw.items())
+
+
+def _histogram(lines, name, table, label_names):
+    for key, h in sorted(table.items()):
+        base = dict(zip(label_names, key), worker=os.getpid())
+        for b, n in zip(BUCKETS, h):
+            lines.append(f"{name}_bucket{{{_labels(**base, le=b)}}} {n}")
+        lines.append(f"{name}_bucket{{{_labels(**base, le='+Inf')}}} {h[-1]}")
+        lines.append(f"{name}_sum{{{_labels(**base)}}} {h[-2]:.6f}")
+        lines.append(f"{name}_count{{{_labels(**base)}}} {h[-1]}")
+
+
+def render_prometheus() -> str:
+    """Histogramas y contadores de este proceso en formato texto de Prometheus (0.0.4)."""
+    with metrics._lock:
+        stage_hist = {k: list(v) for k, v in metrics.stage_hist.items()}
+        total_hist = {k: list(v) for k, v in metrics.total_hist.items()}
+        tokens = dict(metrics.tokens)
+
+    lines = [
+        "# HELP cvscanner_duration_seconds Duración total por request (kind=request) o análisis (kind=analysis).",
+        "# TYPE cvscanner_duration_seconds histogram",
+    ]
+    _histogram(lines, "cvscanner_duration_seconds", total_hist, ("kind", "endpoint"))
+    lines += [
+        "# HELP cvscanner_stage_seconds Tiempo por etapa dentro de cada request/análisis.",
+        "# TYPE cvscanner_stage_seconds histogram",
+    ]
+    _histogram(lines, "cvscanner_stage_seconds", stage_hist, ("kind", "stage"))
+    lines += [
+        "# HELP cvscanner_llm_tokens_total Tokens de los LLM (direction=in: prompt, out: respuesta).",
+        "# TYPE cvscanner_llm_tokens_total counter",
+    ]
+    for (vendor, kind), n in sorted(tokens.items()):
+        lines.append(f"cvscanner_llm_tokens_total{{{_labels(vendor=vendor, direction=kind, worker=os.getpid())}}} {n}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- Flask ----------
+def init_tracing(app):
+    """Traza por request y cabecera Server-Timing (se llama desde create_app)."""
+    from flask import g, request
+
+    if not app.config.get("TRACING_ENABLED", True):
+        return
+    server_timing = app.config.get("SERVER_TIMING_ENABLED", True)
+
+    @app.before_request
+    def _trace_start():
+        g._trace_token = start("request")[1]
+
+    @app.after_request
+    def _trace_header(resp):
+        t = current()
+        if server_timing and t is not None:
+            resp.headers["Server-Timing"] = t.server_timing()
+        return resp
+
+    @app.teardown_request
+    def _trace_end(exc=None):
+        token = g.pop("_trace_token", None)
+        if token is not None:
+            try:
+                finish(token, request.endpoint or "")
+            except ValueError:  # token de otro contexto (no debería pasar)
+                pass
@@ -0,0 +1,34 @@
+"""backfill users.execs_used from executions
+
+Revision ID: a8d3f5c1b7e2
+Revises: f2c7b9e1a3d5
+Create Date: 2025-09-13 09:37:12.904416
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3f5c1b7e2'
+down_revision = 'f2c7b9e1a3d5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # El cupo pasa a contarse con users.execs_used (reserva atómica antes del
+    # LLM): se alinea con las ejecuciones ya guardadas. Solo sube: un contador
+    # mayor que las filas que quedan (p.ej. ejecuciones borradas) es legítimo.
+    # (WHERE en vez de MAX/GREATEST: vale igual en SQLite y Postgres)
+    count = "(SELECT COUNT(*) FROM executions WHERE executions.email = users.email)"
+    op.execute(
+        f"UPDATE users SET execs_used = {count} "
+        f"WHERE COALESCE(execs_used, 0) < {count}"
+    )
+
+
+def downgrade():
+    # Solo datos y sin vuelta atrás: no se guardó el valor previo de
+    # execs_used. Bajar esta revisión deja los contadores como están.
+    pass
@@ -0,0 +1,23 @@
+# tests/conftest.py
+import os
+
+import pytest
+
+# Antes de importar la app: la config se lee del entorno al importar
+os.environ.setdefault("JD_INDEX_ENABLED", "false")
+os.environ.setdefault("LLM_STREAMING_ENABLED", "false")
+
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App con una SQLite propia por test, creada desde los modelos."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    app = create_app()
+    app.config.update(TESTING=True)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
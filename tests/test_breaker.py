@@ -0,0 +1,73 @@
+# tests/test_breaker.py
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ai
+from app.services.breaker import CircuitBreaker
+
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))], usage=None)
+
+
+class _FakeOpenAI:
+    """Cliente mínimo: stream con el primer trozo al instante y el resto lento."""
+
+    def __init__(self, pieces, delay):
+        self.pieces, self.delay = pieces, delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **kw):
+        return self
+
+    def _create(self, stream=False, **kw):
+        assert stream
+
+        def gen():
+            for i, piece in enumerate(self.pieces):
+                if i:
+                    time.sleep(self.delay)
+                yield _chunk(piece)
+        return gen()
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    b = CircuitBreaker("openai", failure_threshold=1, reset_timeout=60, slow_call_seconds=0.05)
+    monkeypatch.setitem(ai.breakers, "openai", b)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    return b
+
+
+def test_long_stream_with_fast_first_token_is_not_slow(breaker, monkeypatch):
+    monkeypatch.setattr(ai, "openai_client", lambda: _FakeOpenAI(["72%\n", "a ", "b ", "c"], delay=0.05))
+
+    text, err = ai.analizar_openai("cv", "jd", on_delta=lambda t: None, idioma="es")
+
+    assert err is None and text.startswith("72%")
+    assert breaker.snapshot()["success"] == 1
+    assert breaker.snapshot()["slow"] == 0
+    assert breaker.state == "closed"
+
+
+def test_slow_first_token_still_counts_as_slow(breaker, monkeypatch):
+    fake = _FakeOpenAI(["72%\n", "a"], delay=0)
+    create = fake._create
+
+    def late_create(**kw):
+        time.sleep(0.08)
+        return create(**kw)
+
+    fake.chat.completions.create = late_create
+    monkeypatch.setattr(ai, "openai_client", lambda: fake)
+
+    ai.analizar_openai("cv", "jd", on_delta=lambda t: None, idioma="es")
+
+    assert breaker.snapshot()["slow"] == 1
+    assert breaker.state == "open"
+
+
+def test_default_slow_threshold_is_above_the_read_timeout():
+    assert ai.breakers["openai"].slow_call_seconds > ai.OPENAI_READ_TIMEOUT
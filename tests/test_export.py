@@ -0,0 +1,67 @@
+# tests/test_export.py
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+from flask import url_for
+
+from app.bench import _export_csv_before
+from app.extensions import db
+from app.models import Comment, Execution
+from app.services.export import (COMMENT_FIELDS, EXECUTION_FIELDS, FETCH_BATCH, csv_chunks,
+                                 encode_chunks, export_stmt, stream_rows)
+
+
+@pytest.fixture
+def filled(app):
+    """Ejecuciones y comentarios de varios usuarios, con nulos y saltos de línea."""
+    t0 = datetime(2024, 1, 1)
+    emails = ["a@x.com", "b@x.com", "c@x.com"]
+    for i in range(250):
+        db.session.add(Execution(
+            email=emails[i % 3], uploaded_filename=None if i % 7 == 0 else f"cv, \"{i}\".pdf",
+            uploaded_ext="pdf", uploaded_size=None if i % 11 == 0 else 1000 + i,
+            model_vendor="openai" if i % 2 else None, model_name="gpt-4o",
+            score=None if i % 5 == 0 else i % 100, resume_lang="es", jd_lang="en",
+            feedback_text="70%\nfeedback", created_at=t0 + timedelta(minutes=i)))
+    for i in range(40):
+        db.session.add(Comment(email=emails[i % 3], name=None if i % 4 == 0 else f"Nombre {i}",
+                               text=f"línea 1\nlínea 2, \"{i}\"", created_at=t0 + timedelta(minutes=i)))
+    db.session.commit()
+    return emails
+
+
+def _streamed(fields, model, email=None, batch=FETCH_BATCH):
+    rows = stream_rows(db.session, export_stmt(fields, model, email), batch)
+    return "".join(csv_chunks(fields, rows))
+
+
+@pytest.mark.parametrize("email", [None, "a@x.com", "nadie@x.com"])
+def test_executions_export_matches_previous_csv(filled, email):
+    # Lotes pequeños para cruzar varios límites de lote
+    assert _streamed(EXECUTION_FIELDS, Execution, email, batch=17) == \
+        _export_csv_before(db.session, "executions", email)
+
+
+@pytest.mark.parametrize("email", [None, "b@x.com"])
+def test_comments_export_matches_previous_csv(filled, email):
+    assert _streamed(COMMENT_FIELDS, Comment, email) == _export_csv_before(db.session, "comments", email)
+
+
+def test_gzip_export_decompresses_to_the_same_csv(filled):
+    rows = stream_rows(db.session, export_stmt(EXECUTION_FIELDS, Execution))
+    body = b"".join(encode_chunks(csv_chunks(EXECUTION_FIELDS, rows, chunk_bytes=512), gzip=True))
+    assert gzip.decompress(body).decode("utf-8") == _export_csv_before(db.session)
+
+
+def test_export_route_streams_the_previous_csv(app, filled):
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["user_email"] = "c@x.com"
+
+    with app.test_request_context():
+        url = url_for("history.export_history")
+    resp = client.get(url)
+
+    assert resp.status_code == 200
+    assert resp.get_data(as_text=True) == _export_csv_before(db.session, "executions", "c@x.com")
@@ -0,0 +1,60 @@
+# tests/test_files.py
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+import pytest
+
+from app.services import files
+
+
+def _pdf(words=50):
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Experiencia laboral " * words)
+    return doc.tobytes()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Pool de extracción de un hijo; se descarta al terminar el test."""
+    monkeypatch.setitem(files._pool, "workers", 1)
+    monkeypatch.setitem(files._pool, "max_tasks", 50)
+    for k in ("tasks", "timeouts", "crashes", "restarts"):
+        monkeypatch.setitem(files._pool, k, 0)
+    yield files._pool
+    if files._pool["executor"] is not None:
+        files._reset_pool(files._pool["executor"])
+
+
+def test_queue_wait_does_not_count_against_the_timeout(pool):
+    # Un solo hijo (que además tarda en arrancar con spawn) y 8 parseos a la vez:
+    # casi todos esperan en cola más que el timeout, pero ninguno lo agota
+    pool["timeout"] = 1.0
+    data = _pdf()
+    with ThreadPoolExecutor(8) as ex:
+        texts = [text for text, _ in ex.map(lambda _: files.parse_document(data, "pdf"), range(8))]
+
+    assert all("Experiencia laboral" in t for t in texts)
+    assert files.extract_pool_stats()["timeouts"] == 0
+
+
+def test_timeout_in_child_keeps_the_pool(pool):
+    pool["timeout"] = 1.0
+    files.parse_document(_pdf(), "pdf")  # arranca el hijo
+    executor = pool["executor"]
+
+    pool["timeout"] = 1e-6  # la alarma del hijo salta dentro del parseo
+    with pytest.raises(files.ExtractionFailed, match="timeout"):
+        files.parse_document(_pdf(2000), "pdf")
+
+    pool["timeout"] = 1.0
+    assert files.parse_document(_pdf(), "pdf")[0]
+    assert pool["executor"] is executor
+    assert files.extract_pool_stats()["restarts"] == 0
+
+
+def test_submit_on_a_shut_down_pool_retries_on_a_fresh_one(pool):
+    pool["timeout"] = 1.0
+    files._get_pool().shutdown(wait=True)
+
+    assert files.parse_document(_pdf(), "pdf")[0]
+    assert files.extract_pool_stats()["restarts"] == 1
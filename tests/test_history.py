@@ -0,0 +1,64 @@
+# tests/test_history.py
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+
+from app.extensions import db
+from app.models import Execution
+from app.services.pagination import keyset_page
+
+_COLS = [Execution.created_at, Execution.id]
+_META = ("id", "created_at", "email", "uploaded_filename", "uploaded_ext", "uploaded_size",
+         "model_vendor", "model_name", "score", "resume_lang", "jd_lang")
+
+
+@pytest.fixture
+def filled(app):
+    # Cada tres filas comparten created_at: el id tiene que desempatar
+    t0 = datetime(2024, 1, 1)
+    for i in range(95):
+        db.session.add(Execution(
+            email=f"u{i % 4}@x.com", uploaded_filename=f"cv_{i}.pdf", uploaded_ext="pdf",
+            uploaded_size=1000 + i, model_vendor="openai", model_name="gpt-4o", score=i % 100,
+            resume_lang="es", jd_lang="en", created_at=t0 + timedelta(minutes=i // 3),
+            feedback_text="70%\n" + "x" * 2000, feedback_html="<p>x</p>", jobdesc="jd " * 100))
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def _walk(options, per_page=20):
+    """Todas las páginas hacia delante y luego hacia atrás: metadatos de cada página."""
+    stmt = select(Execution).options(*options)
+    pages, page = [], keyset_page(stmt, _COLS, per_page=per_page)
+    while True:
+        pages.append([tuple(getattr(e, a) for a in _META) for e in page.items])
+        if not page.next_cursor:
+            break
+        page = keyset_page(stmt, _COLS, after=page.next_cursor, per_page=per_page)
+    while page.prev_cursor:
+        page = keyset_page(stmt, _COLS, before=page.prev_cursor, per_page=per_page)
+        pages.append([tuple(getattr(e, a) for a in _META) for e in page.items])
+    db.session.expunge_all()
+    return pages
+
+
+def test_deferred_pages_return_the_same_rows_as_full_rows(filled):
+    deferred = _walk([])
+    full = _walk([Execution.with_body()])
+
+    assert deferred == full
+    forward = [row for page in deferred[:5] for row in page]
+    assert len(forward) == 95 and len({row[0] for row in forward}) == 95
+    assert deferred[-1] == deferred[0]  # de vuelta en la primera página
+
+
+def test_body_columns_are_not_loaded_by_the_listing(filled):
+    page = keyset_page(select(Execution), _COLS, per_page=5)
+    with pytest.raises(InvalidRequestError):
+        page.items[0].feedback_text
+
+    db.session.expunge_all()
+    page = keyset_page(select(Execution).options(Execution.with_body()), _COLS, per_page=5)
+    assert page.items[0].feedback_text.startswith("70%")
@@ -0,0 +1,55 @@
+# tests/test_jobs.py
+from datetime import datetime, timedelta
+
+from app.extensions import db
+from app.models import AnalysisJob
+from app.services import jobs
+
+
+def _job(status, hours_ago, **kw):
+    job = AnalysisJob(id=f"{status}{hours_ago}", email="a@x.com", status=status,
+                      created_at=datetime.utcnow() - timedelta(hours=hours_ago),
+                      result_json='{"feedback": "..."}', **kw)
+    db.session.add(job)
+    return job
+
+
+def _ids():
+    return {j.id for j in AnalysisJob.query.all()}
+
+
+def test_purge_finished_only_deletes_old_finished_jobs(app):
+    for status in ("done", "failed", "queued", "running"):
+        _job(status, 48)
+        _job(status, 1)
+    db.session.commit()
+
+    assert jobs.purge_finished(24) == 2
+    assert _ids() == {"done1", "failed1", "queued48", "queued1", "running48", "running1"}
+
+
+def test_purge_cli_uses_configured_retention(app):
+    _job("done", 10)
+    _job("done", 1)
+    db.session.commit()
+    app.config["ANALYSIS_JOB_RETENTION_HOURS"] = 5
+
+    result = app.test_cli_runner().invoke(args=["jobs", "purge"])
+
+    assert result.exit_code == 0, result.output
+    assert "1 jobs" in result.output
+    assert _ids() == {"done1"}
+
+
+def test_submit_job_purges_at_most_once_per_interval(app, monkeypatch):
+    monkeypatch.setattr(jobs, "_last_purge", 0.0)
+    _job("done", 48)
+    db.session.commit()
+
+    jobs.submit_job("a@x.com", lambda: {})
+    assert "done48" not in _ids()
+
+    _job("failed", 48)
+    db.session.commit()
+    jobs.submit_job("a@x.com", lambda: {})
+    assert "failed48" in _ids()  # dentro de _PURGE_EVERY: no se vuelve a purgar
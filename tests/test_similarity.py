@@ -0,0 +1,79 @@
+# tests/test_similarity.py
+import numpy as np
+import pytest
+
+from app.services import analysis, similarity
+from app.services.similarity import JDIndex, vectorize
+
+JDS = [
+    "Desarrollador backend Python con Django y AWS",
+    "Desarrollador backend Python con Django y AWS.",
+    "Chef de cocina con experiencia en restaurantes",
+    "Data engineer with Spark, Airflow and SQL",
+    "Desarrollador backend Python con Django, AWS",
+    "Chef de cocina con experiencia en restaurantes y hoteles",
+]
+
+
+def _index(texts):
+    idx = JDIndex(None, dim=256)
+    for i, text in enumerate(texts, start=1):
+        idx.add(i, text)
+    return idx
+
+
+def _popular_per_row(idx, threshold):
+    # Versión anterior (un producto matriz·vector por fila): referencia
+    mat, ids = idx._mat[: idx._n], idx._ids[: idx._n]
+    unassigned = np.ones(len(ids), dtype=bool)
+    groups = []
+    for i in range(len(ids) - 1, -1, -1):
+        if not unassigned[i]:
+            continue
+        members = np.flatnonzero(unassigned & (mat @ mat[i] >= threshold))
+        unassigned[members] = False
+        groups.append({"leader": int(ids[i]), "size": int(len(members)),
+                       "exec_ids": [int(x) for x in ids[members][:50]]})
+    groups.sort(key=lambda g: -g["size"])
+    return groups
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8, 0.95])
+def test_popular_matches_the_per_row_grouping(threshold):
+    idx = _index(JDS * 3)
+    assert idx.popular(threshold=threshold, limit=100) == _popular_per_row(idx, threshold)
+
+
+def test_popular_caps_the_window(monkeypatch):
+    monkeypatch.setattr(similarity, "POPULAR_MAX_WINDOW", 4)
+    idx = _index(JDS)
+    groups = idx.popular(threshold=-1.0, window=10_000)  # todas en un grupo
+    assert [g["size"] for g in groups] == [4]
+    assert min(groups[0]["exec_ids"]) == len(JDS) - 3
+
+
+def test_popular_on_an_empty_index():
+    assert JDIndex(None, dim=64).popular() == []
+
+
+def _out():
+    return {"feedback_text": "ok", "feedback_html": "<p>ok</p>", "feedback_lang": "es",
+            "score_jd": 70, "score_ats": 60, "ats_details": {}, "jd_lang": "es", "res_lang": "es",
+            "model_vendor": "openai", "model_name": "gpt-4o", "model_used": 1, "keyword_score": 50,
+            "disclaimer": ""}
+
+
+@pytest.mark.parametrize("enabled", [True, False])
+def test_persist_only_indexes_when_enabled(app, monkeypatch, enabled):
+    added = []
+    monkeypatch.setattr(similarity, "jd_index", type("Fake", (), {"add": lambda self, *a: added.append(a)})())
+    app.config["JD_INDEX_ENABLED"] = enabled
+
+    analysis._persist(email="a@x.com", name=None, picture=None, occupation=None, filename="cv.pdf",
+                      ext="pdf", size=10, out=_out(), jobdesc="Python backend")
+
+    assert bool(added) is enabled
+
+
+def test_vectorize_is_normalized():
+    assert np.linalg.norm(vectorize(JDS[0], 256)) == pytest.approx(1.0, abs=1e-5)